@@ -1,85 +1,388 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, Response, request, jsonify, g, stream_with_context
 from flask_cors import CORS
 import os
+import hashlib
+import json
+import shutil
 import tempfile
 import traceback
 import time
+import uuid
 
-from config import OUTPUT_DIR
-from services.audio_service import process_audio_file
-from services.youtube_service import download_youtube_audio
+from config import (OUTPUT_DIR, PROCESSOR_ROLE, PROCESSOR_ROLES, PORT, PROFILES_DIR, PROFILE_TOKEN,
+                    INFERENCE_RUNTIME, INFERENCE_RUNTIMES, CHECK_INFERENCE_RUNTIME, YOUTUBE_DEFAULT_DURATION,
+                    STREAM_PREVIEW_TAB_BUDGET, FINGERPRINT_JOB_COST)
+from services.audio_service import process_audio_file, transcribe_incrementally, save_outputs, rethreshold_job
+from services.youtube_service import download_youtube_audio, get_playlist_entries
 from services.ffmpeg_service import convert_wav_to_s16le
-from services.tab_service import generate_tabs_from_midi, get_notes_from_midi
+from services.model_service import check_runtime
+from services.fingerprint_service import fingerprint_file
+from services.job_scheduler import scheduler, estimate_audio_duration, QueueFull
+from services.single_flight import single_flight
+from services.tab_service import generate_tabs_from_midi, get_notes_from_midi, render_tab, NOTE_LAYOUTS
+from services.pianoroll_service import get_pianoroll
 from utils import midi_to_hz
+from metrics import instrument_app, track_stage
+from profiling import init_profiling
+from serialization import init_serialization
 
-app = Flask(__name__)
-CORS(app)
+# Routes are split by role so a process can serve only the cheap MIDI/tab
+# endpoints (see PROCESSOR_ROLE in config.py) and scale separately from inference.
+inference_api = Blueprint("inference", __name__)
+tabs_api = Blueprint("tabs", __name__)
 
-# Ensure the main output directory exists
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-
-@app.route("/process_audio", methods=["POST"])
-def process_audio_endpoint():
-    """
-    Endpoint to process an audio file (from upload or YouTube) and convert it to MIDI.
-    """
-    # Create a unique directory for this processing job
-    job_id = f"job_{int(time.time() * 1000)}"
+def _new_job():
+    """Creates a unique directory for a processing job and returns (job_id, job_dir)."""
+    # The random suffix keeps requests arriving in the same millisecond apart
+    job_id = f"job_{int(time.time() * 1000)}_{uuid.uuid4().hex[:6]}"
     job_dir = os.path.join(OUTPUT_DIR, job_id)
     os.makedirs(job_dir, exist_ok=True)
+    g.job_id = job_id
+    return job_id, job_dir
+
 
+def _parse_params(form):
+    """Reads the transcription parameters from the submitted form; raises ValueError if one is invalid."""
     try:
         params = {
-            "onset_threshold": float(request.form.get("onset_threshold", 0.5)),
-            "frame_threshold": float(request.form.get("frame_threshold", 0.3)),
-            "minimum_note_length": int(request.form.get("minimum_note_length", 120)),
+            "onset_threshold": float(form.get("onset_threshold", 0.5)),
+            "frame_threshold": float(form.get("frame_threshold", 0.3)),
+            "minimum_note_length": int(form.get("minimum_note_length", 120)),
             # Safely convert pitch values to frequency
-            "minimum_frequency": midi_to_hz(int(request.form.get("minPitch", 0))) if request.form.get("minPitch") else None,
-            "maximum_frequency": midi_to_hz(int(request.form.get("maxPitch", 127))) if request.form.get("maxPitch") else None,
+            "minimum_frequency": midi_to_hz(int(form.get("minPitch", 0))) if form.get("minPitch") else None,
+            "maximum_frequency": midi_to_hz(int(form.get("maxPitch", 127))) if form.get("maxPitch") else None,
+            "runtime": form.get("runtime", INFERENCE_RUNTIME),
         }
+    except (TypeError, ValueError):
+        raise ValueError("onset_threshold, frame_threshold, minimum_note_length, minPitch and maxPitch must be numbers")
+    if params["runtime"] not in INFERENCE_RUNTIMES:
+        raise ValueError(f"runtime must be one of {INFERENCE_RUNTIMES}")
+    return params
+
+
+def _save_upload(file):
+    """Saves an uploaded file to a temporary path and returns that path."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as t:
+        file.save(t.name)
+        return t.name
+
+
+def _job_response(job_id, midi_path, final_wav_path):
+    return {
+        "midi_relative_path": os.path.join(job_id, os.path.basename(midi_path)) if midi_path else None,
+        "wav_relative_path": os.path.join(job_id, os.path.basename(final_wav_path)) if final_wav_path else None,
+        "midi_filename": os.path.join(job_id, os.path.basename(midi_path)) if midi_path else None,
+    }
+
+
+def _admit_job(audio_path=None, cost_factor=1.0):
+    """
+    Asks the job scheduler for a place, costing the job by its audio duration
+    (times cost_factor, for work lighter than a transcription).
+
+    A YouTube job (no audio_path) is costed at YOUTUBE_DEFAULT_DURATION rather than
+    looked up, so admitting never waits on the network; call refine_cost on the
+    ticket once its audio is downloaded. The user id forwarded by the backend in
+    'X-User-Id' is used for per-user fairness. Raises QueueFull when the processor
+    is saturated.
+    """
+    cost = (estimate_audio_duration(audio_path) if audio_path else YOUTUBE_DEFAULT_DURATION) * cost_factor
+    user_id = request.headers.get("X-User-Id") or request.remote_addr
+    return scheduler.admit(cost, user_id)
+
+
+def _queue_full_response(e):
+    return jsonify({"error": str(e)}), 429, {"Retry-After": str(e.retry_after)}
+
+
+def _file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _coalescing_key(source, params, fingerprint):
+    """Identifies a transcription: requests with the same key produce the same outputs."""
+    return json.dumps({"source": source, "params": params, "fingerprint": fingerprint}, sort_keys=True)
+
+
+def _copy_job_outputs(source_dir, job_dir):
+    """Gives a coalesced request its own copy of the outputs, so each job directory can be deleted on its own."""
+    with track_stage("copy_coalesced_outputs"):
+        shutil.copytree(source_dir, job_dir, dirs_exist_ok=True)
+
+
+@inference_api.route("/process_audio", methods=["POST"])
+def process_audio_endpoint():
+    """
+    Endpoint to process an audio file (from upload or YouTube) and convert it to MIDI.
+
+    Identical requests (same audio or URL, same parameters) that arrive while one
+    is already being processed wait for it instead of transcribing again, then
+    get a copy of its outputs in their own job directory.
+    """
+    try:
+        params = _parse_params(request.form)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if "audio_file" not in request.files and not request.form.get("youtube_url"):
+        return jsonify({"error": "Processor expects 'audio_file' or 'youtube_url'"}), 400
 
-        midi_path, wav_path = None, None
+    job_id, job_dir = _new_job()
+    try:
+        temp_audio_path = None
+        want_fingerprint = False
 
         if "audio_file" in request.files:
-            file = request.files["audio_file"]
             # Use a temporary file to safely handle the upload
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as t:
-                file.save(t.name)
-                temp_audio_path = t.name
+            temp_audio_path = _save_upload(request.files["audio_file"])
+            source = "sha256:" + _file_sha256(temp_audio_path)
 
-            midi_path, wav_path = process_audio_file(temp_audio_path, job_dir, params)
-            os.unlink(temp_audio_path) # Clean up the temporary file
+            def transcribe_job():
+                with _admit_job(audio_path=temp_audio_path):
+                    midi_path, wav_path = process_audio_file(temp_audio_path, job_dir, params)
+                    # Convert the generated wav file for better compatibility
+                    with track_stage("convert_wav"):
+                        final_wav_path = convert_wav_to_s16le(wav_path) if wav_path else None
+                return job_dir, midi_path, final_wav_path, None
 
-        elif "youtube_url" in request.form and request.form.get("youtube_url"):
-            youtube_url = request.form.get("youtube_url")
-            # Use a temporary directory for the download
-            with tempfile.TemporaryDirectory() as tmpdir:
-                audio_path = download_youtube_audio(youtube_url, tmpdir)
-                if audio_path:
-                    midi_path, wav_path = process_audio_file(audio_path, job_dir, params)
         else:
-            return jsonify({"error": "Processor expects 'audio_file' or 'youtube_url'"}), 400
+            youtube_url = request.form.get("youtube_url").strip()
+            source = "youtube:" + youtube_url
+            # The backend can't fingerprint a URL itself, so it asks for it here
+            want_fingerprint = request.form.get("fingerprint") == "1"
 
-        # Convert the generated wav file for better compatibility
-        final_wav_path = convert_wav_to_s16le(wav_path) if wav_path else None
+            def transcribe_job():
+                midi_path, wav_path, fingerprint = None, None, None
+                with _admit_job() as ticket:
+                    # Use a temporary directory for the download
+                    with tempfile.TemporaryDirectory() as tmpdir:
+                        with track_stage("download"):
+                            audio_path = download_youtube_audio(youtube_url, tmpdir)
+                        if audio_path:
+                            ticket.refine_cost(estimate_audio_duration(audio_path))
+                            midi_path, wav_path = process_audio_file(audio_path, job_dir, params)
+                            if want_fingerprint:
+                                fingerprint = fingerprint_file(audio_path)
+                    with track_stage("convert_wav"):
+                        final_wav_path = convert_wav_to_s16le(wav_path) if wav_path else None
+                return job_dir, midi_path, final_wav_path, fingerprint
 
-        response_data = {
-            "midi_relative_path": os.path.join(job_id, os.path.basename(midi_path)) if midi_path else None,
-            "wav_relative_path": os.path.join(job_id, os.path.basename(final_wav_path)) if final_wav_path else None,
-            "midi_filename": os.path.join(job_id, os.path.basename(midi_path)) if midi_path else None,
-        }
-        return jsonify(response_data)
+        try:
+            (result_dir, midi_path, final_wav_path, fingerprint), leader = single_flight.do(
+                _coalescing_key(source, params, want_fingerprint), transcribe_job)
+        finally:
+            if temp_audio_path:
+                os.unlink(temp_audio_path) # Clean up the temporary file
+        if not leader:
+            print(f"Job {job_id} reused the outputs of identical in-flight job {os.path.basename(result_dir)}")
+            _copy_job_outputs(result_dir, job_dir)
+
+        response = _job_response(job_id, midi_path, final_wav_path)
+        if fingerprint is not None:
+            response["fingerprint"] = _fingerprint_response(*fingerprint)
+        return jsonify(response)
 
+    except QueueFull as e:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        return _queue_full_response(e)
     except Exception as e:
         # Return a detailed error for easier debugging
         return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
 
 
-@app.route("/generate_tabs", methods=["POST"])
+def _fingerprint_response(hashes, offsets):
+    return {"hashes": hashes.tolist(), "offsets": offsets.tolist()}
+
+
+@inference_api.route("/fingerprint", methods=["POST"])
+def fingerprint_endpoint():
+    """
+    Endpoint to compute the perceptual fingerprint of an uploaded audio file, without transcribing it.
+
+    Waits for a job slot like a transcription, so it answers 429 when the processor is saturated.
+    Returns {"hashes": [...], "offsets": [...]} (parallel arrays).
+    """
+    if "audio_file" not in request.files:
+        return jsonify({"error": "audio_file required"}), 400
+
+    temp_audio_path = _save_upload(request.files["audio_file"])
+    try:
+        with _admit_job(audio_path=temp_audio_path, cost_factor=FINGERPRINT_JOB_COST):
+            return jsonify(_fingerprint_response(*fingerprint_file(temp_audio_path)))
+    except QueueFull as e:
+        return _queue_full_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+    finally:
+        os.unlink(temp_audio_path)
+
+
+def _sse(event, data):
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@inference_api.route("/process_audio_stream", methods=["POST"])
+def process_audio_stream_endpoint():
+    """
+    Same as /process_audio, but streams results as Server-Sent Events while the job runs.
+
+    Events:
+        status - {"stage": ...} when the job moves to downloading / transcribing
+        notes  - {"notes": [...]} notes that finished since the previous event
+        tab    - {"tab_text": ...} preview tab so far, only if 'preview_tab' names an algorithm
+        done   - the same payload /process_audio returns
+        error  - {"error": ...}
+    """
+    try:
+        params = _parse_params(request.form)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    youtube_url = request.form.get("youtube_url")
+    if "audio_file" not in request.files and not youtube_url:
+        return jsonify({"error": "Processor expects 'audio_file' or 'youtube_url'"}), 400
+
+    job_id, job_dir = _new_job()
+    temp_audio_path = _save_upload(request.files["audio_file"]) if "audio_file" in request.files else None
+    preview_algorithm = request.form.get("preview_tab")
+    # As in /process_audio, only a downloaded URL is fingerprinted here
+    want_fingerprint = temp_audio_path is None and request.form.get("fingerprint") == "1"
+
+    try:
+        ticket = _admit_job(audio_path=temp_audio_path)
+    except QueueFull as e:
+        if temp_audio_path:
+            os.unlink(temp_audio_path)
+        shutil.rmtree(job_dir, ignore_errors=True)
+        return _queue_full_response(e)
+
+    def preview_tab(midi_data):
+        """Yields a preview tab event and returns when the next preview is due."""
+        started = time.monotonic()
+        tab_text = render_tab(midi_data, preview_algorithm)
+        finished = time.monotonic()
+        yield _sse("tab", {"tab_text": tab_text})
+        return finished + (finished - started) * (1 / STREAM_PREVIEW_TAB_BUDGET - 1)
+
+    def run_job(tmpdir):
+        """Runs the job once it holds a scheduler slot, yielding its events."""
+        audio_path = temp_audio_path
+        if audio_path is None:
+            yield _sse("status", {"stage": "download"})
+            with track_stage("download"):
+                audio_path = download_youtube_audio(youtube_url, tmpdir)
+            if not audio_path:
+                raise RuntimeError("Could not download audio from YouTube")
+            ticket.refine_cost(estimate_audio_duration(audio_path))
+
+        yield _sse("status", {"stage": "transcribe"})
+        midi_data = None
+        preview_due, preview_stale = 0.0, False
+        for new_notes, midi_data in transcribe_incrementally(audio_path, params, job_dir):
+            yield _sse("notes", {"notes": new_notes})
+            preview_stale = preview_stale or bool(new_notes)
+            if preview_algorithm and preview_stale and time.monotonic() >= preview_due:
+                preview_due = yield from preview_tab(midi_data)
+                preview_stale = False
+        if preview_algorithm and preview_stale:
+            yield from preview_tab(midi_data)
+
+        midi_path, wav_path = save_outputs(midi_data, audio_path, job_dir)
+        with track_stage("convert_wav"):
+            final_wav_path = convert_wav_to_s16le(wav_path) if wav_path else None
+        response = _job_response(job_id, midi_path, final_wav_path)
+        if want_fingerprint:
+            response["fingerprint"] = _fingerprint_response(*fingerprint_file(audio_path))
+        yield _sse("done", response)
+
+    def generate():
+        tmpdir = tempfile.mkdtemp()
+        try:
+            yield _sse("status", {"stage": "queued"})
+            with ticket:
+                yield from run_job(tmpdir)
+        except Exception as e:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            yield _sse("error", {"error": str(e)})
+        finally:
+            ticket.cancel()
+            if temp_audio_path and os.path.exists(temp_audio_path):
+                os.unlink(temp_audio_path)
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Free the queue slot even if the client disconnects before the stream starts
+    response.call_on_close(ticket.cancel)
+    return response
+
+
+@inference_api.route("/rethreshold", methods=["POST"])
+def rethreshold_endpoint():
+    """
+    Endpoint to re-extract a job's notes with new thresholds from its saved model output.
+
+    Accepts the same threshold / pitch fields as /process_audio plus 'midi_filename',
+    and 'sonify' to also regenerate the WAV. Takes milliseconds instead of a full
+    transcription because the neural network is not run again.
+    """
+    data = request.get_json(force=True)
+    midi_filename = data.get("midi_filename")
+    if not midi_filename:
+        return jsonify({"error": "midi_filename required"}), 400
+    g.job_id = os.path.dirname(midi_filename) or None
+
+    midi_path = os.path.join(OUTPUT_DIR, midi_filename)
+    if not os.path.exists(midi_path):
+        return jsonify({"error": "MIDI file not found"}), 404
+
+    try:
+        params = _parse_params(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        midi_path, wav_path = rethreshold_job(midi_path, params, sonify=bool(data.get("sonify")))
+        if wav_path:
+            with track_stage("convert_wav"):
+                wav_path = convert_wav_to_s16le(wav_path)
+        return jsonify(_job_response(os.path.dirname(midi_filename), midi_path, wav_path))
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+
+
+@inference_api.route("/playlist_entries", methods=["POST"])
+def playlist_entries_endpoint():
+    """
+    Endpoint to list the videos of a YouTube playlist, for bulk imports.
+
+    Accepts 'playlist_url' and an optional 'limit'; returns {"urls": [...]}.
+    """
+    data = request.get_json(force=True)
+    playlist_url = data.get("playlist_url")
+    if not playlist_url:
+        return jsonify({"error": "playlist_url required"}), 400
+
+    with track_stage("playlist_lookup"):
+        urls = get_playlist_entries(playlist_url, data.get("limit"))
+    if urls is None:
+        return jsonify({"error": "Could not read playlist"}), 502
+    return jsonify({"urls": urls})
+
+
+@tabs_api.route("/generate_tabs", methods=["POST"])
 def generate_tabs_endpoint():
     """
     Endpoint to generate guitar tabs from a processed MIDI file.
+
+    Optional 'tuning' (a name, a list of 6 open-string pitches or "auto") and
+    'capo' (a fret or "auto") default to standard tuning without a capo.
     """
     data = request.get_json(force=True)
     midi_filename = data.get("midi_filename")
@@ -87,28 +390,38 @@ def generate_tabs_endpoint():
 
     if not midi_filename:
         return jsonify({"error": "midi_filename required"}), 400
+    g.job_id = os.path.dirname(midi_filename) or None
 
     try:
-        tab_text = generate_tabs_from_midi(midi_filename, algorithm)
+        tab_text = generate_tabs_from_midi(midi_filename, algorithm, data.get("tuning", "standard"),
+                                           data.get("capo", 0))
         return jsonify({"tab_text": tab_text})
     except FileNotFoundError:
         return jsonify({"error": "MIDI file not found"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
 
 
-@app.route("/get_midi_notes", methods=["POST"])
+@tabs_api.route("/get_midi_notes", methods=["POST"])
 def get_midi_notes_endpoint():
     """
     Endpoint to extract musical notes from a MIDI file.
+
+    Pass "layout": "columnar" to get parallel pitch/start/end arrays instead of one object per note.
     """
     data = request.get_json(force=True)
     midi_filename = data.get("midi_filename")
     if not midi_filename:
         return jsonify({"error": "midi_filename required"}), 400
+    layout = data.get("layout", "rows")
+    if layout not in NOTE_LAYOUTS:
+        return jsonify({"error": f"layout must be one of {NOTE_LAYOUTS}"}), 400
+    g.job_id = os.path.dirname(midi_filename) or None
 
     try:
-        notes_data = get_notes_from_midi(midi_filename)
+        notes_data = get_notes_from_midi(midi_filename, layout)
         return jsonify(notes_data)
     except FileNotFoundError:
         return jsonify({"error": "MIDI file not found"}), 404
@@ -116,5 +429,68 @@ def get_midi_notes_endpoint():
         return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
 
 
+@tabs_api.route("/get_pianoroll", methods=["POST"])
+def get_pianoroll_endpoint():
+    """
+    Endpoint to read a job's multi-resolution piano roll, for drawing long songs zoomed out.
+
+    With only 'midi_filename' it returns the pyramid's levels and tile counts. Add
+    'level' and 'start_tile' (and optionally 'end_tile', exclusive) to also get those
+    tiles' occupancy grids. The pyramid is built on first use and cached next to the MIDI.
+    """
+    data = request.get_json(force=True)
+    midi_filename = data.get("midi_filename")
+    if not midi_filename:
+        return jsonify({"error": "midi_filename required"}), 400
+    try:
+        level = None if data.get("level") is None else int(data["level"])
+        start_tile = int(data.get("start_tile", 0))
+        end_tile = None if data.get("end_tile") is None else int(data["end_tile"])
+    except (TypeError, ValueError):
+        return jsonify({"error": "level, start_tile and end_tile must be integers"}), 400
+    g.job_id = os.path.dirname(midi_filename) or None
+
+    try:
+        return jsonify(get_pianoroll(midi_filename, level, start_tile, end_tile))
+    except FileNotFoundError:
+        return jsonify({"error": "MIDI file not found"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+
+
+def create_app(role=PROCESSOR_ROLE, check_inference_runtime=CHECK_INFERENCE_RUNTIME):
+    """
+    Builds the processor app for a role: 'all', 'inference' (audio -> MIDI) or 'tabs' (MIDI/tab only).
+
+    Roles that serve /process_audio load the configured inference runtime up front
+    (unless check_inference_runtime is False), failing fast if it isn't installed.
+    """
+    if role not in PROCESSOR_ROLES:
+        raise ValueError(f"Unknown processor role {role!r}, expected one of {PROCESSOR_ROLES}")
+
+    app = Flask(__name__)
+    app.config.update(PROFILES_DIR=PROFILES_DIR, PROFILE_TOKEN=PROFILE_TOKEN)
+    CORS(app)
+    instrument_app(app)
+    init_profiling(app)
+    init_serialization(app)
+
+    if role in ("all", "inference"):
+        if check_inference_runtime:
+            check_runtime(INFERENCE_RUNTIME)
+        app.register_blueprint(inference_api)
+    if role in ("all", "tabs"):
+        app.register_blueprint(tabs_api)
+
+    # Ensure the main output directory exists
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    return app
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
-    app.run(debug=True, port=5002)
+    app.run(debug=True, port=PORT)
@@ -0,0 +1,298 @@
+"""
+Transcribes every audio file under a directory, spread over a pool of worker processes.
+
+Meant for backfilling the catalogue without posting files to /process_audio one
+at a time. Each worker loads the model once when it starts and keeps it for
+every file it is given.
+
+Outputs of a file go to '<output dir>/<sha256 of the file>-<parameter digest>/',
+holding what a /process_audio job directory holds (MIDI, WAV, model output).
+A file whose directory already exists was transcribed with the same parameters
+and is skipped, so re-running after an interruption only does the remaining
+work. A directory is renamed into place only once all its outputs are written,
+so a half-finished one is never mistaken for a result.
+
+Every file gets a line in the manifest (JSON Lines, appended and flushed as
+files finish) with its status, outputs, audio length and processing time.
+Re-runs append to the same manifest; the latest line for a source is its current state.
+
+Run from the audio-tab-processor directory:
+    python batch.py songs/ --workers 4
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from config import BATCH_OUTPUT_DIR, INFERENCE_RUNTIME, INFERENCE_RUNTIMES
+from utils import midi_to_hz
+
+AUDIO_EXTENSIONS = {'.wav', '.mp3', '.flac', '.ogg', '.m4a', '.aac', '.aif', '.aiff'}
+MANIFEST_FILENAME = "manifest.jsonl"
+# Suffix of output directories still being written
+PARTIAL_SUFFIX = ".partial"
+HASH_CHUNK_SIZE = 1024 * 1024
+HASH_THREADS = 8
+# Files handed to each worker ahead of time, so none sits idle between files
+IN_FLIGHT_PER_WORKER = 2
+
+
+def find_audio_files(input_dir):
+    """Lists the audio files under input_dir (by extension), in a stable order."""
+    paths = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        paths.extend(os.path.join(root, name) for name in sorted(files)
+                     if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS)
+    return paths
+
+
+def content_hash(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def params_digest(params):
+    """Short digest of the transcription parameters, so other settings get their own outputs."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def job_outputs(job_dir):
+    """Names the MIDI and WAV in a finished output directory (the converted WAV if there is one)."""
+    names = sorted(os.listdir(job_dir))
+    midi = next((name for name in names if name.endswith(".mid")), None)
+    wavs = [name for name in names if name.endswith(".wav")]
+    wav = next((name for name in wavs if name.endswith("_fixed.wav")), wavs[0] if wavs else None)
+    return midi, wav
+
+
+def _init_worker(runtime, threads):
+    """Runs once in each worker: caps its math library threads and loads the model."""
+    for var in ("OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        os.environ[var] = str(threads)
+    from services.model_service import get_model
+    get_model(runtime)
+
+
+def _transcribe_file(audio_path, job_dir, params):
+    """
+    Runs in a worker: transcribes one file into job_dir.
+
+    Returns:
+        (float, float): Seconds of audio and seconds spent on it.
+    """
+    from services.audio_service import process_audio_file
+    from services.ffmpeg_service import convert_wav_to_s16le
+    from services.job_scheduler import estimate_audio_duration
+
+    start = time.perf_counter()
+    partial_dir = job_dir + PARTIAL_SUFFIX
+    shutil.rmtree(partial_dir, ignore_errors=True)
+    os.makedirs(partial_dir)
+
+    try:
+        _, wav_path = process_audio_file(audio_path, partial_dir, params)
+        if wav_path:
+            convert_wav_to_s16le(wav_path)
+    except Exception:
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        raise
+    os.replace(partial_dir, job_dir)
+    return estimate_audio_duration(audio_path), time.perf_counter() - start
+
+
+def _remove_partial_outputs(output_dir):
+    """Drops directories left half-written by a run that was interrupted."""
+    for name in os.listdir(output_dir):
+        if name.endswith(PARTIAL_SUFFIX):
+            shutil.rmtree(os.path.join(output_dir, name), ignore_errors=True)
+
+
+class Manifest:
+    """Appends one JSON line per file and flushes it, so an interrupted run loses nothing it finished."""
+
+    def __init__(self, path, input_dir, output_dir):
+        self._file = open(path, "a")
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.counts = {}
+
+    def record(self, audio_path, sha256, key, status, **fields):
+        midi, wav = job_outputs(os.path.join(self.output_dir, key)) if status != "failed" else (None, None)
+        entry = {
+            "source": os.path.relpath(audio_path, self.input_dir),
+            "sha256": sha256,
+            "status": status,
+            "midi_relative_path": os.path.join(key, midi) if midi else None,
+            "wav_relative_path": os.path.join(key, wav) if wav else None,
+            "finished_at": time.time(),
+            **fields,
+        }
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        self.counts[status] = self.counts.get(status, 0) + 1
+        return entry
+
+    def close(self):
+        self._file.close()
+
+
+def run(input_dir, output_dir, params, workers, threads_per_worker, manifest_path=None):
+    """
+    Transcribes the audio files under input_dir that have no outputs yet.
+
+    Returns:
+        dict: Aggregate counts and throughput of the run.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    _remove_partial_outputs(output_dir)
+    manifest = Manifest(manifest_path or os.path.join(output_dir, MANIFEST_FILENAME), input_dir, output_dir)
+    digest = params_digest(params)
+    wall_start = time.perf_counter()
+
+    paths = find_audio_files(input_dir)
+    with ThreadPoolExecutor(HASH_THREADS) as pool:
+        hashes = list(pool.map(content_hash, paths))
+    print(f"Found {len(paths)} audio files in {input_dir} (hashed in {time.perf_counter() - wall_start:.1f}s)")
+
+    pending = {}
+    # Copies of a file being transcribed, recorded once their original finishes
+    duplicates = defaultdict(list)
+    for path, sha256 in zip(paths, hashes):
+        key = f"{sha256}-{digest}"
+        if key in pending:
+            duplicates[key].append(path)
+        elif os.path.isdir(os.path.join(output_dir, key)):
+            manifest.record(path, sha256, key, "cached")
+        else:
+            pending[key] = path
+    print(f"{len(pending)} to transcribe, {manifest.counts.get('cached', 0)} already done, "
+          f"{sum(map(len, duplicates.values()))} duplicates")
+
+    audio_seconds, busy_seconds = 0.0, 0.0
+    queue = iter(pending.items())
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                   initargs=(params["runtime"], threads_per_worker))
+    running = {}
+    broken = None
+
+    def record_failed(key, e):
+        path, sha256 = pending[key], key.split("-")[0]
+        error = str(e) or type(e).__name__
+        manifest.record(path, sha256, key, "failed", error=error)
+        for duplicate in duplicates[key]:
+            manifest.record(duplicate, sha256, key, "failed", error=error)
+        print(f"[{sum(manifest.counts.values())}/{len(paths)}] FAILED {path}: {error}")
+
+    def submit_next():
+        nonlocal broken
+        if broken:
+            return
+        for key, path in queue:
+            try:
+                running[executor.submit(_transcribe_file, path, os.path.join(output_dir, key), params)] = key
+            except BrokenProcessPool as e:
+                # A worker died and the pool takes no more files; the ones it was
+                # running fail with the same error as they are collected below
+                broken = e
+                record_failed(key, e)
+            return
+
+    try:
+        # Only a few files per worker are queued at a time, so an interrupt waits
+        # for the files already started rather than the rest of the directory
+        for _ in range(workers * IN_FLIGHT_PER_WORKER):
+            submit_next()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = running.pop(future)
+                submit_next()
+                path, sha256 = pending[key], key.split("-")[0]
+                try:
+                    seconds_of_audio, seconds = future.result()
+                except Exception as e:
+                    # Failed files have no output directory, so the next run retries them
+                    record_failed(key, e)
+                    continue
+                audio_seconds += seconds_of_audio
+                busy_seconds += seconds
+                manifest.record(path, sha256, key, "done", audio_seconds=seconds_of_audio, seconds=seconds)
+                for duplicate in duplicates[key]:
+                    manifest.record(duplicate, sha256, key, "duplicate", duplicate_of=os.path.relpath(path, input_dir))
+                print(f"[{sum(manifest.counts.values())}/{len(paths)}] {path}: "
+                      f"{seconds_of_audio:.0f}s of audio in {seconds:.1f}s")
+        if broken:
+            print("A worker process died; the files not yet started are recorded as failed. Run again to retry them")
+            for key, _ in queue:
+                record_failed(key, broken)
+    except KeyboardInterrupt:
+        print("Interrupted; waiting for the files in progress. Finished files are kept, run again to resume")
+        raise
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        manifest.close()
+
+    wall_seconds = time.perf_counter() - wall_start
+    return {
+        "files": len(paths),
+        "counts": manifest.counts,
+        "audio_seconds": audio_seconds,
+        "wall_seconds": wall_seconds,
+        "realtime_factor": audio_seconds / wall_seconds if wall_seconds else None,
+        "files_per_minute": manifest.counts.get("done", 0) / wall_seconds * 60 if wall_seconds else None,
+        "worker_utilization": busy_seconds / (wall_seconds * workers) if wall_seconds else None,
+    }
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input_dir", help="Directory to search for audio files (recursively)")
+    parser.add_argument("--output-dir", default=BATCH_OUTPUT_DIR)
+    parser.add_argument("--manifest", help=f"Manifest path (default: <output dir>/{MANIFEST_FILENAME})")
+    parser.add_argument("--workers", type=int, default=max(1, min(4, cpus // 2)), help="Worker processes")
+    parser.add_argument("--threads-per-worker", type=int,
+                        help="Math library threads per worker (default: CPUs / workers)")
+    parser.add_argument("--runtime", default=INFERENCE_RUNTIME, choices=INFERENCE_RUNTIMES)
+    parser.add_argument("--onset-threshold", type=float, default=0.5)
+    parser.add_argument("--frame-threshold", type=float, default=0.3)
+    parser.add_argument("--minimum-note-length", type=int, default=120, help="Milliseconds")
+    parser.add_argument("--min-pitch", type=int, help="Lowest MIDI pitch to keep")
+    parser.add_argument("--max-pitch", type=int, help="Highest MIDI pitch to keep")
+    args = parser.parse_args()
+
+    # Same parameters /process_audio builds from its form
+    params = {
+        "onset_threshold": args.onset_threshold,
+        "frame_threshold": args.frame_threshold,
+        "minimum_note_length": args.minimum_note_length,
+        "minimum_frequency": midi_to_hz(args.min_pitch) if args.min_pitch is not None else None,
+        "maximum_frequency": midi_to_hz(args.max_pitch) if args.max_pitch is not None else None,
+        "runtime": args.runtime,
+    }
+    threads = args.threads_per_worker or max(1, cpus // args.workers)
+
+    try:
+        summary = run(args.input_dir, args.output_dir, params, args.workers, threads, args.manifest)
+    except KeyboardInterrupt:
+        raise SystemExit(130)
+
+    print(f"\n{summary['files']} files: " + ", ".join(f"{n} {status}" for status, n in sorted(summary["counts"].items())))
+    print(f"{summary['audio_seconds']:.0f}s of audio transcribed in {summary['wall_seconds']:.1f}s "
+          f"({summary['realtime_factor']:.1f}x realtime, {summary['files_per_minute']:.1f} files/min, "
+          f"{summary['worker_utilization']:.0%} worker utilization)")
+
+
+if __name__ == "__main__":
+    main()
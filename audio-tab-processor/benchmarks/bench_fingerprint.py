@@ -0,0 +1,69 @@
+"""
+Times the perceptual fingerprint on synthetic tracks, and checks it still matches
+a degraded copy (quieter, noisier, low-passed and shifted in time).
+
+Run from the audio-tab-processor directory:
+    python -m benchmarks.bench_fingerprint --durations 30 180 600
+"""
+import argparse
+from collections import Counter
+
+import numpy as np
+
+from benchmarks.harness import measure, save_results
+from benchmarks.synthetic import make_synthetic_midi, render_synthetic_audio
+from services.fingerprint_service import fingerprint_audio
+
+SAMPLE_RATE = 22050
+
+
+def degrade(audio, shift_s=1.3, seed=0):
+    """Imitates a re-encoded copy: delayed start, lower level, added noise and a gentle low-pass."""
+    rng = np.random.default_rng(seed)
+    shifted = np.concatenate([np.zeros(int(shift_s * SAMPLE_RATE), dtype=np.float32), audio * 0.5])[:len(audio)]
+    noisy = shifted + rng.normal(0, 0.005, len(shifted)).astype(np.float32)
+    return np.convolve(noisy, np.ones(4) / 4, mode="same").astype(np.float32)
+
+
+def aligned_fraction(reference, query):
+    """Share of the query's hashes that agree with the reference on a single time shift."""
+    ref_offsets = {}
+    for h, offset in zip(*reference):
+        ref_offsets.setdefault(int(h), []).append(int(offset))
+    shifts = Counter(ref - int(offset) for h, offset in zip(*query) for ref in ref_offsets.get(int(h), ()))
+    return max(shifts.values(), default=0) / max(1, len(query[0]))
+
+
+def run(durations, repeat):
+    results = []
+    for duration in durations:
+        audio = render_synthetic_audio(make_synthetic_midi(duration, polyphony=3), SAMPLE_RATE)
+        stats = measure(lambda: fingerprint_audio(audio, SAMPLE_RATE), repeat=repeat)
+        reference = fingerprint_audio(audio, SAMPLE_RATE)
+        match = aligned_fraction(reference, fingerprint_audio(degrade(audio), SAMPLE_RATE))
+        results.append({
+            "case": "fingerprint_audio",
+            "duration_s": duration,
+            "n_hashes": len(reference[0]),
+            "realtime_factor": duration / stats["median_s"],
+            "degraded_match_fraction": match,
+            **stats,
+        })
+        print(f"fingerprint {duration:>6}s hashes={len(reference[0]):>6} median={stats['median_s'] * 1000:9.1f} ms "
+              f"({duration / stats['median_s']:.0f}x realtime) degraded match={match:.0%}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", type=float, nargs="+", default=[30, 180, 600])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Path of the JSON results file")
+    args = parser.parse_args()
+
+    results = run(args.durations, args.repeat)
+    save_results("fingerprint", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Times the full /process_audio request path with the basic-pitch model replaced by a stub.
+
+The stub returns a deterministic synthetic transcription, so the numbers cover
+everything around the model (upload handling, MIDI writing, sonification, WAV
+conversion, response building) and are comparable between machines and runs.
+ffmpeg must be on the PATH, as for the real service.
+
+Run from the audio-tab-processor directory:
+    python -m benchmarks.bench_pipeline --durations 10 60 --repeat 3
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+# The real model is never used here, so don't load it when app.py is imported
+os.environ.setdefault("CHECK_INFERENCE_RUNTIME", "0")
+
+from config import OUTPUT_DIR
+from benchmarks.harness import measure, save_results
+from benchmarks.synthetic import make_synthetic_midi, write_synthetic_wav
+
+
+def install_stub_model(duration, polyphony):
+    """Replaces the basic-pitch model call with a deterministic stub."""
+    from services import audio_service
+
+    def stub_transcribe(audio_path, params, out_dir=None):
+        return make_synthetic_midi(duration, polyphony, seed=1)
+
+    audio_service.transcribe = stub_transcribe
+
+
+def run(durations, polyphony, repeat):
+    from app import create_app
+
+    client = create_app("inference", check_inference_runtime=False).test_client()
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for duration in durations:
+            install_stub_model(duration, polyphony)
+            wav_path = write_synthetic_wav(os.path.join(tmpdir, f"clip_{duration}s.wav"), duration)
+            job_dirs = []
+
+            def post_clip():
+                with open(wav_path, "rb") as f:
+                    resp = client.post("/process_audio", data={"audio_file": (f, os.path.basename(wav_path))},
+                                       content_type="multipart/form-data")
+                if resp.status_code != 200:
+                    raise RuntimeError(f"/process_audio failed: {resp.get_json()}")
+                job_dirs.append(os.path.dirname(resp.get_json()["midi_relative_path"]))
+
+            stats = measure(post_clip, repeat=repeat)
+            results.append({"case": "process_audio", "duration_s": duration, "polyphony": polyphony, **stats})
+            print(f"process_audio {duration:>6}s median={stats['median_s'] * 1000:9.2f} ms "
+                  f"peak={stats['peak_memory_bytes'] / 1024:9.1f} KiB")
+
+            for job_dir in job_dirs:
+                shutil.rmtree(os.path.join(OUTPUT_DIR, job_dir), ignore_errors=True)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", type=float, nargs="+", default=[10, 60])
+    parser.add_argument("--polyphony", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Path of the JSON results file")
+    args = parser.parse_args()
+
+    results = run(args.durations, args.polyphony, args.repeat)
+    save_results("pipeline", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Compares the basic-pitch inference runtimes (TF / TFLite / ONNX / CoreML) on real audio.
+
+For every runtime and every file in songs/ this records cold latency (model load plus
+first prediction), warm latency, peak resident memory, and how well the notes agree
+with the reference runtime (note-level F1: same pitch, onsets within 50 ms).
+Each runtime runs in its own process so memory numbers don't bleed into each other.
+
+Run from the audio-tab-processor directory:
+    python -m benchmarks.bench_runtimes --runtimes tf tflite onnx
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import resource
+import time
+
+from benchmarks.harness import save_results
+
+SONGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "songs")
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg", ".m4a")
+
+# Two notes are the same if their pitch matches and onsets are this close (seconds)
+ONSET_TOLERANCE = 0.05
+
+
+def _run_runtime(runtime, audio_paths, repeat, queue):
+    """Child process: loads one runtime and transcribes every file."""
+    from basic_pitch.inference import predict
+    from services.model_service import get_model
+
+    try:
+        start = time.perf_counter()
+        model = get_model(runtime)
+        _, _, notes = predict(audio_paths[0], model_or_model_path=model)
+        cold_s = time.perf_counter() - start
+
+        per_file = {}
+        for path in audio_paths:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                _, _, notes = predict(path, model_or_model_path=model)
+                timings.append(time.perf_counter() - start)
+            per_file[os.path.basename(path)] = {
+                "warm_s": min(timings),
+                "notes": [(float(n[0]), int(n[2])) for n in notes],
+            }
+
+        # ru_maxrss is KiB on Linux
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        queue.put({"runtime": runtime, "cold_s": cold_s, "peak_rss_bytes": peak_rss, "files": per_file})
+    except Exception as e:
+        queue.put({"runtime": runtime, "error": str(e)})
+
+
+def note_f1(reference, candidate, tolerance=ONSET_TOLERANCE):
+    """Note-level F1 between two lists of (onset, pitch) tuples."""
+    if not reference and not candidate:
+        return 1.0
+    unmatched = sorted(candidate)
+    matches = 0
+    for onset, pitch in sorted(reference):
+        for i, (c_onset, c_pitch) in enumerate(unmatched):
+            if c_pitch == pitch and abs(c_onset - onset) <= tolerance:
+                matches += 1
+                del unmatched[i]
+                break
+    precision = matches / len(candidate) if candidate else 0.0
+    recall = matches / len(reference) if reference else 0.0
+    return 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+
+def run(runtimes, audio_paths, repeat):
+    ctx = multiprocessing.get_context("spawn")
+    runs = []
+    for runtime in runtimes:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_runtime, args=(runtime, audio_paths, repeat, queue))
+        proc.start()
+        result = queue.get()
+        proc.join()
+        if "error" in result:
+            print(f"{runtime:8} FAILED: {result['error']}")
+            continue
+        runs.append(result)
+
+    if not runs:
+        return []
+
+    reference = runs[0]
+    results = []
+    for result in runs:
+        for name, data in result["files"].items():
+            f1 = note_f1(reference["files"][name]["notes"], data["notes"])
+            results.append({
+                "case": "inference",
+                "runtime": result["runtime"],
+                "file": name,
+                "cold_s": result["cold_s"],
+                "median_s": data["warm_s"],
+                "peak_rss_bytes": result["peak_rss_bytes"],
+                "n_notes": len(data["notes"]),
+                "f1_vs_reference": f1,
+                "reference_runtime": reference["runtime"],
+            })
+            print(f"{result['runtime']:8} {name:30} cold={result['cold_s']:7.2f}s warm={data['warm_s']:7.2f}s "
+                  f"rss={result['peak_rss_bytes'] / 2**20:7.1f} MiB notes={len(data['notes']):5} F1={f1:.3f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runtimes", nargs="+", default=["tf", "tflite", "onnx"],
+                        help="Runtimes to compare; the first one is the reference for note agreement")
+    parser.add_argument("--songs-dir", default=SONGS_DIR)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--output", help="Path of the JSON results file")
+    args = parser.parse_args()
+
+    audio_paths = sorted(p for p in glob.glob(os.path.join(args.songs_dir, "*"))
+                         if p.lower().endswith(AUDIO_EXTENSIONS))
+    if not audio_paths:
+        raise SystemExit(f"No audio files found in {args.songs_dir}")
+
+    results = run(args.runtimes, audio_paths, args.repeat)
+    save_results("runtimes", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
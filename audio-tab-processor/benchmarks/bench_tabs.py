@@ -0,0 +1,74 @@
+"""
+Times the tab algorithms, the auto tuning search and MIDI note extraction on synthetic tracks.
+
+Run from the audio-tab-processor directory:
+    python -m benchmarks.bench_tabs --durations 30 120 600 --polyphony 1 3 6
+"""
+import argparse
+import os
+import shutil
+
+from config import OUTPUT_DIR
+import shared  # noqa: F401
+from stringscribe_common.tab_algorithms.simple import generate_tab_simple
+from stringscribe_common.tab_algorithms.efficient import generate_tab_efficient
+from services.tab_service import get_notes_from_midi, resolve_tab_setup
+from benchmarks.harness import measure, save_results
+from benchmarks.synthetic import make_synthetic_midi
+
+# Synthetic MIDI files live in their own folder under OUTPUT_DIR so that
+# get_notes_from_midi can resolve them like real job outputs.
+BENCH_DIR_NAME = "_bench"
+
+
+def run(durations, polyphonies, notes_per_second, repeat):
+    bench_dir = os.path.join(OUTPUT_DIR, BENCH_DIR_NAME)
+    os.makedirs(bench_dir, exist_ok=True)
+    results = []
+
+    try:
+        for duration in durations:
+            for polyphony in polyphonies:
+                pm = make_synthetic_midi(duration, polyphony, notes_per_second)
+                midi_filename = os.path.join(BENCH_DIR_NAME, f"synthetic_{duration}s_p{polyphony}.mid")
+                pm.write(os.path.join(OUTPUT_DIR, midi_filename))
+                n_notes = sum(len(inst.notes) for inst in pm.instruments)
+
+                cases = {
+                    "generate_tab_simple": lambda: generate_tab_simple(pm),
+                    "generate_tab_efficient": lambda: generate_tab_efficient(pm),
+                    "get_notes_from_midi": lambda: get_notes_from_midi(midi_filename),
+                    "auto_tuning_search": lambda: resolve_tab_setup(pm, "auto", "auto"),
+                }
+                for case, fn in cases.items():
+                    stats = measure(fn, repeat=repeat)
+                    results.append({
+                        "case": case,
+                        "duration_s": duration,
+                        "polyphony": polyphony,
+                        "n_notes": n_notes,
+                        **stats,
+                    })
+                    print(f"{case:24} {duration:>6}s p={polyphony} notes={n_notes:>6} "
+                          f"median={stats['median_s'] * 1000:9.2f} ms peak={stats['peak_memory_bytes'] / 1024:9.1f} KiB")
+    finally:
+        shutil.rmtree(bench_dir, ignore_errors=True)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", type=float, nargs="+", default=[30, 120, 600])
+    parser.add_argument("--polyphony", type=int, nargs="+", default=[1, 3, 6])
+    parser.add_argument("--notes-per-second", type=float, default=4.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Path of the JSON results file")
+    args = parser.parse_args()
+
+    results = run(args.durations, args.polyphony, args.notes_per_second, args.repeat)
+    save_results("tabs", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
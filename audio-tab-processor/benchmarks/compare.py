@@ -0,0 +1,45 @@
+"""
+Compares two benchmark result files and prints the relative change per case.
+
+    python -m benchmarks.compare benchmarks/results/tabs_old.json benchmarks/results/tabs_new.json
+"""
+import argparse
+import json
+
+# Fields that identify a case; everything else in a result row is a measurement
+KEY_FIELDS = ("case", "duration_s", "polyphony", "runtime", "file")
+
+
+def _index(path):
+    with open(path) as f:
+        results = json.load(f)["results"]
+    return {tuple(row.get(k) for k in KEY_FIELDS): row for row in results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="median_s")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown above which a case is flagged as a regression")
+    args = parser.parse_args()
+
+    baseline, candidate = _index(args.baseline), _index(args.candidate)
+    regressions = 0
+    for key in sorted(baseline.keys() & candidate.keys(), key=str):
+        old, new = baseline[key].get(args.metric), candidate[key].get(args.metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        flag = "REGRESSION" if change > args.threshold else ""
+        regressions += bool(flag)
+        label = " ".join(str(k) for k in key if k is not None)
+        print(f"{label:40} {old:12.6f} -> {new:12.6f} {change:+8.1%} {flag}")
+
+    if regressions:
+        raise SystemExit(f"{regressions} case(s) regressed by more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+# Benchmark results are written here unless --output is given
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def measure(fn, repeat=5, warmup=1):
+    """
+    Times a zero-argument callable and records its peak Python memory use.
+
+    Memory is measured in one extra, separate run because tracemalloc slows
+    the code down and would distort the timings.
+
+    Returns:
+        dict: min/median/mean wall time in seconds and peak traced memory in bytes.
+    """
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.fmean(timings),
+        "repeat": repeat,
+        "peak_memory_bytes": peak,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(name, results, output=None):
+    """Writes benchmark results plus run metadata to a JSON file and returns its path."""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+
+    payload = {
+        "benchmark": name,
+        "created_at": datetime.now().isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"Saved results to {output}")
+    return output
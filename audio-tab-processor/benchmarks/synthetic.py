@@ -0,0 +1,74 @@
+import math
+import random
+import wave
+
+import numpy as np
+import pretty_midi
+
+
+def make_synthetic_midi(duration=30.0, polyphony=3, notes_per_second=4.0, seed=0,
+                        min_pitch=40, max_pitch=84):
+    """
+    Builds a deterministic PrettyMIDI track for benchmarking.
+
+    Args:
+        duration (float): Length of the track in seconds.
+        polyphony (int): Maximum number of notes that start together (chord size).
+        notes_per_second (float): How many note onsets (chords) happen per second.
+        seed (int): Random seed, so the same arguments always give the same track.
+        min_pitch (int): Lowest MIDI pitch to generate.
+        max_pitch (int): Highest MIDI pitch to generate.
+
+    Returns:
+        pretty_midi.PrettyMIDI: The generated track with a single guitar instrument.
+    """
+    rng = random.Random(seed)
+    pm = pretty_midi.PrettyMIDI()
+    guitar = pretty_midi.Instrument(program=25)
+
+    n_onsets = int(duration * notes_per_second)
+    for i in range(n_onsets):
+        start = i / notes_per_second
+        length = rng.uniform(0.1, 1.0)
+        chord_size = rng.randint(1, max(1, polyphony))
+        for pitch in rng.sample(range(min_pitch, max_pitch + 1), chord_size):
+            guitar.notes.append(pretty_midi.Note(
+                velocity=rng.randint(60, 110),
+                pitch=pitch,
+                start=start,
+                end=min(duration, start + length),
+            ))
+
+    pm.instruments.append(guitar)
+    return pm
+
+
+def write_synthetic_wav(path, duration=10.0, sample_rate=22050, frequency=220.0):
+    """Writes a mono 16-bit sine-wave WAV file to use as a fake upload."""
+    n_samples = int(duration * sample_rate)
+    t = np.arange(n_samples) / sample_rate
+    samples = (0.3 * np.sin(2 * math.pi * frequency * t) * 32767).astype("<i2")
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return path
+
+
+def render_synthetic_audio(pm, sample_rate=22050):
+    """
+    Renders a PrettyMIDI track to mono float32 audio with plain decaying harmonic tones.
+
+    Crude, but it has the onsets and harmonic peaks real music has, which a sine
+    wave lacks, and needs nothing beyond numpy.
+    """
+    audio = np.zeros(int(pm.get_end_time() * sample_rate) + 1, dtype=np.float32)
+    for instrument in pm.instruments:
+        for note in instrument.notes:
+            start = int(note.start * sample_rate)
+            t = np.arange(int((note.end - note.start) * sample_rate)) / sample_rate
+            frequency = 440.0 * 2 ** ((note.pitch - 69) / 12)
+            tone = sum(np.sin(2 * math.pi * frequency * h * t) / h for h in (1, 2, 3)) * np.exp(-3 * t)
+            audio[start:start + len(t)] += (note.velocity / 127 * 0.1 * tone).astype(np.float32)
+    return audio
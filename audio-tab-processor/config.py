@@ -4,11 +4,96 @@ import os
 # The Main Backend will serve files from this location.
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "processed_files")
 
-# --- Guitar and Music Constants ---
+# --- Deployment ---
 
-# MIDI note numbers for open strings of a standard-tuned guitar (EADGBe)
-# 6th string (E) to 1st string (e)
-GUITAR_OPEN_PITCHES = [40, 45, 50, 55, 59, 64]
+# Which endpoints this process serves:
+#   "all"       - everything (default, single-process setup)
+#   "inference" - /process_audio only; loads the basic-pitch model
+#   "tabs"      - /generate_tabs, /get_midi_notes and /get_pianoroll only; never
+#                 imports TensorFlow, so it starts in well under a second and stays small
+PROCESSOR_ROLES = ("all", "inference", "tabs")
+PROCESSOR_ROLE = os.environ.get("PROCESSOR_ROLE", "all")
 
-# Standard number of frets on a guitar
-MAX_FRET = 22
+PORT = int(os.environ.get("PROCESSOR_PORT", 5002))
+
+# --- Inference ---
+
+# Runtime used to execute the basic-pitch model. The model ships in several
+# formats; TFLite and ONNX are usually faster than TensorFlow on CPU-only hosts.
+#   "default" - whatever basic-pitch picks (the first runtime it finds installed)
+#   "tf", "tflite", "onnx", "coreml"
+INFERENCE_RUNTIMES = ("default", "tf", "tflite", "onnx", "coreml")
+INFERENCE_RUNTIME = os.environ.get("INFERENCE_RUNTIME", "default")
+
+# Micro-batching: audio windows from concurrent jobs are run through the model
+# together, up to INFERENCE_BATCH_SIZE windows per call. A batch waits at most
+# INFERENCE_MAX_WAIT_MS for other jobs to contribute before running anyway.
+INFERENCE_BATCH_SIZE = int(os.environ.get("INFERENCE_BATCH_SIZE", 16))
+INFERENCE_MAX_WAIT_MS = float(os.environ.get("INFERENCE_MAX_WAIT_MS", 20))
+# Longest a job waits for its windows to come back from the model, in seconds,
+# so a request never hangs on a stuck inference worker
+INFERENCE_RESULT_TIMEOUT = float(os.environ.get("INFERENCE_RESULT_TIMEOUT", 600))
+
+# Streaming (/process_audio_stream): notes are published after every
+# STREAM_SEGMENT_WINDOWS model windows (~1.6 s of audio each). Notes that don't end at least
+# STREAM_BOUNDARY_GUARD seconds before the transcribed edge are held back until a later segment.
+STREAM_SEGMENT_WINDOWS = int(os.environ.get("STREAM_SEGMENT_WINDOWS", 8))
+STREAM_BOUNDARY_GUARD = 1.0
+# A preview tab re-renders everything transcribed so far, so previews are spaced out to
+# spend at most this fraction of the stream's time rendering; one last preview follows the final segment.
+STREAM_PREVIEW_TAB_BUDGET = float(os.environ.get("STREAM_PREVIEW_TAB_BUDGET", 0.1))
+
+# Silence skipping: model windows whose loudest SILENCE_FRAME_SIZE-sample frame is
+# below SILENCE_THRESHOLD_DB (RMS, dBFS) aren't sent to the model; they get the
+# model's output for digital silence instead. Off by default (set SKIP_SILENCE=1):
+# the notes only match a full run when the gaps are digital silence, since noise
+# far below the threshold (~-100 dBFS) can make the model emit ghost notes.
+SKIP_SILENCE = os.environ.get("SKIP_SILENCE", "0") == "1"
+SILENCE_THRESHOLD_DB = float(os.environ.get("SILENCE_THRESHOLD_DB", -60))
+SILENCE_FRAME_SIZE = 2048
+
+# Perceptual fingerprints (see services/fingerprint_service.py), used by the backend to
+# spot the same song in another encoding. Audio is analysed at FINGERPRINT_SAMPLE_RATE
+# in frames of FINGERPRINT_HOP samples; the strongest FINGERPRINT_PEAKS_PER_SECOND
+# spectral peaks per second are each paired with the next FINGERPRINT_FAN_OUT peaks,
+# and one in FINGERPRINT_SAMPLING of the resulting hashes is kept.
+FINGERPRINT_SAMPLE_RATE = 11025
+FINGERPRINT_N_FFT = 1024
+FINGERPRINT_HOP = 512
+FINGERPRINT_PEAKS_PER_SECOND = 10
+FINGERPRINT_FAN_OUT = 5
+FINGERPRINT_SAMPLING = 4
+# /fingerprint waits for a job slot like a transcription, costed at this fraction of
+# one (fingerprinting a file takes ~1.5% of the time transcribing it does)
+FINGERPRINT_JOB_COST = 0.02
+
+# Admission control: at most MAX_RUNNING_JOBS transcriptions run at once and
+# MAX_QUEUED_JOBS wait; beyond that /process_audio answers 429 with Retry-After.
+# Waiting jobs are started shortest-first (by audio duration), with per-user fairness.
+MAX_RUNNING_JOBS = int(os.environ.get("MAX_RUNNING_JOBS", 2))
+MAX_QUEUED_JOBS = int(os.environ.get("MAX_QUEUED_JOBS", 16))
+# Assumed cost of a YouTube job until its audio is downloaded, in seconds of audio
+YOUTUBE_DEFAULT_DURATION = 600
+# Initial guess of processing time per second of audio; refined from finished jobs
+DEFAULT_SECONDS_PER_AUDIO_SECOND = 0.5
+
+# Load the model when an inference process starts, so a missing runtime is caught immediately
+CHECK_INFERENCE_RUNTIME = os.environ.get("CHECK_INFERENCE_RUNTIME", "1") == "1"
+
+# --- Batch ---
+
+# Where batch.py writes its outputs by default: one directory per source file and
+# parameter set, under OUTPUT_DIR so the backend can serve them like job outputs
+BATCH_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "batch")
+
+# --- Profiling ---
+
+# Where per-request cProfile dumps are written
+PROFILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+
+# Shared secret callers must send in 'X-Profile-Token' to profile a request.
+# Profiling is disabled entirely when this is not set.
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+
+# The guitar, chord-voicing and piano-roll settings used by the tab code live in
+# stringscribe_common/config.py, since the backend runs that code too.
@@ -0,0 +1,3 @@
+# Shared with the backend; the implementation is in stringscribe_common/metrics.py
+import shared  # noqa: F401
+from stringscribe_common.metrics import REGISTRY, instrument_app, track_stage  # noqa: F401
@@ -0,0 +1,3 @@
+# Shared with the backend; the implementation is in stringscribe_common/profiling.py
+import shared  # noqa: F401
+from stringscribe_common.profiling import init_profiling  # noqa: F401
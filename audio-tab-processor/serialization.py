@@ -0,0 +1,3 @@
+# Shared with the backend; the implementation is in stringscribe_common/serialization.py
+import shared  # noqa: F401
+from stringscribe_common.serialization import init_serialization  # noqa: F401
@@ -1,11 +1,45 @@
+import bisect
 import os
-from basic_pitch.inference import predict_and_save
-from basic_pitch import ICASSP_2022_MODEL_PATH
+
+import numpy as np
+import pretty_midi
+
+from config import (STREAM_SEGMENT_WINDOWS, STREAM_BOUNDARY_GUARD,
+                    SKIP_SILENCE, SILENCE_THRESHOLD_DB, SILENCE_FRAME_SIZE)
+from metrics import REGISTRY, track_stage
+from services.inference_service import (load_audio, window_audio, window_hop_size, unwrap_model_output,
+                                        trim_window_overlap, get_scheduler, silent_window_output)
+
+# NOTE: basic_pitch (and the TensorFlow runtime behind it) is imported inside the
+# functions below rather than here. Importing it costs seconds and hundreds of MB,
+# and processes that only serve the tab endpoints never need it.
+
+# Sample rate used when rendering the predicted MIDI back to audio
+SONIFICATION_SAMPLE_RATE = 44100
+
+# Raw model output kept in each job directory for re-thresholding
+MODEL_OUTPUT_FILENAME = "model_output.npz"
+
+# Note creation scales its onsets by the largest one it is given, so re-running it on
+# part of a file can move a note's start by a frame or two. While streaming, a note
+# within this many frames of a reported one of the same pitch is taken to be that note.
+NOTE_MATCH_FRAMES = range(-2, 3)
+
+INFERENCE_WINDOWS = REGISTRY.counter(
+    "stringscribe_inference_windows_total", "Model windows per job, by whether they ran or were skipped as silent.",
+    ("result",))
+SILENCE_SECONDS_SAVED = REGISTRY.histogram(
+    "stringscribe_silence_inference_seconds_saved", "Estimated model time saved per job by skipping silent windows.",
+    buckets=(0, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+
 
 def process_audio_file(audio_path, out_dir, params=None):
     """
     Processes an audio file using the basic-pitch library to generate MIDI and WAV files.
 
+    Inference, MIDI writing and sonification are run as separate steps (rather than
+    through predict_and_save) so that each one shows up as its own stage in /metrics.
+
     Args:
         audio_path (str): The full path to the input audio file.
         out_dir (str): The directory where the output files will be saved.
@@ -17,26 +51,328 @@ def process_audio_file(audio_path, out_dir, params=None):
     params = params or {}
     print(f"Processing audio file: {audio_path} with params: {params}")
 
-    # Use basic-pitch to predict notes and create MIDI
-    predict_and_save(
-        audio_path_list=[audio_path],
-        output_directory=out_dir,
-        save_model_outputs=False,
-        # CORRECTED: The parameter name should be 'model_or_model_path'
-        model_or_model_path=ICASSP_2022_MODEL_PATH,
-        save_midi=True,
-        sonify_midi=True,
-        save_notes=False,
-        onset_threshold=params.get("onset_threshold", 0.5),
-        frame_threshold=params.get("frame_threshold", 0.3),
-        minimum_note_length=params.get("minimum_note_length", 120),
-        minimum_frequency=params.get("minimum_frequency"),
-        maximum_frequency=params.get("maximum_frequency"),
-    )
+    midi_data = transcribe(audio_path, params, out_dir)
+    return save_outputs(midi_data, audio_path, out_dir)
+
+
+def save_outputs(midi_data, audio_path, out_dir):
+    """
+    Writes the transcribed MIDI and its sonified WAV into out_dir.
 
-    # Find the generated files in the output directory
-    midi_path = next((os.path.join(out_dir, f) for f in os.listdir(out_dir) if f.endswith(".mid")), None)
-    wav_path = next((os.path.join(out_dir, f) for f in os.listdir(out_dir) if f.endswith(".wav")), None)
+    Returns:
+        (str, str): The MIDI path and the WAV path (None if sonification failed).
+    """
+    # Keep the same file names predict_and_save would have produced
+    base_name = os.path.splitext(os.path.basename(audio_path))[0] + "_basic_pitch"
+    midi_path = os.path.join(out_dir, base_name + ".mid")
+    wav_path = os.path.join(out_dir, base_name + ".wav")
+
+    with track_stage("midi_write"):
+        midi_data.write(midi_path)
+
+    from basic_pitch import note_creation
+
+    try:
+        with track_stage("sonify"):
+            note_creation.sonify_midi(midi_data, wav_path, sr=SONIFICATION_SAMPLE_RATE)
+    except Exception as e:
+        print(f"Failed to sonify MIDI for {audio_path}: {e}")
+        wav_path = None
 
     return midi_path, wav_path
 
+
+def transcribe(audio_path, params, out_dir=None):
+    """
+    Runs the basic-pitch model over an audio file.
+
+    The model call goes through the shared inference scheduler, so windows from
+    concurrent requests are batched together. Silent windows are skipped (see
+    active_windows and SKIP_SILENCE in config.py).
+
+    Args:
+        audio_path (str): The full path to the input audio file.
+        params (dict): Note extraction thresholds, the pitch range and optionally
+            the inference 'runtime' to use.
+        out_dir (str): If given, the raw model output is saved there so the job
+            can later be re-thresholded without running the model again.
+
+    Returns:
+        pretty_midi.PrettyMIDI: The transcribed notes.
+    """
+    with track_stage("decode"):
+        audio = load_audio(audio_path)
+    windows = window_audio(audio)
+
+    with track_stage("vad"):
+        active = active_windows(windows) if SKIP_SILENCE else None
+
+    with track_stage("inference"):
+        window_outputs = infer_windows(windows, active, params.get("runtime"))
+        model_output = unwrap_model_output(window_outputs, len(audio))
+    report_skipped_windows(audio_path, active)
+
+    if out_dir:
+        save_model_output(model_output, out_dir)
+
+    with track_stage("note_creation"):
+        return notes_from_model_output(model_output, params)
+
+
+def transcribe_incrementally(audio_path, params, out_dir=None, segment_windows=STREAM_SEGMENT_WINDOWS):
+    """
+    Transcribes an audio file segment by segment, yielding notes as soon as they are final.
+
+    After each segment of model windows finishes, note creation is re-run over the
+    recent part of the transcription only, starting STREAM_BOUNDARY_GUARD seconds
+    before the earliest note that may still be unreported, so each segment costs
+    about the same however long the file is. A note is reported once it ends
+    before the covered audio minus the guard; one still sounding there is held
+    back until a later segment shows where it ends. The last segment runs note
+    creation over the whole file, so the last PrettyMIDI yielded is the same as the
+    one transcribe() would have returned; earlier ones hold the notes reported so far.
+
+    If out_dir is given, the complete model output is saved there (see save_model_output).
+
+    Yields:
+        (list, pretty_midi.PrettyMIDI): New note dicts ({'pitch', 'start', 'end'})
+        and the transcription so far.
+    """
+    from basic_pitch.constants import AUDIO_SAMPLE_RATE, ANNOT_N_FRAMES, FFT_HOP
+    from basic_pitch.note_creation import model_frames_to_time
+
+    frames_per_second = AUDIO_SAMPLE_RATE / FFT_HOP
+
+    with track_stage("decode"):
+        audio = load_audio(audio_path)
+    windows = window_audio(audio)
+    hop_size = window_hop_size()
+
+    with track_stage("vad"):
+        active = active_windows(windows) if SKIP_SILENCE else None
+
+    # Raw model output of each segment, unwrapped in one go after the last one
+    window_outputs = {}
+    # The same with the window overlaps removed, and the frame each segment starts at
+    frames = {}
+    segment_starts = [0]
+
+    so_far = pretty_midi.PrettyMIDI()
+    so_far.instruments.append(pretty_midi.Instrument(pretty_midi.instrument_name_to_program("Electric Piano 1")))
+    reported = set()
+    # Every note starting before this time has been reported
+    settled_until = 0.0
+
+    for start in range(0, len(windows), segment_windows):
+        segment = windows[start:start + segment_windows]
+        segment_active = active[start:start + segment_windows] if active is not None else None
+        with track_stage("inference"):
+            segment_outputs = infer_windows(segment, segment_active, params.get("runtime"))
+        for key, value in segment_outputs.items():
+            window_outputs.setdefault(key, []).append(value)
+            frames.setdefault(key, []).append(trim_window_overlap(value))
+        segment_starts.append(segment_starts[-1] + len(frames["note"][-1]))
+
+        is_last = start + segment_windows >= len(windows)
+        if is_last:
+            model_output = unwrap_model_output({k: np.concatenate(v) for k, v in window_outputs.items()}, len(audio))
+            report_skipped_windows(audio_path, active)
+            if out_dir:
+                save_model_output(model_output, out_dir)
+            with track_stage("note_creation"):
+                midi_data = notes_from_model_output(model_output, params)
+            notes = [note for instrument in midi_data.instruments for note in instrument.notes]
+            cutoff = float("inf")
+        else:
+            # Start on a multiple of the model's window length, where basic-pitch's
+            # frame times are a plain shift of the times it gives a whole file
+            first_frame = int(max(0.0, settled_until - STREAM_BOUNDARY_GUARD) * frames_per_second)
+            first_frame -= first_frame % ANNOT_N_FRAMES
+            first_segment = bisect.bisect_right(segment_starts, first_frame) - 1
+            recent_output = {k: np.concatenate(v[first_segment:])[first_frame - segment_starts[first_segment]:]
+                             for k, v in frames.items()}
+            with track_stage("note_creation"):
+                recent = notes_from_model_output(recent_output, params)
+            offset = model_frames_to_time(first_frame + 1)[first_frame]
+            notes = [pretty_midi.Note(note.velocity, note.pitch, note.start + offset, note.end + offset)
+                     for instrument in recent.instruments for note in instrument.notes]
+            covered = min(len(audio), (start + len(segment)) * hop_size)
+            cutoff = covered / AUDIO_SAMPLE_RATE - STREAM_BOUNDARY_GUARD
+            midi_data = so_far
+
+        new_notes = []
+        held_from = cutoff
+        for note in notes:
+            # The last pass goes over every note, catching any that earlier passes never saw
+            if note.start < settled_until and not is_last:
+                continue
+            key = (note.pitch, round(note.start * frames_per_second))
+            if any((note.pitch, key[1] + shift) in reported for shift in NOTE_MATCH_FRAMES):
+                continue
+            if note.end < cutoff:
+                reported.add(key)
+                new_notes.append(note)
+            elif note.start < cutoff:
+                held_from = min(held_from, note.start)
+        settled_until = held_from
+
+        if midi_data is so_far:
+            so_far.instruments[0].notes.extend(new_notes)
+        # basic-pitch gives numpy numbers, which the SSE events' json.dumps can't encode
+        yield sorted(({'pitch': int(note.pitch), 'start': float(note.start), 'end': float(note.end)}
+                      for note in new_notes),
+                     key=lambda n: n['start']), midi_data
+
+
+def active_windows(windows, threshold_db=SILENCE_THRESHOLD_DB, frame_size=SILENCE_FRAME_SIZE):
+    """
+    Energy pre-pass: finds the model windows that contain any sound.
+
+    Each window is cut into frame_size-sample frames; a window is active when its
+    loudest frame's RMS level is above threshold_db (dBFS). Windows overlap, so a
+    note near a window edge keeps both windows it falls in active.
+
+    Args:
+        windows (np.ndarray): Windows from window_audio, shaped (n_windows, samples, 1).
+
+    Returns:
+        np.ndarray: Boolean mask, one entry per window.
+    """
+    squared = np.square(windows[:, :, 0])
+    starts = np.arange(0, squared.shape[1], frame_size)
+    lengths = np.diff(np.append(starts, squared.shape[1]))
+    mean_power = np.add.reduceat(squared, starts, axis=1) / lengths
+    return (mean_power > 10 ** (threshold_db / 10)).any(axis=1)
+
+
+def infer_windows(windows, active=None, runtime=None):
+    """
+    Runs the model over the active windows only.
+
+    Silent windows get the model's output for an all-zero window, so after
+    unwrapping the posteriorgram covers the original timeline and note times
+    need no remapping. For digital silence this is exactly what running the
+    model would give; faint noise below the silence threshold can make the model
+    emit ghost notes, which skipping drops (see SKIP_SILENCE in config.py).
+
+    Args:
+        windows (np.ndarray): Windows from window_audio.
+        active (np.ndarray): Mask from active_windows, or None to run every window.
+        runtime (str): Inference runtime to use, or None for the configured default.
+
+    Returns:
+        dict: "note", "onset" and "contour" arrays, one row per window.
+    """
+    if active is None or active.all():
+        return get_scheduler().infer(windows, runtime)
+
+    outputs = {key: np.repeat(value, len(windows), axis=0)
+               for key, value in silent_window_output(runtime).items()}
+    if active.any():
+        for key, value in get_scheduler().infer(windows[active], runtime).items():
+            outputs[key][active] = value
+    return outputs
+
+
+def report_skipped_windows(audio_path, active):
+    """Records how many windows a job skipped as silent and roughly how much model time that saved."""
+    if active is None:
+        return
+    n_skipped = int(len(active) - np.count_nonzero(active))
+    INFERENCE_WINDOWS.inc(len(active) - n_skipped, result="run")
+    INFERENCE_WINDOWS.inc(n_skipped, result="skipped")
+
+    seconds_per_window = get_scheduler().seconds_per_window
+    if seconds_per_window is not None:
+        saved = n_skipped * seconds_per_window
+        SILENCE_SECONDS_SAVED.observe(saved)
+        if n_skipped:
+            print(f"Skipped {n_skipped}/{len(active)} silent windows in {audio_path}, ~{saved:.2f}s of inference saved")
+
+
+def notes_from_model_output(model_output, params):
+    """
+    Turns the model's posteriorgrams into MIDI, the same way basic-pitch's predict() does.
+
+    Args:
+        model_output (dict): "note", "onset" and "contour" matrices from run_inference.
+        params (dict): Note extraction thresholds and the pitch range.
+
+    Returns:
+        pretty_midi.PrettyMIDI: The extracted notes.
+    """
+    from basic_pitch import note_creation
+    from basic_pitch.constants import AUDIO_SAMPLE_RATE, FFT_HOP
+
+    # minimum_note_length is in milliseconds; the model works in frames
+    min_note_len = int(np.round(params.get("minimum_note_length", 120) / 1000 * (AUDIO_SAMPLE_RATE / FFT_HOP)))
+    midi_data, _ = note_creation.model_output_to_notes(
+        model_output,
+        onset_thresh=params.get("onset_threshold", 0.5),
+        frame_thresh=params.get("frame_threshold", 0.3),
+        min_note_len=min_note_len,
+        min_freq=params.get("minimum_frequency"),
+        max_freq=params.get("maximum_frequency"),
+        multiple_pitch_bends=False,
+        melodia_trick=True,
+    )
+    return midi_data
+
+
+def save_model_output(model_output, out_dir):
+    """
+    Saves the model's posteriorgrams next to the job's MIDI as a compressed .npz.
+
+    Values are probabilities in [0, 1], so float16 keeps them well within the
+    precision thresholds are set with while halving the size before compression.
+    """
+    with track_stage("model_output_save"):
+        np.savez_compressed(
+            os.path.join(out_dir, MODEL_OUTPUT_FILENAME),
+            **{key: value.astype(np.float16) for key, value in model_output.items()},
+        )
+
+
+def load_model_output(job_dir):
+    """
+    Loads the posteriorgrams saved by save_model_output.
+
+    Raises:
+        FileNotFoundError: If the job has no saved model output.
+    """
+    path = os.path.join(job_dir, MODEL_OUTPUT_FILENAME)
+    if not os.path.exists(path):
+        raise FileNotFoundError("No saved model output for this job.")
+    with np.load(path) as data:
+        return {key: data[key].astype(np.float32) for key in data.files}
+
+
+def rethreshold_job(midi_path, params, sonify=False):
+    """
+    Re-runs note extraction for a finished job with new thresholds, without the model.
+
+    The job's MIDI file is rewritten in place. Its WAV is only re-rendered when
+    sonify is True, since that takes far longer than the note extraction itself.
+
+    Args:
+        midi_path (str): Full path of the job's existing MIDI file.
+        params (dict): New note extraction thresholds and pitch range.
+        sonify (bool): Whether to also regenerate the WAV.
+
+    Returns:
+        (str, str): The MIDI path and the regenerated WAV path (None if not sonified).
+    """
+    model_output = load_model_output(os.path.dirname(midi_path))
+
+    with track_stage("note_creation"):
+        midi_data = notes_from_model_output(model_output, params)
+    with track_stage("midi_write"):
+        midi_data.write(midi_path)
+
+    wav_path = None
+    if sonify:
+        from basic_pitch import note_creation
+        wav_path = os.path.splitext(midi_path)[0] + ".wav"
+        with track_stage("sonify"):
+            note_creation.sonify_midi(midi_data, wav_path, sr=SONIFICATION_SAMPLE_RATE)
+    return midi_path, wav_path
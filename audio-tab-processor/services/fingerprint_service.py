@@ -0,0 +1,79 @@
+import numpy as np
+
+from config import (FINGERPRINT_SAMPLE_RATE, FINGERPRINT_N_FFT, FINGERPRINT_HOP, FINGERPRINT_PEAKS_PER_SECOND,
+                    FINGERPRINT_FAN_OUT, FINGERPRINT_SAMPLING)
+from metrics import track_stage
+
+# Neighbourhood (frequency bins, frames) a spectral peak must be the maximum of
+PEAK_NEIGHBOURHOOD = (15, 11)
+# Peaks quieter than this, relative to the loudest bin of the track, are ignored
+PEAK_FLOOR_DB = -50
+# A peak is only paired with later peaks at most this many frames (~2.9 s) away
+MAX_PAIR_FRAMES = 63
+
+
+def fingerprint_audio(audio, sample_rate):
+    """
+    Computes a landmark fingerprint of decoded audio, robust to re-encoding.
+
+    The strongest spectral peaks are found on a log-magnitude spectrogram, and each
+    one is paired with the next few peaks. A pair is hashed from the two peak
+    frequencies and their distance in frames, which survive MP3/AAC compression,
+    resampling and level changes, unlike the raw bytes. Each hash keeps the frame of
+    its first peak, so a matcher can check that many hashes line up at one time offset.
+
+    Args:
+        audio (np.ndarray): Mono audio samples.
+        sample_rate (int): Their sample rate; audio is resampled to FINGERPRINT_SAMPLE_RATE.
+
+    Returns:
+        (np.ndarray, np.ndarray): int32 hashes and the int32 frame each one starts at.
+    """
+    import librosa
+    from scipy.ndimage import maximum_filter
+
+    if sample_rate != FINGERPRINT_SAMPLE_RATE:
+        audio = librosa.resample(audio, orig_sr=sample_rate, target_sr=FINGERPRINT_SAMPLE_RATE, res_type="polyphase")
+    if len(audio) < FINGERPRINT_N_FFT:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+
+    spectrum = np.abs(librosa.stft(audio, n_fft=FINGERPRINT_N_FFT, hop_length=FINGERPRINT_HOP))
+    spectrum = librosa.amplitude_to_db(spectrum, ref=np.max)
+
+    is_peak = (spectrum == maximum_filter(spectrum, size=PEAK_NEIGHBOURHOOD)) & (spectrum > PEAK_FLOOR_DB)
+    freqs, frames = np.nonzero(is_peak)
+    strengths = spectrum[freqs, frames]
+
+    # Keep the strongest peaks of each second, so density doesn't depend on how busy the music is
+    frames_per_second = FINGERPRINT_SAMPLE_RATE / FINGERPRINT_HOP
+    second = (frames / frames_per_second).astype(np.int64)
+    order = np.lexsort((-strengths, second))
+    rank = np.arange(len(order)) - np.searchsorted(second[order], second[order])
+    keep = order[rank < FINGERPRINT_PEAKS_PER_SECOND]
+    keep = keep[np.lexsort((freqs[keep], frames[keep]))]
+    freqs, frames = freqs[keep].astype(np.int64), frames[keep].astype(np.int64)
+
+    hashes, offsets = [], []
+    for k in range(1, FINGERPRINT_FAN_OUT + 1):
+        dt = frames[k:] - frames[:-k]
+        ok = (dt > 0) & (dt <= MAX_PAIR_FRAMES)
+        # 10 bits per frequency bin (FINGERPRINT_N_FFT // 2 + 1 bins) and 6 bits of time delta
+        hashes.append((freqs[:-k][ok] << 16) | (freqs[k:][ok] << 6) | dt[ok])
+        offsets.append(frames[:-k][ok])
+    hashes, offsets = np.concatenate(hashes), np.concatenate(offsets)
+
+    # Deterministic subsampling: a hash is kept or dropped the same way in every track,
+    # so matching still works while the index is FINGERPRINT_SAMPLING times smaller.
+    mixed = (hashes * 2654435761) & 0xFFFFFFFF
+    keep = mixed % FINGERPRINT_SAMPLING == 0
+    return hashes[keep].astype(np.int32), offsets[keep].astype(np.int32)
+
+
+def fingerprint_file(audio_path):
+    """Decodes an audio file and fingerprints it (see fingerprint_audio)."""
+    import librosa
+
+    with track_stage("fingerprint_decode"):
+        audio, _ = librosa.load(str(audio_path), sr=FINGERPRINT_SAMPLE_RATE, mono=True)
+    with track_stage("fingerprint"):
+        return fingerprint_audio(audio, FINGERPRINT_SAMPLE_RATE)
@@ -0,0 +1,261 @@
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+from config import INFERENCE_BATCH_SIZE, INFERENCE_MAX_WAIT_MS, INFERENCE_RESULT_TIMEOUT
+from metrics import REGISTRY
+from services.model_service import get_model
+
+# Same window overlap basic-pitch's own run_inference uses
+N_OVERLAPPING_FRAMES = 30
+
+BATCH_WINDOWS = REGISTRY.histogram(
+    "stringscribe_inference_batch_windows", "Audio windows per model call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+BATCH_JOBS = REGISTRY.histogram(
+    "stringscribe_inference_batch_jobs", "Distinct jobs sharing one model call.",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16))
+
+
+def load_audio(audio_path):
+    """Decodes an audio file to mono float32 at the model's sample rate."""
+    import librosa
+    from basic_pitch.constants import AUDIO_SAMPLE_RATE
+
+    audio, _ = librosa.load(str(audio_path), sr=AUDIO_SAMPLE_RATE, mono=True)
+    return audio
+
+
+def window_hop_size():
+    """Number of audio samples between the starts of two consecutive model windows."""
+    from basic_pitch.constants import AUDIO_N_SAMPLES, FFT_HOP
+
+    return AUDIO_N_SAMPLES - N_OVERLAPPING_FRAMES * FFT_HOP
+
+
+def window_audio(audio):
+    """
+    Cuts audio into the overlapping, fixed-size windows the model expects.
+
+    Mirrors basic_pitch.inference.get_audio_input, but works on an in-memory array.
+
+    Returns:
+        np.ndarray: Windows shaped (n_windows, AUDIO_N_SAMPLES, 1).
+    """
+    from basic_pitch.constants import AUDIO_N_SAMPLES, FFT_HOP
+
+    overlap_len = N_OVERLAPPING_FRAMES * FFT_HOP
+    hop_size = window_hop_size()
+    padded = np.concatenate([np.zeros(overlap_len // 2, dtype=np.float32), audio.astype(np.float32)])
+
+    n_windows = max(1, int(np.ceil(len(padded) / hop_size)))
+    windows = np.zeros((n_windows, AUDIO_N_SAMPLES, 1), dtype=np.float32)
+    for i in range(n_windows):
+        chunk = padded[i * hop_size:i * hop_size + AUDIO_N_SAMPLES]
+        windows[i, :len(chunk), 0] = chunk
+    return windows
+
+
+def unwrap_model_output(window_outputs, original_length):
+    """Stitches per-window model outputs back into one (frames, bins) matrix per output."""
+    from basic_pitch.inference import unwrap_output
+
+    return {k: unwrap_output(v, original_length, N_OVERLAPPING_FRAMES) for k, v in window_outputs.items()}
+
+
+def trim_window_overlap(window_output):
+    """
+    Drops the overlapping frames at both ends of each window and joins the windows.
+
+    This is unwrap_output without its final cut to the audio length, so a segment
+    of windows can be unwrapped on its own and the pieces concatenated.
+    """
+    n_olap = N_OVERLAPPING_FRAMES // 2
+    trimmed = window_output[:, n_olap:-n_olap, :]
+    return trimmed.reshape(-1, trimmed.shape[2])
+
+
+class _Job:
+    def __init__(self, n_windows):
+        self.future = Future()
+        self.outputs = {}
+        self.n_windows = n_windows
+        self.remaining = n_windows
+
+    def set_result(self, result):
+        # The waiting caller may have cancelled the future after timing out
+        try:
+            self.future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def set_exception(self, error):
+        try:
+            self.future.set_exception(error)
+        except InvalidStateError:
+            pass
+
+
+class InferenceScheduler:
+    """
+    Batches model windows from all in-flight jobs into shared model calls.
+
+    Request threads decode and window their own audio, then hand the windows to
+    submit(). A single worker thread per process pulls windows from every job,
+    waits at most max_wait_ms for a batch to fill up to batch_size windows, runs
+    the model once, and scatters the outputs back to the jobs they came from.
+    If anything goes wrong with a batch, every job in it fails with the error and
+    the worker carries on with the next batch.
+    """
+
+    def __init__(self, batch_size=INFERENCE_BATCH_SIZE, max_wait_ms=INFERENCE_MAX_WAIT_MS):
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        # Pending slices: (runtime, job, start, windows)
+        self._pending = deque()
+        self._cond = threading.Condition()
+        # Moving average of model time per window, used to estimate time saved by skipped windows
+        self.seconds_per_window = None
+        self._worker = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, windows, runtime=None):
+        """
+        Queues a job's windows for inference.
+
+        Returns:
+            Future: Resolves to {"note", "onset", "contour"} arrays, one row per window.
+        """
+        job = _Job(len(windows))
+        with self._cond:
+            for start in range(0, len(windows), self.batch_size):
+                self._pending.append((runtime, job, start, windows[start:start + self.batch_size]))
+            self._cond.notify()
+        return job.future
+
+    def infer(self, windows, runtime=None, timeout=INFERENCE_RESULT_TIMEOUT):
+        """
+        Queues a job's windows and waits for the model's outputs.
+
+        Raises TimeoutError if they aren't back within timeout seconds, in which
+        case the job's windows that haven't run yet are dropped from the queue.
+        """
+        future = self.submit(windows, runtime)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Inference did not finish within {timeout:g}s") from None
+
+    def _next_batch(self):
+        """Blocks for the first slice, then gathers more of the same runtime until full or timed out."""
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            runtime = self._pending[0][0]
+            deadline = time.monotonic() + self.max_wait
+            batch, size = [], 0
+            while True:
+                for item in list(self._pending):
+                    if item[1].future.done():
+                        # Its job already failed or was cancelled
+                        self._pending.remove(item)
+                    elif item[0] == runtime and size + len(item[3]) <= self.batch_size:
+                        self._pending.remove(item)
+                        batch.append(item)
+                        size += len(item[3])
+                remaining = deadline - time.monotonic()
+                if size >= self.batch_size or remaining <= 0:
+                    return runtime, batch
+                self._cond.wait(remaining)
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                runtime, batch = self._next_batch()
+                if batch:
+                    self._run_batch(runtime, batch)
+            except Exception as e:
+                traceback.print_exc()
+                for _, job, _, _ in batch:
+                    job.set_exception(e)
+
+    def _run_batch(self, runtime, batch):
+        """Runs one batch through the model and hands each job its share of the outputs."""
+        model = get_model(runtime)
+        inputs = np.concatenate([item[3] for item in batch])
+        started = time.perf_counter()
+        output = model.predict(inputs)
+        per_window = (time.perf_counter() - started) / len(inputs)
+
+        self.seconds_per_window = (per_window if self.seconds_per_window is None
+                                   else 0.9 * self.seconds_per_window + 0.1 * per_window)
+        BATCH_WINDOWS.observe(sum(len(item[3]) for item in batch))
+        BATCH_JOBS.observe(len({id(item[1]) for item in batch}))
+
+        offset = 0
+        for _, job, start, windows in batch:
+            if job.future.done():
+                offset += len(windows)
+                continue
+            for key, value in output.items():
+                if key not in job.outputs:
+                    job.outputs[key] = np.zeros((job.n_windows,) + value.shape[1:], dtype=value.dtype)
+                job.outputs[key][start:start + len(windows)] = value[offset:offset + len(windows)]
+            offset += len(windows)
+            job.remaining -= len(windows)
+            if job.remaining == 0:
+                job.set_result(job.outputs)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Returns the process-wide scheduler, starting its worker thread on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = InferenceScheduler()
+    return _scheduler
+
+
+_silent_outputs = {}
+
+
+def silent_window_output(runtime=None):
+    """
+    Returns the model's output for one all-zero window ({"note", "onset", "contour"}, one row).
+
+    Computed once per runtime and reused for every window skipped as silent.
+    """
+    output = _silent_outputs.get(runtime)
+    if output is None:
+        from basic_pitch.constants import AUDIO_N_SAMPLES
+
+        zeros = np.zeros((1, AUDIO_N_SAMPLES, 1), dtype=np.float32)
+        output = _silent_outputs[runtime] = get_scheduler().infer(zeros, runtime)
+    return output
+
+
+def run_inference(audio, runtime=None):
+    """
+    Runs the model over decoded audio through the shared scheduler.
+
+    Args:
+        audio (np.ndarray): Mono audio at the model's sample rate (see load_audio).
+        runtime (str): Inference runtime to use, or None for the configured default.
+
+    Returns:
+        dict: The model's "note", "onset" and "contour" posteriorgrams, shaped (frames, bins).
+    """
+    windows = window_audio(audio)
+    window_outputs = get_scheduler().infer(windows, runtime)
+    return unwrap_model_output(window_outputs, len(audio))
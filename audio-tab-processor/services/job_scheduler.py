@@ -0,0 +1,159 @@
+import itertools
+import math
+import os
+import threading
+import time
+from collections import Counter
+
+from config import MAX_RUNNING_JOBS, MAX_QUEUED_JOBS, DEFAULT_SECONDS_PER_AUDIO_SECOND
+from metrics import REGISTRY
+
+QUEUED_JOBS = REGISTRY.gauge("stringscribe_jobs_queued", "Transcription jobs waiting for a slot.")
+RUNNING_JOBS = REGISTRY.gauge("stringscribe_jobs_running", "Transcription jobs currently running.")
+REJECTED_JOBS = REGISTRY.counter("stringscribe_jobs_rejected_total", "Jobs turned away because the queue was full.")
+
+
+class QueueFull(Exception):
+    """Raised when a job can't be admitted because the wait queue is full."""
+
+    def __init__(self, retry_after):
+        super().__init__("Processing queue is full")
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """
+    A job's place in the scheduler. Use it as a context manager: entering waits
+    until the job is picked to run, leaving frees its slot.
+    """
+
+    def __init__(self, scheduler, cost, user_id, seq):
+        self.scheduler = scheduler
+        self.cost = cost
+        self.user_id = user_id
+        self.seq = seq
+        self.state = "waiting"
+        self.started_at = None
+
+    def __enter__(self):
+        self.scheduler._wait_for_turn(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.scheduler._release(self)
+        return False
+
+    def cancel(self):
+        """Drops the ticket if it never ran (e.g. the client went away). Safe to call more than once."""
+        self.scheduler._release(self)
+
+    def refine_cost(self, cost):
+        """Replaces the estimated cost once the real audio duration is known (e.g. after a download)."""
+        self.scheduler._set_cost(self, cost)
+
+
+class JobScheduler:
+    """
+    Admission control and shortest-job-first scheduling for transcription jobs.
+
+    At most max_running jobs run at once and at most max_queued wait; anything
+    beyond that is rejected with QueueFull so the caller can answer 429. When a
+    slot frees up, the waiting job picked next is the one whose user has the
+    fewest jobs running (per-user fairness), then the one with the shortest
+    estimated cost (audio seconds), then the oldest.
+    """
+
+    def __init__(self, max_running=MAX_RUNNING_JOBS, max_queued=MAX_QUEUED_JOBS):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._running = 0
+        self._running_by_user = Counter()
+        self._seq = itertools.count()
+        # Moving average of processing seconds per second of audio, used for Retry-After
+        self._seconds_per_audio_second = DEFAULT_SECONDS_PER_AUDIO_SECOND
+
+    def admit(self, cost, user_id):
+        """
+        Reserves a place for a job, or raises QueueFull.
+
+        Args:
+            cost (float): Estimated audio duration of the job, in seconds.
+            user_id (str): Who the job is for, used for fairness.
+        """
+        with self._cond:
+            if len(self._waiting) >= self.max_queued and self._running >= self.max_running:
+                REJECTED_JOBS.inc()
+                raise QueueFull(self._retry_after())
+            ticket = Ticket(self, cost, user_id, next(self._seq))
+            self._waiting.append(ticket)
+            QUEUED_JOBS.set(len(self._waiting))
+            return ticket
+
+    def _retry_after(self):
+        queued_cost = sum(t.cost for t in self._waiting)
+        return max(1, math.ceil(queued_cost * self._seconds_per_audio_second / self.max_running))
+
+    def _next_ticket(self):
+        return min(self._waiting, key=lambda t: (self._running_by_user[t.user_id], t.cost, t.seq))
+
+    def _wait_for_turn(self, ticket):
+        with self._cond:
+            while not (self._running < self.max_running and self._next_ticket() is ticket):
+                self._cond.wait()
+            self._waiting.remove(ticket)
+            self._running += 1
+            self._running_by_user[ticket.user_id] += 1
+            ticket.state = "running"
+            ticket.started_at = time.monotonic()
+            QUEUED_JOBS.set(len(self._waiting))
+            RUNNING_JOBS.set(self._running)
+
+    def _set_cost(self, ticket, cost):
+        with self._cond:
+            ticket.cost = cost
+            # A waiting job's place in the shortest-first order may have changed
+            self._cond.notify_all()
+
+    def _release(self, ticket):
+        with self._cond:
+            if ticket.state == "waiting":
+                self._waiting.remove(ticket)
+            elif ticket.state == "running":
+                self._running -= 1
+                self._running_by_user[ticket.user_id] -= 1
+                if not self._running_by_user[ticket.user_id]:
+                    del self._running_by_user[ticket.user_id]
+                if ticket.cost > 0:
+                    observed = (time.monotonic() - ticket.started_at) / ticket.cost
+                    self._seconds_per_audio_second = 0.8 * self._seconds_per_audio_second + 0.2 * observed
+            else:
+                return
+            ticket.state = "done"
+            QUEUED_JOBS.set(len(self._waiting))
+            RUNNING_JOBS.set(self._running)
+            self._cond.notify_all()
+
+
+def estimate_audio_duration(audio_path):
+    """
+    Returns the duration of an audio file in seconds, read from its headers where possible.
+
+    Falls back to a size-based guess (assuming ~128 kbit/s) for formats that can't be read.
+    """
+    try:
+        import soundfile
+        return soundfile.info(audio_path).duration
+    except Exception:
+        pass
+    try:
+        import audioread
+        with audioread.audio_open(audio_path) as f:
+            return f.duration
+    except Exception:
+        pass
+    return os.path.getsize(audio_path) / 16000
+
+
+scheduler = JobScheduler()
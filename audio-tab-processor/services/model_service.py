@@ -0,0 +1,72 @@
+import threading
+
+from config import INFERENCE_RUNTIME, INFERENCE_RUNTIMES
+
+# basic-pitch flag telling whether each runtime's library could be imported
+_RUNTIME_FLAGS = {
+    "tf": "TF_PRESENT",
+    "tflite": "TFLITE_PRESENT",
+    "onnx": "ONNX_PRESENT",
+    "coreml": "CT_PRESENT",
+}
+
+# Loaded models, one per runtime, shared by all requests
+_models = {}
+_models_lock = threading.Lock()
+
+
+def available_runtimes():
+    """Returns the inference runtimes whose libraries are installed in this environment."""
+    import basic_pitch
+    return ["default"] + [name for name, flag in _RUNTIME_FLAGS.items() if getattr(basic_pitch, flag, False)]
+
+
+def model_path_for(runtime):
+    """
+    Returns the bundled ICASSP 2022 model file for a runtime.
+
+    'default' keeps basic-pitch's own choice (ICASSP_2022_MODEL_PATH), which is the
+    first runtime it finds installed.
+    """
+    from basic_pitch import ICASSP_2022_MODEL_PATH, FilenameSuffix, build_icassp_2022_model_path
+
+    if runtime == "default":
+        return ICASSP_2022_MODEL_PATH
+    return build_icassp_2022_model_path(FilenameSuffix[runtime])
+
+
+def get_model(runtime=None):
+    """
+    Returns a loaded basic-pitch Model for the runtime, loading it on first use.
+
+    Args:
+        runtime (str): One of INFERENCE_RUNTIMES. Defaults to config.INFERENCE_RUNTIME.
+
+    Returns:
+        basic_pitch.inference.Model: A model that can be reused across requests.
+    """
+    runtime = runtime or INFERENCE_RUNTIME
+    if runtime not in INFERENCE_RUNTIMES:
+        raise ValueError(f"Unknown inference runtime {runtime!r}, expected one of {INFERENCE_RUNTIMES}")
+
+    model = _models.get(runtime)
+    if model is None:
+        with _models_lock:
+            model = _models.get(runtime)
+            if model is None:
+                from basic_pitch.inference import Model
+                print(f"Loading basic-pitch model for runtime '{runtime}'")
+                model = _models[runtime] = Model(model_path_for(runtime))
+    return model
+
+
+def check_runtime(runtime=None):
+    """
+    Makes sure the configured runtime is installed and its model loads, so a
+    misconfigured worker fails at startup instead of on its first request.
+    """
+    runtime = runtime or INFERENCE_RUNTIME
+    available = available_runtimes()
+    if runtime not in available:
+        raise RuntimeError(f"Inference runtime '{runtime}' is not available here. Installed runtimes: {available}")
+    get_model(runtime)
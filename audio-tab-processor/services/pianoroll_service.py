@@ -0,0 +1,29 @@
+import os
+
+from config import OUTPUT_DIR
+import shared  # noqa: F401
+# The pyramid code is shared with the backend, which reads tiles in-process
+from stringscribe_common.pianoroll_service import read_pianoroll
+
+
+def get_pianoroll(midi_filename, level=None, start_tile=0, end_tile=None):
+    """
+    Describes a MIDI file's piano-roll pyramid and, if a level is given, returns some of its tiles.
+
+    Args:
+        midi_filename (str): The relative path/filename of the MIDI file.
+        level (int): Pyramid level to read tiles from (0 is the finest), or None for metadata only.
+        start_tile (int): First tile to return.
+        end_tile (int): Tile to stop before; defaults to start_tile + 1.
+
+    Returns:
+        dict: See stringscribe_common.pianoroll_service.read_pianoroll.
+
+    Raises:
+        FileNotFoundError: If the MIDI file doesn't exist.
+        ValueError: If the level or tile range is out of bounds.
+    """
+    midi_path = os.path.join(OUTPUT_DIR, midi_filename)
+    if not os.path.exists(midi_path):
+        raise FileNotFoundError("The specified MIDI file was not found.")
+    return read_pianoroll(midi_path, level, start_tile, end_tile)
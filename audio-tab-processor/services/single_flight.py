@@ -0,0 +1,77 @@
+import copy
+import threading
+
+from metrics import REGISTRY
+
+COALESCED_REQUESTS = REGISTRY.counter(
+    "stringscribe_coalesced_requests_total",
+    "Requests that waited for an identical request already in flight instead of processing again.")
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _copy_error(error):
+    """
+    A new exception of the same type for a follower to raise.
+
+    Raising the leader's own exception object from several threads would mix the
+    leader's frames into every follower's traceback.
+    """
+    try:
+        return copy.copy(error)
+    except Exception:
+        return RuntimeError(f"Identical in-flight request failed: {error}")
+
+
+class SingleFlight:
+    """
+    Runs a computation once for all the callers that ask for it at the same time.
+
+    The first caller for a key (the leader) runs the function; callers arriving with
+    the same key while it runs (followers) wait for it and get the same result, or
+    a copy of its exception chained to the original. Nothing is kept once the
+    leader finishes, so a later call runs the function again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, fn):
+        """
+        Returns fn()'s result, sharing one call among concurrent callers with the same key.
+
+        Returns:
+            (object, bool): The result, and whether this caller was the one that ran fn.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            COALESCED_REQUESTS.inc()
+            flight.done.wait()
+            if flight.error is not None:
+                raise _copy_error(flight.error) from flight.error
+            return flight.result, False
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, True
+
+
+single_flight = SingleFlight()
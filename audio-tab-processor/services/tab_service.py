@@ -1,19 +1,23 @@
 import os
 import pretty_midi
-import numpy as np
 
 from config import OUTPUT_DIR
-# CORRECTED: Import the functions directly from their modules.
-from .tab_algorithms.simple import generate_tab_simple
-from .tab_algorithms.efficient import generate_tab_efficient
+from metrics import track_stage
+import shared  # noqa: F401
+# The tab code itself is shared with the backend, which renders tabs in-process
+from stringscribe_common.tab_service import NOTE_LAYOUTS, extract_notes, render_tab, resolve_tab_setup  # noqa: F401
 
-def generate_tabs_from_midi(midi_filename, algorithm="efficient"):
+def generate_tabs_from_midi(midi_filename, algorithm="efficient", tuning="standard", capo=0):
     """
     Generates guitar tabs from a MIDI file using a specified algorithm.
 
     Args:
         midi_filename (str): The relative path/filename of the MIDI file.
         algorithm (str): The algorithm to use ('simple' or 'efficient').
+        tuning: A name from GUITAR_TUNINGS (stringscribe_common/config.py), a list of 6 open-string MIDI
+            pitches (6th string first), or "auto" to pick the tuning that suits the notes.
+        capo (int): Capo position; frets in the tab are counted from the capo.
+            "auto" picks one along with the tuning.
 
     Returns:
         str: The generated guitar tab as a string.
@@ -22,35 +26,32 @@ def generate_tabs_from_midi(midi_filename, algorithm="efficient"):
     if not os.path.exists(midi_path):
         raise FileNotFoundError("The specified MIDI file was not found.")
 
-    pm = pretty_midi.PrettyMIDI(midi_path)
+    with track_stage("midi_load"):
+        pm = pretty_midi.PrettyMIDI(midi_path)
 
-    # Now we can call the functions directly
-    if algorithm == "efficient":
-        return generate_tab_efficient(pm)
-    else:
-        return generate_tab_simple(pm)
+    return render_tab(pm, algorithm, tuning, capo)
 
-def get_notes_from_midi(midi_filename):
+def get_notes_from_midi(midi_filename, layout="rows"):
     """
     Extracts all musical notes from a MIDI file.
 
     Args:
         midi_filename (str): The relative path/filename of the MIDI file.
+        layout (str): "rows" for one {'pitch', 'start', 'end'} dict per note, or
+            "columnar" for parallel 'pitch', 'start' and 'end' arrays, which is
+            much smaller on the wire and faster to serialize for long songs.
 
     Returns:
-        dict: A dictionary containing a list of notes and the track's end time.
+        dict: A dictionary containing the notes and the track's end time.
     """
+    if layout not in NOTE_LAYOUTS:
+        raise ValueError(f"Unknown note layout {layout!r}, expected one of {NOTE_LAYOUTS}")
+
     midi_path = os.path.join(OUTPUT_DIR, midi_filename)
     if not os.path.exists(midi_path):
         raise FileNotFoundError("The specified MIDI file was not found.")
 
-    pm = pretty_midi.PrettyMIDI(midi_path)
-
-    notes_list = [
-        {'pitch': note.pitch, 'start': note.start, 'end': note.end}
-        for instrument in pm.instruments if not instrument.is_drum
-        for note in instrument.notes
-    ]
-
-    return {'notes': notes_list, 'end_time': pm.get_end_time()}
+    with track_stage("midi_load"):
+        pm = pretty_midi.PrettyMIDI(midi_path)
 
+    return extract_notes(pm, layout)
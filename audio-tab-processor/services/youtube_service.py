@@ -1,5 +1,4 @@
 import os
-import yt_dlp
 
 def download_youtube_audio(youtube_url, tmpdir):
     """
@@ -12,6 +11,9 @@ def download_youtube_audio(youtube_url, tmpdir):
     Returns:
         str: The path to the downloaded WAV audio file, or None if download fails.
     """
+    # Imported here so processes that never download from YouTube don't pay for it
+    import yt_dlp
+
     # Define options for yt-dlp
     ydl_opts = {
         "format": "bestaudio/best",
@@ -40,3 +42,38 @@ def download_youtube_audio(youtube_url, tmpdir):
     except Exception as e:
         print(f"An error occurred during YouTube download: {e}")
         return None
+
+
+def get_playlist_entries(playlist_url, limit=None):
+    """
+    Lists the video URLs in a YouTube playlist without downloading anything.
+
+    Args:
+        playlist_url (str): The playlist URL.
+        limit (int): Return at most this many entries.
+
+    Returns:
+        list: Video URLs in playlist order, or None if the playlist couldn't be read.
+    """
+    import yt_dlp
+
+    opts = {"quiet": True, "skip_download": True, "extract_flat": "in_playlist"}
+    if limit:
+        opts["playlistend"] = limit
+    try:
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            info = ydl.extract_info(playlist_url, download=False)
+    except Exception as e:
+        print(f"Could not read playlist {playlist_url}: {e}")
+        return None
+
+    urls = []
+    for entry in info.get("entries") or []:
+        if not entry:
+            continue
+        url = entry.get("url") or entry.get("webpage_url")
+        if url and not url.startswith("http"):
+            url = f"https://www.youtube.com/watch?v={entry.get('id') or url}"
+        if url:
+            urls.append(url)
+    return urls
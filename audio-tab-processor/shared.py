@@ -0,0 +1,10 @@
+"""
+Makes the stringscribe_common package (code shared with the backend) importable
+when the processor runs from its own directory, by putting the repository root on sys.path.
+"""
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
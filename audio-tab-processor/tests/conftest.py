@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Tests import the processor's modules the way its scripts do, from the processor directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Don't load the real model when app.py is imported; the few tests that need it
+# load it themselves, and skip when basic-pitch isn't installed
+os.environ.setdefault("CHECK_INFERENCE_RUNTIME", "0")
@@ -0,0 +1,62 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+librosa = pytest.importorskip("librosa")
+
+from benchmarks.synthetic import make_synthetic_midi, render_synthetic_audio
+from config import FINGERPRINT_FAN_OUT, FINGERPRINT_HOP, FINGERPRINT_PEAKS_PER_SECOND, FINGERPRINT_SAMPLE_RATE
+from services.fingerprint_service import fingerprint_audio
+
+SAMPLE_RATE = 22050
+TRIM_SECONDS = 3
+
+
+def best_alignment(stored, query):
+    """
+    Votes for the time shift between two fingerprints the way the backend's matcher
+    does, and returns the best shift and the share of the query's hashes behind it.
+    """
+    stored_offsets = {}
+    for h, offset in zip(*stored):
+        stored_offsets.setdefault(h, []).append(offset)
+    votes = Counter(offset - query_offset for h, query_offset in zip(*query) for offset in stored_offsets.get(h, []))
+    if not votes:
+        return None, 0.0
+    shift = max(votes, key=lambda s: votes[s] + votes[s - 1] + votes[s + 1])
+    return shift, (votes[shift] + votes[shift - 1] + votes[shift + 1]) / len(query[0])
+
+
+@pytest.fixture(scope="module")
+def song():
+    return render_synthetic_audio(make_synthetic_midi(60, 3, seed=3), SAMPLE_RATE)
+
+
+def test_a_re_encoded_copy_lines_up_with_the_original(song):
+    # Quieter, missing its first seconds, at another sample rate and with a little noise
+    copy = librosa.resample(0.5 * song[TRIM_SECONDS * SAMPLE_RATE:], orig_sr=SAMPLE_RATE, target_sr=44100)
+    copy += np.random.default_rng(0).normal(0, 0.002, len(copy)).astype(np.float32)
+
+    shift, share = best_alignment(fingerprint_audio(song, SAMPLE_RATE), fingerprint_audio(copy, 44100))
+
+    assert abs(shift - TRIM_SECONDS * FINGERPRINT_SAMPLE_RATE / FINGERPRINT_HOP) <= 1
+    assert share > 0.3
+
+
+def test_another_song_does_not_line_up(song):
+    other = render_synthetic_audio(make_synthetic_midi(60, 3, seed=4), SAMPLE_RATE)
+
+    _, share = best_alignment(fingerprint_audio(song, SAMPLE_RATE), fingerprint_audio(other, SAMPLE_RATE))
+
+    assert share < 0.05
+
+
+def test_fingerprints_are_deterministic_and_compact(song):
+    hashes, offsets = fingerprint_audio(song, SAMPLE_RATE)
+
+    assert hashes.dtype == offsets.dtype == np.int32
+    assert np.array_equal(hashes, fingerprint_audio(song, SAMPLE_RATE)[0])
+    # Subsampling keeps only some of the peak pairs
+    assert 0 < len(hashes) < 60 * FINGERPRINT_PEAKS_PER_SECOND * FINGERPRINT_FAN_OUT / 2
+    assert len(fingerprint_audio(song[:100], SAMPLE_RATE)[0]) == 0
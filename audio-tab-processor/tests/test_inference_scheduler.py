@@ -0,0 +1,68 @@
+import threading
+
+import numpy as np
+import pytest
+
+from services import inference_service
+from services.inference_service import InferenceScheduler
+
+WINDOW_SAMPLES = 8
+
+
+class FakeModel:
+    """Returns each window's mean as its 'note' output, or misbehaves as told."""
+
+    def __init__(self):
+        self.outputs = None
+        self.windows_run = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def predict(self, inputs):
+        self.release.wait()
+        self.windows_run += len(inputs)
+        if self.outputs is not None:
+            return self.outputs
+        return {"note": inputs.mean(axis=1, keepdims=True)}
+
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = FakeModel()
+    monkeypatch.setattr(inference_service, "get_model", lambda runtime: fake)
+    return fake
+
+
+def windows(n, value=1.0):
+    return np.full((n, WINDOW_SAMPLES, 1), value, dtype=np.float32)
+
+
+def test_jobs_get_their_own_outputs(model):
+    scheduler = InferenceScheduler(batch_size=4, max_wait_ms=1)
+
+    assert scheduler.infer(windows(6, 2.0))["note"].ravel().tolist() == [2.0] * 6
+
+
+def test_a_failed_batch_fails_its_jobs_and_the_worker_keeps_going(model):
+    scheduler = InferenceScheduler(batch_size=4, max_wait_ms=1)
+
+    # Outputs that can't be scattered back: two rows for a batch of three windows
+    model.outputs = {"note": np.zeros((2, 1, 1), dtype=np.float32)}
+    with pytest.raises(ValueError):
+        scheduler.infer(windows(3), timeout=5)
+
+    model.outputs = None
+    assert scheduler.infer(windows(3, 0.5), timeout=5)["note"].ravel().tolist() == [0.5] * 3
+
+
+def test_a_job_that_times_out_is_dropped(model):
+    scheduler = InferenceScheduler(batch_size=1, max_wait_ms=1)
+    model.release.clear()
+
+    with pytest.raises(TimeoutError):
+        scheduler.infer(windows(3), timeout=0.1)
+
+    model.release.set()
+    assert scheduler.infer(windows(1, 3.0), timeout=5)["note"].ravel().tolist() == [3.0]
+    # Only the timed-out job's first window, already in the model, was run
+    assert model.windows_run == 2
@@ -0,0 +1,95 @@
+import os
+import threading
+
+import pytest
+
+from benchmarks.synthetic import write_synthetic_wav
+from services.job_scheduler import JobScheduler, QueueFull
+
+
+def run_in_turn(scheduler, tickets):
+    """
+    Runs the tickets, one thread each, while another job holds the only slot,
+    then frees that slot and returns the order the tickets ran in.
+    """
+    blocker = scheduler.admit(1, "someone")
+    blocker.__enter__()
+    order = []
+
+    def run(ticket):
+        with ticket:
+            order.append(ticket)
+
+    threads = [threading.Thread(target=run, args=(ticket,)) for ticket in tickets]
+    for thread in threads:
+        thread.start()
+    blocker.__exit__(None, None, None)
+    for thread in threads:
+        thread.join(timeout=5)
+    return order
+
+
+def test_the_shortest_job_runs_first():
+    scheduler = JobScheduler(max_running=1, max_queued=10)
+    long, short, medium = (scheduler.admit(cost, "ada") for cost in (300, 10, 60))
+
+    assert run_in_turn(scheduler, [long, short, medium]) == [short, medium, long]
+
+
+def test_equal_jobs_run_oldest_first():
+    scheduler = JobScheduler(max_running=1, max_queued=10)
+    tickets = [scheduler.admit(30, "ada") for _ in range(3)]
+
+    assert run_in_turn(scheduler, list(reversed(tickets))) == tickets
+
+
+def test_a_user_with_a_running_job_waits_behind_other_users():
+    scheduler = JobScheduler(max_running=2, max_queued=10)
+    running = scheduler.admit(30, "ada")
+    running.__enter__()
+    ada, bob = scheduler.admit(1, "ada"), scheduler.admit(300, "bob")
+
+    order = run_in_turn(scheduler, [ada, bob])
+    running.__exit__(None, None, None)
+
+    assert order == [bob, ada]
+
+
+def test_a_refined_cost_reorders_the_queue():
+    scheduler = JobScheduler(max_running=1, max_queued=10)
+    youtube, upload = scheduler.admit(10, "ada"), scheduler.admit(60, "ada")
+    youtube.refine_cost(600)
+
+    assert run_in_turn(scheduler, [youtube, upload]) == [upload, youtube]
+
+
+def test_a_full_queue_rejects_jobs_until_a_place_frees_up():
+    scheduler = JobScheduler(max_running=1, max_queued=1)
+    scheduler.admit(30, "ada").__enter__()
+    waiting = scheduler.admit(30, "ada")
+
+    with pytest.raises(QueueFull) as excinfo:
+        scheduler.admit(30, "bob")
+    assert excinfo.value.retry_after >= 1
+
+    waiting.cancel()
+    scheduler.admit(30, "bob")
+
+
+def test_a_saturated_processor_answers_429(tmp_path, monkeypatch):
+    import app as processor_app
+
+    scheduler = JobScheduler(max_running=1, max_queued=0)
+    scheduler.admit(30, "ada").__enter__()
+    monkeypatch.setattr(processor_app, "scheduler", scheduler)
+    monkeypatch.setattr(processor_app, "OUTPUT_DIR", str(tmp_path / "jobs"))
+    client = processor_app.create_app("inference", check_inference_runtime=False).test_client()
+    wav_path = write_synthetic_wav(str(tmp_path / "clip.wav"), duration=5)
+
+    with open(wav_path, "rb") as f:
+        resp = client.post("/process_audio", data={"audio_file": (f, "clip.wav")}, content_type="multipart/form-data")
+
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert resp.get_json()["error"] == "Processing queue is full"
+    assert os.listdir(tmp_path / "jobs") == []
@@ -0,0 +1,80 @@
+import numpy as np
+import pretty_midi
+import pytest
+
+pytest.importorskip("basic_pitch")
+
+from services.audio_service import save_model_output
+
+FRAMES_PER_SECOND = 86
+# (MIDI pitch, first frame, last frame, note activation): the second note is only above the default frame threshold
+NOTES = [(60, 20, 80, 0.9), (67, 100, 160, 0.4)]
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    """A processor app writing jobs under tmp_path."""
+    import app as processor_app
+
+    monkeypatch.setattr(processor_app, "OUTPUT_DIR", str(tmp_path / "jobs"))
+    return processor_app.create_app("inference", check_inference_runtime=False).test_client()
+
+
+def make_job(jobs_dir, with_model_output=True):
+    """A finished job with an empty MIDI file and, optionally, model output holding NOTES."""
+    job_dir = jobs_dir / "job_1"
+    job_dir.mkdir(parents=True)
+    pretty_midi.PrettyMIDI().write(str(job_dir / "clip_basic_pitch.mid"))
+    if with_model_output:
+        n_frames = 3 * FRAMES_PER_SECOND
+        note, onset = np.zeros((n_frames, 88)), np.zeros((n_frames, 88))
+        for pitch, first, last, activation in NOTES:
+            note[first:last, pitch - 21] = activation
+            onset[first:first + 2, pitch - 21] = 0.9
+        save_model_output({"note": note, "onset": onset, "contour": np.zeros((n_frames, 264))}, str(job_dir))
+    return "job_1/clip_basic_pitch.mid"
+
+
+def pitches(midi_path):
+    return sorted(note.pitch for note in pretty_midi.PrettyMIDI(str(midi_path)).instruments[0].notes)
+
+
+def test_rethresholding_rewrites_the_notes_without_the_model(processor, tmp_path):
+    midi_filename = make_job(tmp_path / "jobs")
+
+    resp = processor.post("/rethreshold", json={"midi_filename": midi_filename})
+    assert resp.status_code == 200
+    assert resp.get_json()["midi_relative_path"] == midi_filename
+    assert pitches(tmp_path / "jobs" / midi_filename) == [60, 67]
+
+    resp = processor.post("/rethreshold", json={"midi_filename": midi_filename, "frame_threshold": 0.6})
+    assert resp.status_code == 200
+    assert pitches(tmp_path / "jobs" / midi_filename) == [60]
+
+
+def test_the_pitch_range_is_applied(processor, tmp_path):
+    midi_filename = make_job(tmp_path / "jobs")
+
+    resp = processor.post("/rethreshold", json={"midi_filename": midi_filename, "minPitch": 64})
+
+    assert resp.status_code == 200
+    assert pitches(tmp_path / "jobs" / midi_filename) == [67]
+
+
+def test_a_job_without_saved_model_output_is_not_found(processor, tmp_path):
+    midi_filename = make_job(tmp_path / "jobs", with_model_output=False)
+
+    resp = processor.post("/rethreshold", json={"midi_filename": midi_filename})
+
+    assert resp.status_code == 404
+
+
+def test_invalid_thresholds_are_rejected(processor, tmp_path):
+    midi_filename = make_job(tmp_path / "jobs")
+
+    resp = processor.post("/rethreshold", json={"midi_filename": midi_filename, "onset_threshold": "high"})
+
+    assert resp.status_code == 400
+    # The job's MIDI is left as it was
+    assert pretty_midi.PrettyMIDI(str(tmp_path / "jobs" / midi_filename)).instruments == []
+    assert processor.post("/rethreshold", json={}).status_code == 400
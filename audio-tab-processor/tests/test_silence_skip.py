@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("basic_pitch")
+soundfile = pytest.importorskip("soundfile")
+
+from services import audio_service
+from services.inference_service import window_audio
+from services.model_service import available_runtimes
+
+SAMPLE_RATE = 22050
+# (start, end, MIDI pitch) of each note, with gaps of several model windows between phrases
+PHRASES = [
+    [(0.5, 1.5, 57), (1.5, 2.5, 60), (2.5, 3.5, 64)],
+    [(10.0, 11.0, 62), (11.0, 12.5, 65), (11.0, 12.5, 69)],
+    [(20.0, 21.5, 55), (21.5, 22.5, 59)],
+]
+DURATION = 26.0
+
+
+@pytest.fixture(scope="module")
+def runtime():
+    runtimes = [name for name in available_runtimes() if name != "default"]
+    if not runtimes:
+        pytest.skip("no basic-pitch inference runtime installed")
+    return runtimes[0]
+
+
+@pytest.fixture(scope="module")
+def song_with_gaps(tmp_path_factory):
+    """
+    Plucked tones separated by digital silence.
+
+    Only digital silence is guaranteed to give the same notes: faint noise in the gaps
+    (around -100 dBFS) already makes the model emit ghost notes that skipping drops,
+    which is why SKIP_SILENCE is off by default.
+    """
+    t = np.arange(int(DURATION * SAMPLE_RATE)) / SAMPLE_RATE
+    audio = np.zeros(len(t))
+    for start, end, pitch in (note for phrase in PHRASES for note in phrase):
+        span = (t >= start) & (t < end)
+        local = t[span] - start
+        frequency = 440.0 * 2 ** ((pitch - 69) / 12)
+        tone = sum(np.sin(2 * np.pi * frequency * k * local) / k for k in (1, 2, 3))
+        audio[span] += 0.2 * tone * np.exp(-2 * local)
+    path = tmp_path_factory.mktemp("audio") / "gaps.wav"
+    soundfile.write(path, audio.astype(np.float32), SAMPLE_RATE)
+    return str(path)
+
+
+def note_events(midi_data):
+    notes = [note for instrument in midi_data.instruments for note in instrument.notes]
+    return sorted((note.pitch, round(note.start, 3), round(note.end, 3)) for note in notes)
+
+
+def transcribe_both_ways(monkeypatch, song, transcribe):
+    events = {}
+    for skip in (True, False):
+        monkeypatch.setattr(audio_service, "SKIP_SILENCE", skip)
+        events[skip] = note_events(transcribe(song))
+    return events[True], events[False]
+
+
+def test_the_gaps_are_skipped(song_with_gaps):
+    active = audio_service.active_windows(window_audio(audio_service.load_audio(song_with_gaps)))
+
+    assert 0 < active.sum() < len(active) - 4
+
+
+def test_skipping_silence_gives_the_same_notes(monkeypatch, song_with_gaps, runtime):
+    params = {"runtime": runtime}
+    skipped, full = transcribe_both_ways(
+        monkeypatch, song_with_gaps, lambda song: audio_service.transcribe(song, params))
+
+    assert skipped
+    assert skipped == full
+
+
+def test_skipping_silence_gives_the_same_notes_when_streaming(monkeypatch, song_with_gaps, runtime):
+    params = {"runtime": runtime}
+
+    def transcribe(song):
+        *_, (_, midi_data) = audio_service.transcribe_incrementally(song, params)
+        return midi_data
+
+    skipped, full = transcribe_both_ways(monkeypatch, song_with_gaps, transcribe)
+
+    assert skipped
+    assert skipped == full
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+
+import pretty_midi
+import pytest
+
+from benchmarks.synthetic import make_synthetic_midi, write_synthetic_wav
+from services.single_flight import SingleFlight
+
+CLIENTS = 8
+# Long enough for every client to arrive while the first one is still transcribing
+MODEL_SECONDS = 0.5
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    """
+    A processor app writing jobs under tmp_path, with the model and sonification stubbed out.
+
+    Returns the test client and the list of parameters the stub model was called with.
+    """
+    import app as processor_app
+    from services import audio_service
+
+    calls = []
+    calls_lock = threading.Lock()
+
+    def stub_transcribe(audio_path, params, out_dir=None):
+        with calls_lock:
+            calls.append(params)
+        time.sleep(MODEL_SECONDS)
+        return make_synthetic_midi(5, 3, seed=1)
+
+    def stub_save_outputs(midi_data, audio_path, out_dir):
+        # Only the MIDI: sonifying needs basic-pitch and converting the WAV needs ffmpeg
+        midi_path = os.path.join(out_dir, os.path.splitext(os.path.basename(audio_path))[0] + "_basic_pitch.mid")
+        midi_data.write(midi_path)
+        return midi_path, None
+
+    monkeypatch.setattr(audio_service, "transcribe", stub_transcribe)
+    monkeypatch.setattr(audio_service, "save_outputs", stub_save_outputs)
+    monkeypatch.setattr(processor_app, "OUTPUT_DIR", str(tmp_path / "jobs"))
+    client = processor_app.create_app("inference", check_inference_runtime=False).test_client()
+    return client, calls
+
+
+def post_concurrently(client, wav_path, forms):
+    """Posts the clip once per form, all released at the same moment, and returns the responses."""
+    barrier = threading.Barrier(len(forms))
+    responses = [None] * len(forms)
+
+    def post(i):
+        with open(wav_path, "rb") as f:
+            data = {**forms[i], "audio_file": (f, os.path.basename(wav_path))}
+            barrier.wait()
+            responses[i] = client.post("/process_audio", data=data, content_type="multipart/form-data")
+
+    threads = [threading.Thread(target=post, args=(i,)) for i in range(len(forms))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def test_identical_concurrent_requests_run_the_model_once(processor, tmp_path):
+    client, calls = processor
+    wav_path = write_synthetic_wav(str(tmp_path / "clip.wav"), duration=5)
+
+    responses = post_concurrently(client, wav_path, [{}] * CLIENTS)
+
+    assert len(calls) == 1
+    assert [resp.status_code for resp in responses] == [200] * CLIENTS
+    midi_paths = [resp.get_json()["midi_relative_path"] for resp in responses]
+    # Every request gets its own job directory holding a copy of the outputs
+    assert len({os.path.dirname(path) for path in midi_paths}) == CLIENTS
+    notes = {len(pretty_midi.PrettyMIDI(str(tmp_path / "jobs" / path)).instruments[0].notes) for path in midi_paths}
+    assert len(notes) == 1
+
+
+def test_requests_with_different_parameters_are_not_coalesced(processor, tmp_path):
+    client, calls = processor
+    wav_path = write_synthetic_wav(str(tmp_path / "clip.wav"), duration=5)
+
+    forms = [{"onset_threshold": "0.6"} if i % 2 else {} for i in range(CLIENTS)]
+    responses = post_concurrently(client, wav_path, forms)
+
+    assert [resp.status_code for resp in responses] == [200] * CLIENTS
+    assert sorted(params["onset_threshold"] for params in calls) == [0.5, 0.6]
+
+
+def test_followers_raise_a_copy_chained_to_the_leaders_error():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = {}
+
+    def fail():
+        started.set()
+        release.wait()
+        raise ValueError("decode failed")
+
+    def call(name):
+        try:
+            flights.do("key", fail)
+        except ValueError as e:
+            errors[name] = e
+
+    leader = threading.Thread(target=call, args=("leader",))
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=call, args=("follower",))
+    follower.start()
+    # The follower can't be observed waiting; give it time to join the flight
+    time.sleep(0.1)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert errors["follower"] is not errors["leader"]
+    assert errors["follower"].__cause__ is errors["leader"]
+    assert str(errors["follower"]) == "decode failed"
@@ -0,0 +1,113 @@
+import json
+import os
+
+import pretty_midi
+import pytest
+
+from benchmarks.synthetic import make_synthetic_midi, write_synthetic_wav
+from services.tab_service import render_tab
+
+SEGMENTS = 3
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    """
+    A processor app writing jobs under tmp_path, streaming a synthetic track in SEGMENTS parts.
+
+    Returns the test client and the full track the stub model transcribes.
+    """
+    import app as processor_app
+
+    song = make_synthetic_midi(6, 3, seed=2)
+    notes = sorted(song.instruments[0].notes, key=lambda note: note.end)
+
+    def stub_transcribe_incrementally(audio_path, params, out_dir=None):
+        so_far = pretty_midi.PrettyMIDI()
+        so_far.instruments.append(pretty_midi.Instrument(program=25))
+        step = -(-len(notes) // SEGMENTS)
+        for i in range(0, len(notes), step):
+            new_notes = notes[i:i + step]
+            so_far.instruments[0].notes.extend(new_notes)
+            yield [{"pitch": n.pitch, "start": n.start, "end": n.end} for n in new_notes], so_far
+
+    def stub_save_outputs(midi_data, audio_path, out_dir):
+        midi_path = os.path.join(out_dir, "clip_basic_pitch.mid")
+        midi_data.write(midi_path)
+        return midi_path, None
+
+    monkeypatch.setattr(processor_app, "transcribe_incrementally", stub_transcribe_incrementally)
+    monkeypatch.setattr(processor_app, "save_outputs", stub_save_outputs)
+    monkeypatch.setattr(processor_app, "OUTPUT_DIR", str(tmp_path / "jobs"))
+    client = processor_app.create_app("inference", check_inference_runtime=False).test_client()
+    return client, song
+
+
+def stream(client, wav_path, **form):
+    """Posts the clip to the streaming endpoint and returns the response and its (event, data) pairs."""
+    with open(wav_path, "rb") as f:
+        resp = client.post("/process_audio_stream", data={**form, "audio_file": (f, "clip.wav")},
+                           content_type="multipart/form-data")
+    events = []
+    if resp.mimetype != "text/event-stream":
+        return resp, events
+    for block in resp.get_data(as_text=True).split("\n\n"):
+        if block:
+            event, data = block.split("\n")
+            events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return resp, events
+
+
+def test_notes_are_streamed_before_the_job_is_done(processor, tmp_path):
+    client, song = processor
+    wav_path = write_synthetic_wav(str(tmp_path / "clip.wav"), duration=6)
+
+    resp, events = stream(client, wav_path)
+
+    assert resp.mimetype == "text/event-stream"
+    names = [event for event, _ in events]
+    assert names == ["status", "status"] + ["notes"] * SEGMENTS + ["done"]
+    assert [data["stage"] for _, data in events[:2]] == ["queued", "transcribe"]
+    streamed = [note for event, data in events if event == "notes" for note in data["notes"]]
+    assert len(streamed) == len(song.instruments[0].notes)
+    done = events[-1][1]
+    assert os.path.exists(tmp_path / "jobs" / done["midi_relative_path"])
+
+
+def test_the_last_preview_tab_shows_every_note(processor, tmp_path):
+    client, song = processor
+    wav_path = write_synthetic_wav(str(tmp_path / "clip.wav"), duration=6)
+
+    _, events = stream(client, wav_path, preview_tab="simple")
+
+    tabs = [data["tab_text"] for event, data in events if event == "tab"]
+    assert tabs
+    assert tabs[-1] == render_tab(song, "simple")
+    assert events[-1][0] == "done"
+
+
+def test_a_failed_job_streams_an_error_and_leaves_no_job_directory(processor, tmp_path, monkeypatch):
+    import app as processor_app
+
+    client, _ = processor
+    wav_path = write_synthetic_wav(str(tmp_path / "clip.wav"), duration=6)
+
+    def failing_save_outputs(midi_data, audio_path, out_dir):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(processor_app, "save_outputs", failing_save_outputs)
+    _, events = stream(client, wav_path)
+
+    assert events[-1] == ("error", {"error": "disk full"})
+    assert os.listdir(tmp_path / "jobs") == []
+
+
+def test_invalid_parameters_are_rejected_before_streaming(processor, tmp_path):
+    client, _ = processor
+    wav_path = write_synthetic_wav(str(tmp_path / "clip.wav"), duration=6)
+
+    resp, _ = stream(client, wav_path, onset_threshold="high")
+
+    assert resp.status_code == 400
+    assert "onset_threshold" in resp.get_json()["error"]
+    assert os.listdir(tmp_path / "jobs") == []
@@ -0,0 +1,99 @@
+from collections import OrderedDict
+
+import pretty_midi
+import pytest
+
+import shared  # noqa: F401
+from stringscribe_common.config import GUITAR_OPEN_PITCHES, GUITAR_TUNINGS, MAX_FRET
+from stringscribe_common.tab_algorithms import voicings
+from stringscribe_common.tab_algorithms.tunings import choose_tuning, get_fret_table, resolve_capo
+from stringscribe_common.tab_service import render_tab
+
+# An open E major chord, 6th string first
+E_MAJOR = (40, 47, 52, 56, 59, 64)
+E_MAJOR_SHAPE = {6: 0, 5: 2, 4: 2, 3: 1, 2: 0, 1: 0}
+
+
+@pytest.fixture(autouse=True, scope="module")
+def voicing_cache(tmp_path_factory):
+    """Keeps voicing indexes built by the tests out of the shared cache."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(voicings, "VOICING_CACHE_DIR", str(tmp_path_factory.mktemp("voicings")))
+        monkeypatch.setattr(voicings, "_indexes", OrderedDict())
+        yield
+
+
+def capoed(open_pitches, capo):
+    return tuple(p + capo for p in open_pitches)
+
+
+def test_the_fret_table_gives_every_reachable_fret():
+    for open_pitches in GUITAR_TUNINGS.values():
+        table = get_fret_table(tuple(open_pitches))
+        expected = [[p - o if 0 <= p - o <= MAX_FRET else -1 for o in open_pitches] for p in range(128)]
+
+        assert table.tolist() == expected
+    assert get_fret_table(tuple(GUITAR_OPEN_PITCHES)) is get_fret_table(tuple(GUITAR_OPEN_PITCHES))
+    assert not get_fret_table(tuple(GUITAR_OPEN_PITCHES)).flags.writeable
+
+
+def test_frets_are_counted_from_the_capo():
+    capo = 3
+    table = get_fret_table(capoed(GUITAR_OPEN_PITCHES, capo), MAX_FRET - capo)
+
+    # Open strings sound a minor third higher, nothing below the capo can be played
+    assert table[43].tolist() == [0, -1, -1, -1, -1, -1]
+    assert (table[40:43] == -1).all()
+    assert table.max() == MAX_FRET - capo
+
+
+def test_drop_d_reaches_the_low_d():
+    assert get_fret_table(tuple(GUITAR_TUNINGS["drop_d"]))[38].tolist() == [0, -1, -1, -1, -1, -1]
+    assert (get_fret_table(tuple(GUITAR_OPEN_PITCHES))[38] == -1).all()
+
+
+@pytest.mark.parametrize("capo", [0, 2, 5])
+def test_an_open_shape_keeps_its_frets_under_a_capo(capo):
+    voicing = voicings.find_chord_voicing(capoed(E_MAJOR, capo), {}, capoed(GUITAR_OPEN_PITCHES, capo),
+                                          MAX_FRET - capo, capo=capo)
+
+    assert voicing == E_MAJOR_SHAPE
+
+
+def test_a_capoed_voicing_stays_below_the_last_fret():
+    capo = 7
+    # The highest notes of every string at the last fret
+    pitches = capoed(GUITAR_OPEN_PITCHES, MAX_FRET)[-3:]
+
+    voicing = voicings.find_chord_voicing(pitches, {}, capoed(GUITAR_OPEN_PITCHES, capo), MAX_FRET - capo, capo=capo)
+
+    assert voicing == {3: MAX_FRET - capo, 2: MAX_FRET - capo, 1: MAX_FRET - capo}
+    assert voicings.find_chord_voicing(capoed(pitches, 1), {}, capoed(GUITAR_OPEN_PITCHES, capo),
+                                       MAX_FRET - capo, capo=capo) is None
+
+
+def test_choose_tuning_keeps_standard_unless_another_setup_pays_off():
+    melody = [40, 45, 50, 55, 59, 64, 52, 57]
+
+    assert choose_tuning(melody) == ("standard", tuple(GUITAR_OPEN_PITCHES), 0)
+    name, open_pitches, _ = choose_tuning(melody + [38] * 4)
+    assert min(open_pitches) <= 38
+    assert name != "standard"
+    # Open strings three semitones up: a capo at 3 puts every note back on an open string
+    assert choose_tuning(list(capoed(GUITAR_OPEN_PITCHES, 3)) * 10, capos=range(10))[2] == 3
+
+
+def test_a_capoed_tab_says_so_and_counts_frets_from_the_capo():
+    pm = pretty_midi.PrettyMIDI()
+    guitar = pretty_midi.Instrument(program=25)
+    guitar.notes = [pretty_midi.Note(velocity=100, pitch=p, start=0.0, end=1.0) for p in capoed(E_MAJOR, 2)]
+    pm.instruments.append(guitar)
+
+    tab = render_tab(pm, "efficient", capo=2)
+
+    header, _, *lines = tab.split("\n")
+    assert header.endswith("capo 2")
+    frets = {line[0]: line[line.index("|") + 1] for line in lines if "|" in line}
+    assert sorted(frets.values()) == sorted(str(f) for f in E_MAJOR_SHAPE.values())
+    with pytest.raises(ValueError):
+        resolve_capo(10)
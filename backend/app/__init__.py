@@ -1,3 +1,12 @@
+import os
+import sys
+
+# The metrics, profiling and serialization code shared with the audio processor
+# lives in the stringscribe_common package at the repository root
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
 from flask import Flask, jsonify, request
 from .config import Config
 from flask_sqlalchemy import SQLAlchemy
@@ -5,6 +14,13 @@ from flask_bcrypt import Bcrypt
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_cors import CORS
+from .passwords import PasswordHasher
+from .local_tabs import TabEngine
+from .bulk import BulkImporter
+from .uploads import UploadStore
+from stringscribe_common.metrics import instrument_app
+from stringscribe_common.profiling import init_profiling
+from stringscribe_common.serialization import init_serialization
 
 # 1. Create Extension instances at the top level
 # These will be initialized with the app inside the factory function.
@@ -13,6 +29,10 @@ bcrypt = Bcrypt()
 migrate = Migrate()
 login_manager = LoginManager()
 cors = CORS()
+password_hasher = PasswordHasher()
+tab_engine = TabEngine()
+bulk_importer = BulkImporter()
+upload_store = UploadStore()
 
 def create_app(config_class=Config):
     """Constructs the core application and its components."""
@@ -28,18 +48,30 @@ def create_app(config_class=Config):
     bcrypt.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
+    password_hasher.init_app(app)
+    tab_engine.init_app(app)
+    bulk_importer.init_app(app)
+    upload_store.init_app(app)
 
     # Configure CORS to allow all necessary methods, including DELETE
     cors.init_app(app,
                   origins=["http://localhost:3000"],
-                  methods=["GET", "POST", "PUT", "OPTIONS", "DELETE"], # <-- DELETE is included
-                  allow_headers=["Content-Type"],
+                  methods=["GET", "HEAD", "POST", "PUT", "PATCH", "OPTIONS", "DELETE"], # <-- DELETE is included
+                  allow_headers=["Content-Type", "X-Profile", "X-Profile-Token", "Upload-Offset"],
+                  expose_headers=["Retry-After", "Upload-Offset", "Upload-Length"],
                   supports_credentials=True)
 
     # 3. Configure Flask-Login
     # Disables the default "redirect to login page" behavior, which is not needed for an API
     login_manager.login_view = None
 
+    # Route latency / in-flight metrics, served on /metrics
+    instrument_app(app)
+    # Opt-in per-request cProfile capture (disabled unless PROFILE_TOKEN is set)
+    init_profiling(app, url_prefix='/api')
+    # orjson-backed jsonify plus per-request gzip/brotli compression
+    init_serialization(app)
+
     @login_manager.user_loader
     def load_user(user_id):
         """Tells Flask-Login how to find a user from the ID stored in the session."""
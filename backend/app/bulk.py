@@ -0,0 +1,341 @@
+# backend/app/bulk.py
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from flask import current_app
+
+from stringscribe_common.metrics import track_stage
+
+AUDIO_EXTENSIONS = {'.wav', '.mp3', '.flac', '.ogg', '.m4a', '.aac', '.aif', '.aiff'}
+# Finished imports are forgotten after this long
+BULK_STATUS_TTL = 3600
+# How many times an item is retried when the processor answers 429
+BULK_MAX_RETRIES = 5
+
+
+class BulkRequestError(Exception):
+    """Raised when a bulk request is malformed or too large."""
+
+
+class BulkItem:
+    """One source in a bulk import: a URL or a file extracted from the archive."""
+
+    def __init__(self, source_hash, source_info, youtube_url=None, temp_file_path=None):
+        self.source_hash = source_hash
+        self.source_info = source_info
+        self.youtube_url = youtube_url
+        self.temp_file_path = temp_file_path
+        self.status = "queued"
+        self.job_id = None
+        self.error = None
+
+    def to_dict(self):
+        return {"source_info": self.source_info, "status": self.status, "job_id": self.job_id, "error": self.error}
+
+
+class BulkImport:
+    """The state of one bulk request, polled by the client through /api/process/bulk/<id>."""
+
+    def __init__(self, user_id, items, params):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.items = items
+        self.params = params
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self):
+        counts = {}
+        for item in self.items:
+            counts[item.status] = counts.get(item.status, 0) + 1
+        return {
+            "bulk_id": self.id,
+            "done": self.finished_at is not None,
+            "counts": counts,
+            "items": [item.to_dict() for item in self.items],
+        }
+
+
+def collect_url_items(urls):
+    """Builds items for YouTube URLs, hashed the same way get_source_hash hashes a single URL."""
+    return [BulkItem(url, f"youtube: {url}", youtube_url=url) for url in urls if url]
+
+
+def collect_playlist_items(playlist_url, limit):
+    """Asks the processor for the videos of a playlist and builds an item for each."""
+    try:
+        with track_stage("playlist_lookup"):
+            resp = requests.post(current_app.config['PROCESSOR_URL_PLAYLIST'],
+                                 json={"playlist_url": playlist_url, "limit": limit}, timeout=120)
+        resp.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"Error reading playlist through processor: {e}")
+        raise BulkRequestError("Could not read the playlist")
+    return collect_url_items(resp.json().get("urls", []))
+
+
+def collect_archive_items(archive, max_items, max_bytes):
+    """
+    Extracts the audio files of an uploaded zip into temp files.
+
+    Each entry is hashed while it is copied out, so no file is read twice.
+    Entries that aren't audio (by extension) are ignored, and the archive is
+    rejected if it holds more than max_items audio files or more than
+    max_bytes of uncompressed audio. The sizes the zip declares are only a first
+    check; the bytes actually extracted are counted against max_bytes too.
+    """
+    items = []
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            entries = [info for info in zf.infolist()
+                       if not info.is_dir() and os.path.splitext(info.filename)[1].lower() in AUDIO_EXTENSIONS]
+            if len(entries) > max_items:
+                raise BulkRequestError(f"Archive holds {len(entries)} audio files, the limit is {max_items}")
+            if sum(info.file_size for info in entries) > max_bytes:
+                raise BulkRequestError("Archive is too large")
+
+            extracted = 0
+            with track_stage("extract_archive"):
+                for info in entries:
+                    name = os.path.basename(info.filename)
+                    sha256 = hashlib.sha256()
+                    with zf.open(info) as src, tempfile.NamedTemporaryFile(
+                            delete=False, suffix=os.path.splitext(name)[1]) as dst:
+                        items.append(BulkItem(None, f"file: {name}", temp_file_path=dst.name))
+                        while chunk := src.read(1024 * 1024):
+                            extracted += len(chunk)
+                            if extracted > max_bytes:
+                                raise BulkRequestError("Archive is too large")
+                            sha256.update(chunk)
+                            dst.write(chunk)
+                    items[-1].source_hash = sha256.hexdigest()
+    except zipfile.BadZipFile:
+        remove_temp_files(items)
+        raise BulkRequestError("Uploaded archive is not a valid zip file")
+    except Exception:
+        remove_temp_files(items)
+        raise
+    return items
+
+
+def remove_temp_files(items):
+    for item in items:
+        if item.temp_file_path and os.path.exists(item.temp_file_path):
+            os.unlink(item.temp_file_path)
+
+
+def remove_processor_outputs(processor_data):
+    """Deletes the job directory of a processor result that never made it into the database."""
+    job_dir = os.path.dirname(processor_data.get('midi_relative_path') or processor_data.get('midi_filename') or '')
+    if job_dir:
+        shutil.rmtree(os.path.join(current_app.config['PROCESSED_FILES_DIR'], job_dir), ignore_errors=True)
+
+
+class BulkImporter:
+    """
+    Runs bulk imports through a bounded pipeline in the background.
+
+    Every import shares one pool of BULK_CONCURRENCY workers that forward items
+    to the processor, so a large import can't flood it and several imports
+    share it fairly in arrival order. A coordinator thread per import collects
+    the results and writes the AudioProcessingJob rows BULK_COMMIT_SIZE at a time.
+    With FINGERPRINT_DEDUPE on, each job is stored with its fingerprint, so later
+    uploads of the same recording can reuse it.
+    """
+
+    def __init__(self, app=None):
+        self._executor = None
+        self._imports = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BULK_CONCURRENCY', 4)
+        app.config.setdefault('BULK_COMMIT_SIZE', 20)
+        self._executor = ThreadPoolExecutor(max_workers=app.config['BULK_CONCURRENCY'], thread_name_prefix='bulk')
+        self._commit_size = app.config['BULK_COMMIT_SIZE']
+        app.extensions['bulk_importer'] = self
+
+    def get(self, bulk_id, user_id):
+        """Returns a user's import by id, or None."""
+        bulk = self._imports.get(bulk_id)
+        return bulk if bulk is not None and bulk.user_id == user_id else None
+
+    def start(self, user_id, items, params):
+        """
+        Dedupes the items and starts processing the rest in the background.
+
+        Items whose source the user already has a job for, or that repeat an
+        earlier item of the same request, are marked 'duplicate' and not sent
+        to the processor.
+
+        Returns:
+            BulkImport: The import, for status polling.
+        """
+        from .models import AudioProcessingJob
+
+        hashes = list({item.source_hash for item in items})
+        existing = {}
+        for start in range(0, len(hashes), 500):
+            rows = AudioProcessingJob.query.with_entities(AudioProcessingJob.source_hash, AudioProcessingJob.id).filter(
+                AudioProcessingJob.user_id == user_id,
+                AudioProcessingJob.source_hash.in_(hashes[start:start + 500]),
+            ).all()
+            existing.update(rows)
+
+        seen, pending = set(), []
+        for item in items:
+            if item.source_hash in existing or item.source_hash in seen:
+                item.status, item.job_id = "duplicate", existing.get(item.source_hash)
+                remove_temp_files([item])
+            else:
+                seen.add(item.source_hash)
+                pending.append(item)
+
+        bulk = BulkImport(user_id, items, params)
+        with self._lock:
+            self._forget_finished()
+            self._imports[bulk.id] = bulk
+        app = current_app._get_current_object()
+        threading.Thread(target=self._run, args=(app, bulk, pending), daemon=True).start()
+        return bulk
+
+    def _forget_finished(self):
+        cutoff = time.time() - BULK_STATUS_TTL
+        for bulk_id in [b.id for b in self._imports.values() if b.finished_at and b.finished_at < cutoff]:
+            del self._imports[bulk_id]
+
+    def _transcribe(self, app, bulk, item):
+        """
+        Runs in the pool: sends one item to the processor, waiting out 429s.
+
+        Returns:
+            (dict, tuple, str): The processor result, the fingerprint (hashes, offsets)
+            or None, and an error message or None.
+        """
+        from .fingerprints import fingerprint_upload
+        from .services import forward_to_processor, ProcessorBusy
+
+        item.status = "processing"
+        data = dict(bulk.params)
+        if item.youtube_url:
+            data['youtube_url'] = item.youtube_url
+        with app.app_context():
+            try:
+                fingerprint = None
+                if app.config['FINGERPRINT_DEDUPE']:
+                    if item.temp_file_path:
+                        fingerprint = fingerprint_upload(item.temp_file_path)
+                    else:
+                        # URLs are downloaded by the processor, so it fingerprints them too
+                        data['fingerprint'] = '1'
+                for attempt in range(BULK_MAX_RETRIES + 1):
+                    try:
+                        processor_data, error = forward_to_processor(data, item.temp_file_path, bulk.user_id,
+                                                                     cleanup=False)
+                        break
+                    except ProcessorBusy as e:
+                        if attempt == BULK_MAX_RETRIES:
+                            return None, None, str(e)
+                        time.sleep(min(e.retry_after, 60))
+                if processor_data and processor_data.get('fingerprint'):
+                    processor_fingerprint = processor_data.pop('fingerprint')
+                    fingerprint = processor_fingerprint['hashes'], processor_fingerprint['offsets']
+                return processor_data, fingerprint, error
+            finally:
+                remove_temp_files([item])
+
+    def _run(self, app, bulk, pending):
+        """Coordinator thread: feeds the pool and commits finished jobs in batches."""
+        from . import db
+
+        with app.app_context():
+            futures = {self._executor.submit(self._transcribe, app, bulk, item): item for item in pending}
+            uncommitted = []
+            try:
+                for future in as_completed(futures):
+                    item = futures[future]
+                    try:
+                        processor_data, fingerprint, error = future.result()
+                    except Exception as e:
+                        processor_data, fingerprint, error = None, None, str(e)
+                    if error:
+                        item.status, item.error = "failed", error
+                        continue
+                    uncommitted.append((item, processor_data, fingerprint))
+                    if len(uncommitted) >= self._commit_size:
+                        self._commit(bulk, uncommitted)
+                self._commit(bulk, uncommitted)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Bulk import {bulk.id} failed: {e}")
+                # Nothing else gets saved, so the outputs of items already transcribed
+                # (or still in flight) are removed once they're back
+                for future, item in futures.items():
+                    if item.status in ("done", "failed"):
+                        continue
+                    item.status, item.error = "failed", "Import aborted"
+                    if not future.cancel() and future.exception() is None and future.result()[0]:
+                        remove_processor_outputs(future.result()[0])
+            finally:
+                bulk.finished_at = time.time()
+                db.session.remove()
+
+    def _commit(self, bulk, uncommitted):
+        """
+        Writes a batch of finished jobs in one transaction.
+
+        If the batch fails to commit, it is rolled back and its jobs are retried one
+        by one, so a single bad row only fails its own item; the processor outputs of
+        a job that can't be saved are deleted.
+        """
+        from . import db
+
+        if not uncommitted:
+            return
+        try:
+            jobs = [self._add_job(bulk, item, processor_data, fingerprint)
+                    for item, processor_data, fingerprint in uncommitted]
+            with track_stage("bulk_commit"):
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Bulk import {bulk.id}: committing {len(uncommitted)} jobs failed ({e}), retrying them one by one")
+            jobs = []
+            for item, processor_data, fingerprint in uncommitted:
+                try:
+                    job = self._add_job(bulk, item, processor_data, fingerprint)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Bulk import {bulk.id}: could not save {item.source_info}: {e}")
+                    remove_processor_outputs(processor_data)
+                    item.status, item.error = "failed", "Could not save the job"
+                    continue
+                jobs.append(job)
+            uncommitted[:] = [entry for entry in uncommitted if entry[0].status != "failed"]
+
+        for (item, _, _), job in zip(uncommitted, jobs):
+            item.status, item.job_id = "done", job.id
+        uncommitted.clear()
+
+    @staticmethod
+    def _add_job(bulk, item, processor_data, fingerprint):
+        from . import db
+        from .fingerprints import store_fingerprint
+        from .services import save_job_result
+
+        job = save_job_result(bulk.user_id, item.source_hash, item.source_info, processor_data, commit=False)
+        if fingerprint:
+            db.session.flush()
+            store_fingerprint(job.id, *fingerprint, commit=False)
+        return job
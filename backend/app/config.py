@@ -19,9 +19,61 @@ class Config:
     SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, '..', 'stringscribe.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
-    PROCESSOR_URL_AUDIO = "http://127.0.0.1:5002/process_audio"
-    PROCESSOR_URL_TABS = "http://127.0.0.1:5002/generate_tabs"
-    PROCESSOR_URL_NOTES = "http://127.0.0.1:5002/get_midi_notes"
+    # Password hashing
+    # bcrypt work factor for new hashes; existing hashes are upgraded on the next login
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    # Hashes run on a small pool so a login burst can't occupy every request thread
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16))
+    PASSWORD_HASH_TIMEOUT = 10
+    PASSWORD_HASH_RETRY_AFTER = 2
+
+    # The tab endpoints can be served by a separate, lightweight processor
+    # (PROCESSOR_ROLE=tabs), so each URL can be pointed elsewhere.
+    PROCESSOR_URL_AUDIO = os.environ.get('PROCESSOR_URL_AUDIO', "http://127.0.0.1:5002/process_audio")
+    PROCESSOR_URL_AUDIO_STREAM = os.environ.get('PROCESSOR_URL_AUDIO_STREAM', "http://127.0.0.1:5002/process_audio_stream")
+    PROCESSOR_URL_TABS = os.environ.get('PROCESSOR_URL_TABS', "http://127.0.0.1:5002/generate_tabs")
+    # Seconds to wait when the processor answers 429 without a usable Retry-After
+    PROCESSOR_DEFAULT_RETRY_AFTER = 30
+    PROCESSOR_URL_RETHRESHOLD = os.environ.get('PROCESSOR_URL_RETHRESHOLD', "http://127.0.0.1:5002/rethreshold")
+    PROCESSOR_URL_NOTES = os.environ.get('PROCESSOR_URL_NOTES', "http://127.0.0.1:5002/get_midi_notes")
+    PROCESSOR_URL_PIANOROLL = os.environ.get('PROCESSOR_URL_PIANOROLL', "http://127.0.0.1:5002/get_pianoroll")
+    PROCESSOR_URL_FINGERPRINT = os.environ.get('PROCESSOR_URL_FINGERPRINT', "http://127.0.0.1:5002/fingerprint")
+    PROCESSOR_URL_PLAYLIST = os.environ.get('PROCESSOR_URL_PLAYLIST', "http://127.0.0.1:5002/playlist_entries")
+
+    # Bulk imports (/api/process/bulk)
+    # At most BULK_CONCURRENCY items are in flight to the processor across all imports;
+    # finished jobs are committed BULK_COMMIT_SIZE at a time.
+    BULK_CONCURRENCY = int(os.environ.get('BULK_CONCURRENCY', 4))
+    BULK_COMMIT_SIZE = 20
+    BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 500))
+    BULK_MAX_ARCHIVE_BYTES = int(os.environ.get('BULK_MAX_ARCHIVE_BYTES', 2 * 1024 ** 3))
+
+    # In-process tab engine (the shared stringscribe_common tab code)
+    # 'auto' renders tabs and note lists in the backend when the MIDI is on local disk
+    # (falling back to the processor URLs above), 'local' requires it, 'http' always proxies.
+    TAB_ENGINE = os.environ.get('TAB_ENGINE', 'auto')
+    TAB_ENGINE_WORKERS = int(os.environ.get('TAB_ENGINE_WORKERS', 4))
+    TAB_ENGINE_MAX_PENDING = 16
+
+    # Perceptual-fingerprint dedupe: an upload whose fingerprint lines up with an existing
+    # job's on at least FINGERPRINT_MIN_MATCHES hashes and FINGERPRINT_MIN_CONFIDENCE of
+    # its own hashes reuses that job's transcription instead of running the model again.
+    # The processor admits fingerprinting through its job scheduler, at a small fraction of a transcription's cost.
+    FINGERPRINT_DEDUPE = os.environ.get('FINGERPRINT_DEDUPE', '1') == '1'
+    FINGERPRINT_MIN_MATCHES = 20
+    FINGERPRINT_MIN_CONFIDENCE = 0.15
+
+    # Resumable uploads (/api/uploads)
+    UPLOADS_DIR = os.path.join(basedir, '..', 'uploads')
+    UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', 4 * 1024 ** 3))
+    # Unfinished uploads untouched for this long are deleted
+    UPLOAD_TTL = 24 * 3600
+
+    # Profiling
+    # Per-request cProfile dumps; requests must send this token in 'X-Profile-Token'
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+    PROFILES_DIR = os.path.join(basedir, '..', 'profiles')
 
     PROCESSED_FILES_DIR = os.path.join(
         basedir, '..', '..', 'audio-tab-processor', 'processed_files'
@@ -0,0 +1,166 @@
+# backend/app/fingerprints.py
+import os
+import shutil
+import time
+import uuid
+from collections import Counter, defaultdict
+
+import requests
+from flask import current_app
+
+from stringscribe_common.metrics import track_stage
+from .models import db, AudioFingerprint, AudioProcessingJob
+from .services import save_job_result
+
+# Hashes per IN (...) query; stays under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+
+def fingerprint_upload(temp_file_path):
+    """
+    Asks the processor for the perceptual fingerprint of an uploaded file.
+
+    Dedupe is best effort: if the processor can't fingerprint the file, the job
+    is simply transcribed as usual.
+
+    Returns:
+        (list, list): Hashes and their frame offsets, or None on failure.
+    """
+    try:
+        with open(temp_file_path, 'rb') as f, track_stage("fingerprint"):
+            resp = requests.post(current_app.config['PROCESSOR_URL_FINGERPRINT'],
+                                 files={'audio_file': (os.path.basename(temp_file_path), f)}, timeout=120)
+        resp.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"Could not fingerprint {temp_file_path}: {e}")
+        return None
+    data = resp.json()
+    return data['hashes'], data['offsets']
+
+def find_matching_job(hashes, offsets):
+    """
+    Looks up the job whose fingerprint best matches, if the match is convincing.
+
+    Every stored occurrence of each query hash votes for (job, time shift between
+    the two recordings). A genuine match piles its votes onto one shift, while
+    chance collisions scatter. A job matches when its best shift, counting the
+    neighbouring frames either side for timing jitter, has at least
+    FINGERPRINT_MIN_MATCHES votes and at least FINGERPRINT_MIN_CONFIDENCE of the
+    query's hashes.
+
+    Returns:
+        (int, float): The job id and the match confidence, or None.
+    """
+    if not hashes:
+        return None
+
+    query_offsets = defaultdict(list)
+    for h, offset in zip(hashes, offsets):
+        query_offsets[h].append(offset)
+    unique_hashes = list(query_offsets)
+
+    votes = Counter()
+    with track_stage("fingerprint_lookup"):
+        for start in range(0, len(unique_hashes), LOOKUP_CHUNK_SIZE):
+            rows = db.session.query(AudioFingerprint.hash, AudioFingerprint.job_id, AudioFingerprint.offset).filter(
+                AudioFingerprint.hash.in_(unique_hashes[start:start + LOOKUP_CHUNK_SIZE])
+            ).all()
+            for h, job_id, offset in rows:
+                for query_offset in query_offsets[h]:
+                    votes[job_id, offset - query_offset] += 1
+
+    best_job, best_score = None, 0
+    for (job_id, shift), count in votes.items():
+        score = count + votes.get((job_id, shift - 1), 0) + votes.get((job_id, shift + 1), 0)
+        if score > best_score:
+            best_job, best_score = job_id, score
+
+    confidence = best_score / len(hashes)
+    if best_score < current_app.config['FINGERPRINT_MIN_MATCHES'] or \
+            confidence < current_app.config['FINGERPRINT_MIN_CONFIDENCE']:
+        return None
+    return best_job, confidence
+
+def store_fingerprint(job_id, hashes, offsets, commit=True):
+    """Replaces a job's stored fingerprint, inserting the rows in one executemany."""
+    clear_fingerprint(job_id)
+    if hashes:
+        with track_stage("fingerprint_store"):
+            db.session.execute(
+                AudioFingerprint.__table__.insert(),
+                [{"job_id": job_id, "hash": h, "offset": o} for h, o in zip(hashes, offsets)],
+            )
+    if commit:
+        db.session.commit()
+
+def clear_fingerprint(job_id):
+    """Deletes a job's fingerprint rows in one statement (no ORM cascade over thousands of rows)."""
+    AudioFingerprint.query.filter_by(job_id=job_id).delete(synchronize_session=False)
+
+def copy_job_outputs(matched_job, params):
+    """
+    Gives a new job its own copy of a matched job's outputs instead of transcribing again.
+
+    The matched job's directory (MIDI, WAV and saved model output) is copied, so
+    either job can later be deleted on its own. The copy is then re-thresholded
+    with this request's parameters from the saved model output, which takes
+    milliseconds and gives the notes a fresh transcription with those settings would.
+
+    Returns:
+        dict: Processor-style result (midi_relative_path, wav_relative_path, midi_filename).
+    """
+    base_dir = current_app.config['PROCESSED_FILES_DIR']
+    source_dir = os.path.dirname(matched_job.midi_relative_path)
+    new_dir = f"job_{int(time.time() * 1000)}_{uuid.uuid4().hex[:6]}"
+    with track_stage("copy_job_outputs"):
+        shutil.copytree(os.path.join(base_dir, source_dir), os.path.join(base_dir, new_dir))
+
+    def moved(path):
+        return os.path.join(new_dir, os.path.basename(path)) if path else None
+
+    result = {
+        "midi_relative_path": moved(matched_job.midi_relative_path),
+        "wav_relative_path": moved(matched_job.wav_relative_path),
+        "midi_filename": moved(matched_job.midi_filename),
+    }
+
+    try:
+        with track_stage("proxy_rethreshold"):
+            resp = requests.post(current_app.config['PROCESSOR_URL_RETHRESHOLD'],
+                                 json={**params, "midi_filename": result["midi_filename"], "sonify": True},
+                                 timeout=120)
+        if resp.status_code == 200:
+            rethresholded = resp.json()
+            result["wav_relative_path"] = rethresholded.get('wav_relative_path') or result["wav_relative_path"]
+        else:
+            # e.g. the matched job predates saved model outputs; keep its notes as they are
+            print(f"Could not re-threshold reused job {new_dir}: {resp.status_code}")
+    except requests.exceptions.RequestException as e:
+        print(f"Could not re-threshold reused job {new_dir}: {e}")
+    return result
+
+def reuse_matching_job(user_id, source_hash, source_info, fingerprint, params):
+    """
+    Creates the user's job from an existing transcription of the same recording, if there is one.
+
+    Returns:
+        AudioProcessingJob: The committed job, or None if nothing matched well enough.
+    """
+    match = find_matching_job(*fingerprint) if fingerprint else None
+    if not match:
+        return None
+    matched_job = AudioProcessingJob.query.get(match[0])
+    if not matched_job or not matched_job.midi_relative_path:
+        return None
+
+    try:
+        processor_data = copy_job_outputs(matched_job, params)
+    except OSError as e:
+        print(f"Could not copy outputs of job {matched_job.id}: {e}")
+        return None
+
+    print(f"REUSING job {matched_job.id} ({match[1]:.0%} fingerprint match) for user {user_id}")
+    job = save_job_result(user_id, source_hash, source_info, processor_data, commit=False)
+    db.session.flush()
+    store_fingerprint(job.id, *fingerprint)
+    return job
@@ -0,0 +1,152 @@
+# backend/app/local_tabs.py
+import importlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.utils import safe_join
+
+from stringscribe_common.metrics import REGISTRY, track_stage
+
+TAB_ENGINE_MODES = ("auto", "local", "http")
+
+TAB_ENGINE_FALLBACKS = REGISTRY.counter(
+    "stringscribe_tab_engine_fallbacks_total",
+    "Tab, note and piano-roll requests sent to the processor over HTTP because the in-process pool was full.")
+
+
+class TabEngine:
+    """
+    Runs the tab, note-extraction and piano-roll code inside the backend.
+
+    Rendering a tab is pure Python over a MIDI file, so when the backend can see
+    the processor's PROCESSED_FILES_DIR there is no reason to pay for an HTTP
+    round trip, a JSON re-encode and a processor thread per request. The code is
+    the stringscribe_common package the processor uses too, run on a small
+    bounded pool. Callers fall back to the HTTP proxy whenever handles() says no:
+    the engine is off (TAB_ENGINE='http'), the code's dependencies (numpy,
+    pretty_midi) aren't installed, or the MIDI isn't on local disk; and when a
+    call returns None because the pool is full, which is counted in
+    stringscribe_tab_engine_fallbacks_total.
+    """
+
+    def __init__(self, app=None):
+        self._executor = None
+        self._slots = None
+        self._tab_service = None
+        self._pianoroll_service = None
+        self._load_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TAB_ENGINE', 'auto')
+        app.config.setdefault('TAB_ENGINE_WORKERS', 4)
+        app.config.setdefault('TAB_ENGINE_MAX_PENDING', 16)
+        app.config.setdefault('TAB_ENGINE_TIMEOUT', 30)
+
+        self.mode = app.config['TAB_ENGINE']
+        if self.mode not in TAB_ENGINE_MODES:
+            raise ValueError(f"TAB_ENGINE must be one of {TAB_ENGINE_MODES}, got {self.mode!r}")
+        self.files_dir = app.config['PROCESSED_FILES_DIR']
+        self._timeout = app.config['TAB_ENGINE_TIMEOUT']
+
+        workers = app.config['TAB_ENGINE_WORKERS']
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tab-engine')
+        self._slots = threading.BoundedSemaphore(workers + app.config['TAB_ENGINE_MAX_PENDING'])
+        if self.mode == 'local':
+            # Fail at startup rather than on the first request
+            self._load()
+        app.extensions['tab_engine'] = self
+
+    def _load(self):
+        """Imports the shared tab_service (and pianoroll_service) once; returns None if it isn't importable."""
+        if self._tab_service is not None:
+            return self._tab_service
+        with self._load_lock:
+            if self._tab_service is None:
+                try:
+                    self._pianoroll_service = importlib.import_module('stringscribe_common.pianoroll_service')
+                    self._tab_service = importlib.import_module('stringscribe_common.tab_service')
+                except ImportError as e:
+                    if self.mode == 'local':
+                        raise
+                    print(f"In-process tab engine unavailable, using the processor over HTTP: {e}")
+                    self.mode = 'http'
+        return self._tab_service
+
+    def _midi_path(self, midi_filename):
+        if not midi_filename:
+            return None
+        path = safe_join(self.files_dir, midi_filename)
+        return path if path and os.path.isfile(path) else None
+
+    def handles(self, midi_filename):
+        """True if this MIDI file can be processed in-process instead of through the processor."""
+        return self.mode != 'http' and self._midi_path(midi_filename) is not None and self._load() is not None
+
+    def _run(self, fn, *args):
+        """Runs fn on the pool and waits for it, or returns None straight away if the pool is full."""
+        if not self._slots.acquire(blocking=False):
+            TAB_ENGINE_FALLBACKS.inc()
+            return None
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(timeout=self._timeout)
+
+    def _load_midi(self, midi_filename):
+        import pretty_midi
+        with track_stage("midi_load"):
+            return pretty_midi.PrettyMIDI(self._midi_path(midi_filename))
+
+    def generate_tabs(self, midi_filename, algorithm="efficient", tuning="standard", capo=0):
+        """
+        Renders a tab for a MIDI file under PROCESSED_FILES_DIR.
+
+        Returns:
+            str: The tab text, or None if the pool is full and the caller should use the processor.
+
+        Raises:
+            ValueError: If the tuning or capo is invalid.
+        """
+        tab_service = self._load()
+
+        def render():
+            # render_tab records its own tab_render_* stage
+            return tab_service.render_tab(self._load_midi(midi_filename), algorithm, tuning, capo)
+
+        return self._run(render)
+
+    def get_notes(self, midi_filename, layout="rows"):
+        """
+        Lists a MIDI file's notes in the processor's /get_midi_notes format.
+
+        Returns:
+            dict: The notes payload, or None if the pool is full and the caller should use the processor.
+
+        Raises:
+            ValueError: If the layout is unknown.
+        """
+        tab_service = self._load()
+        if layout not in tab_service.NOTE_LAYOUTS:
+            raise ValueError(f"layout must be one of {tab_service.NOTE_LAYOUTS}")
+        return self._run(lambda: tab_service.extract_notes(self._load_midi(midi_filename), layout))
+
+    def get_pianoroll(self, midi_filename, level=None, start_tile=0, end_tile=None):
+        """
+        Reads a MIDI file's piano-roll pyramid in the processor's /get_pianoroll format.
+
+        The pyramid is cached next to the MIDI, so the processor and the backend share it.
+
+        Returns:
+            dict: The pyramid metadata and requested tiles, or None if the pool is full.
+
+        Raises:
+            ValueError: If the level or tile range is out of bounds.
+        """
+        self._load()
+        return self._run(self._pianoroll_service.read_pianoroll, self._midi_path(midi_filename), level, start_tile, end_tile)
@@ -1,7 +1,9 @@
 from flask_login import UserMixin
-from . import db, bcrypt  # Imports the db and bcrypt instances from __init__.py
+from . import db, bcrypt, password_hasher  # Imports the extension instances from __init__.py
+from .passwords import get_hash_rounds
 from datetime import datetime
-from flask import url_for
+from flask import url_for, current_app
+from sqlalchemy import event
 import os
 
 class User(db.Model, UserMixin):
@@ -16,12 +18,16 @@ class User(db.Model, UserMixin):
     audio_jobs = db.relationship('AudioProcessingJob', backref='user', lazy=True, cascade="all, delete-orphan")
 
     def set_password(self, password):
-        """Creates a securely hashed password."""
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf8')
+        """Creates a securely hashed password using the configured work factor."""
+        self.password_hash = password_hasher.hash(password, current_app.config['BCRYPT_LOG_ROUNDS'])
 
     def check_password(self, password):
         """Checks if a provided password matches the stored hash."""
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return password_hasher.check(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """True when the stored hash was made with a different work factor than the current one."""
+        return get_hash_rounds(self.password_hash) != current_app.config['BCRYPT_LOG_ROUNDS']
 
 class AudioProcessingJob(db.Model):
     """
@@ -85,3 +91,32 @@ class TabGeneration(db.Model):
     algorithm = db.Column(db.String(50), nullable=True)
     tab_text = db.Column(db.Text, nullable=True)
 
+
+class AudioFingerprint(db.Model):
+    """
+    One landmark hash of a job's perceptual audio fingerprint (see fingerprints.py).
+
+    A job has a few thousand of these. The covering index on (hash, job_id, offset)
+    lets a lookup find every job sharing a hash, and where in that job it occurs,
+    without touching the table itself.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('audio_processing_job.id', ondelete='CASCADE'),
+                       nullable=False, index=True)
+    hash = db.Column(db.Integer, nullable=False)
+    offset = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_audio_fingerprint_hash', 'hash', 'job_id', 'offset'),
+    )
+
+
+@event.listens_for(AudioProcessingJob, 'before_delete')
+def delete_job_fingerprint(mapper, connection, job):
+    """
+    Deletes a job's fingerprint rows whenever the job is deleted, including along with its user.
+
+    One DELETE statement rather than a relationship cascade, which would load the
+    job's thousands of rows first; SQLite doesn't enforce the ON DELETE CASCADE by default.
+    """
+    connection.execute(AudioFingerprint.__table__.delete().where(AudioFingerprint.job_id == job.id))
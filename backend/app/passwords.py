@@ -0,0 +1,84 @@
+# backend/app/passwords.py
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already queued or running, or one took too long."""
+
+    def __init__(self, retry_after):
+        super().__init__("Password hashing is saturated, retry later")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small, bounded worker pool instead of the request thread.
+
+    Only PASSWORD_HASH_WORKERS hashes burn CPU at any time, and at most
+    PASSWORD_HASH_MAX_PENDING may be waiting for a worker. Anything beyond that
+    is rejected straight away, so a login storm fails fast instead of tying up
+    every Flask worker thread that the job endpoints also need.
+    """
+
+    def __init__(self, app=None):
+        self._executor = None
+        self._slots = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 2)
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', 16)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10)
+        app.config.setdefault('PASSWORD_HASH_RETRY_AFTER', 2)
+
+        workers = app.config['PASSWORD_HASH_WORKERS']
+        if self._executor is not None:
+            # One hasher serves every app; let a previous app's pool finish its hashes and exit
+            self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(workers + app.config['PASSWORD_HASH_MAX_PENDING'])
+        self._timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        self._retry_after = app.config['PASSWORD_HASH_RETRY_AFTER']
+        app.extensions['password_hasher'] = self
+
+    def _run(self, fn, *args):
+        """
+        Runs fn on the pool and waits for it.
+
+        Raises PasswordHasherBusy if the pool is full, or if the result isn't back
+        within PASSWORD_HASH_TIMEOUT (the pool is too backed up to answer in time).
+        """
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy(self._retry_after)
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self._timeout)
+        except FutureTimeoutError:
+            # Frees the slot now if the hash never started; a running one can't be stopped
+            future.cancel()
+            raise PasswordHasherBusy(self._retry_after) from None
+
+    def hash(self, password, rounds):
+        """Returns a bcrypt hash of the password using the given work factor."""
+        from . import bcrypt
+        return self._run(bcrypt.generate_password_hash, password, rounds).decode('utf8')
+
+    def check(self, pw_hash, password):
+        """Checks a password against a stored hash."""
+        from . import bcrypt
+        return self._run(bcrypt.check_password_hash, pw_hash, password)
+
+
+def get_hash_rounds(pw_hash):
+    """Reads the work factor out of a '$2b$12$...' style bcrypt hash."""
+    try:
+        return int(pw_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
@@ -1,14 +1,61 @@
 # backend/app/routes.py
-from flask import Blueprint, request, jsonify, current_app, send_from_directory
+from flask import Blueprint, Response, request, jsonify, current_app, send_from_directory, stream_with_context
 from .models import db, User, bcrypt, AudioProcessingJob, TabGeneration
 from flask_login import login_user, logout_user, login_required, current_user
-from .services import get_source_hash, forward_to_processor, delete_job_files
+from .services import (get_source_hash, forward_to_processor, stream_from_processor, delete_job_files,
+                       save_job_result, ProcessorBusy)
+from .passwords import PasswordHasherBusy
+from .uploads import UploadError
+from .fingerprints import fingerprint_upload, reuse_matching_job, store_fingerprint
+from . import tab_engine, bulk_importer, upload_store
+from .bulk import (BulkRequestError, collect_archive_items, collect_url_items, collect_playlist_items,
+                   remove_temp_files)
+from stringscribe_common.metrics import track_stage
+import json
+import os
 import requests
 from datetime import datetime
 
 api = Blueprint('api', __name__)
 
-# --- AUTHENTICATION ROUTES (Unchanged) ---
+@api.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(e):
+    """Sheds auth requests when the bcrypt pool is full instead of queueing them on request threads."""
+    return jsonify({"error": "Too many authentication requests, please retry"}), 503, {"Retry-After": str(e.retry_after)}
+
+@api.errorhandler(UploadError)
+def upload_error(e):
+    """Answers a rejected upload request, telling the client where to resume when that's known."""
+    headers = {"Upload-Offset": str(e.offset)} if e.offset is not None else {}
+    return jsonify({"error": str(e), "offset": e.offset}), e.status_code, headers
+
+@api.errorhandler(ProcessorBusy)
+def processor_busy(e):
+    """Passes the processor's back-pressure (429 + Retry-After) through to the client."""
+    return jsonify({"error": str(e)}), 429, {"Retry-After": str(e.retry_after)}
+
+def _passthrough_request_headers():
+    """Forwards the client's Accept-Encoding so the processor compresses once, for the end client."""
+    return {"Accept-Encoding": request.headers.get("Accept-Encoding", "identity")}
+
+def _relay_processor_response(resp, status_code=None):
+    """
+    Streams a processor response (requested with stream=True) to the client byte for byte,
+    keeping its Content-Encoding, instead of decoding and re-serializing the JSON.
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    for name in ("Content-Encoding", "Content-Length"):
+        if name in resp.headers:
+            headers[name] = resp.headers[name]
+    response = Response(resp.raw.stream(64 * 1024, decode_content=False),
+                        status=status_code or resp.status_code,
+                        content_type=resp.headers.get("Content-Type", "application/json"),
+                        headers=headers)
+    response.call_on_close(resp.close)
+    return response
+
+# --- AUTHENTICATION ROUTES ---
+# Hashing runs on the bounded bcrypt pool (passwords.py); a full pool answers 503 (see above)
 @api.route("/register", methods=["POST"])
 def register():
     # ... (code from previous step)
@@ -23,10 +70,13 @@ def register():
 
 @api.route("/login", methods=["POST"])
 def login():
-    # ... (code from previous step)
     data = request.json
     user = User.query.filter_by(email=data.get('email')).first()
     if user and user.check_password(data.get('password')):
+        # Transparently upgrade hashes made with an older work factor
+        if user.password_needs_rehash():
+            user.set_password(data.get('password'))
+            db.session.commit()
         login_user(user)
         return jsonify({"user": {"id": user.id, "username": user.username}}), 200
     return jsonify({"error": "Invalid credentials"}), 401
@@ -52,6 +102,47 @@ def serve_processed_file(filename):
 
 # This function goes inside backend/app/routes.py
 
+# --- RESUMABLE UPLOADS ---
+# POST /uploads {filename, size} -> upload_id; PATCH /uploads/<id> with an 'Upload-Offset'
+# header and the chunk's bytes as the body, repeated until complete; then /process with
+# 'upload_id' in place of 'audio_file'. HEAD /uploads/<id> tells a client where to resume.
+
+def _upload_response(meta, status_code=200):
+    headers = {"Upload-Offset": str(meta['offset']), "Upload-Length": str(meta['size'])}
+    body = {k: meta[k] for k in ("upload_id", "filename", "size", "offset")}
+    body["complete"] = meta['sha256'] is not None
+    return jsonify(body), status_code, headers
+
+@api.route("/uploads", methods=["POST"])
+@login_required
+def create_upload():
+    """Starts a resumable upload."""
+    data = request.json or {}
+    return _upload_response(upload_store.create(current_user.id, data.get('filename'), data.get('size')), 201)
+
+@api.route("/uploads/<upload_id>", methods=["GET", "HEAD"])
+@login_required
+def get_upload(upload_id):
+    """Reports how much of an upload the server has, so the client can resume from there."""
+    return _upload_response(upload_store.get(upload_id, current_user.id))
+
+@api.route("/uploads/<upload_id>", methods=["PATCH"])
+@login_required
+def append_upload(upload_id):
+    """Appends one chunk, streamed from the request body, at the offset given in 'Upload-Offset'."""
+    try:
+        offset = int(request.headers['Upload-Offset'])
+    except (KeyError, ValueError):
+        return jsonify({"error": "Upload-Offset header required"}), 400
+    return _upload_response(upload_store.append(upload_id, current_user.id, offset, request.stream))
+
+@api.route("/uploads/<upload_id>", methods=["DELETE"])
+@login_required
+def delete_upload(upload_id):
+    """Abandons an upload."""
+    upload_store.delete(upload_id, current_user.id)
+    return jsonify({"message": "Upload deleted"}), 200
+
 @api.route("/process", methods=["POST"])
 @login_required
 def process_request():
@@ -63,57 +154,133 @@ def process_request():
     data = request.form.to_dict()
 
     # Use the helper function from services.py to get a unique hash for the audio source
-    source_hash, source_info, temp_file_path = get_source_hash(request)
+    source_hash, source_info, temp_file_path = get_source_hash(request, user_id)
     if not source_hash:
         return jsonify({"error": "No audio file or YouTube URL provided"}), 400
 
-    # Check if a job for this exact audio source already exists for this user
-    existing_job = AudioProcessingJob.query.filter_by(
-        user_id=user_id, source_hash=source_hash
-    ).first()
+    reused_job, fingerprint = _reuse_by_fingerprint(user_id, source_hash, source_info, temp_file_path, data)
+    if reused_job:
+        os.unlink(temp_file_path)
+        return jsonify(reused_job.to_dict()), 200
 
     # Forward the audio to the processor service to get the MIDI and WAV files
-    processor_data, error = forward_to_processor(data, temp_file_path)
+    processor_data, error = forward_to_processor(data, temp_file_path, user_id)
     if error:
         return jsonify({"error": error}), 503
 
-    if existing_job:
-        # If a job exists, we overwrite it (destructive update)
-        print(f"OVERWRITING existing job {existing_job.id} for user {user_id}")
-
-        # 1. Delete the old physical .mid and .wav files from the server
-        delete_job_files(existing_job)
-
-        # 2. Update the existing database record with the new information
-        existing_job.title = source_info  # Reset the title to the new source info
-        existing_job.source_info = source_info
-        existing_job.midi_relative_path = processor_data.get('midi_relative_path')
-        existing_job.wav_relative_path = processor_data.get('wav_relative_path')
-        existing_job.midi_filename = processor_data.get('midi_filename')
-        existing_job.created_at = datetime.utcnow()
-
-        db.session.commit()
-        job_to_return = existing_job
-    else:
-        # If no job exists, we create a new one
-        print(f"CREATING new job for user {user_id}")
-
-        new_job = AudioProcessingJob(
-            user_id=user_id,
-            title=source_info,  # Use the source info as the default title
-            source_hash=source_hash,
-            source_info=source_info,
-            midi_relative_path=processor_data.get('midi_relative_path'),
-            wav_relative_path=processor_data.get('wav_relative_path'),
-            midi_filename=processor_data.get('midi_filename')
-        )
-        db.session.add(new_job)
-        db.session.commit()
-        job_to_return = new_job
+    # Create the job, or overwrite this user's existing job for the same source
+    job_to_return = _save_processed_job(user_id, source_hash, source_info, processor_data, fingerprint)
 
     # Return the full job object to the frontend
     return jsonify(job_to_return.to_dict()), 200
 
+@api.route("/process/stream", methods=["POST"])
+@login_required
+def process_stream_request():
+    """
+    Streaming variant of /process: relays the processor's Server-Sent Events
+    (status, notes, tab, done, error) as they arrive, so the client can draw notes
+    and a preliminary tab before the job finishes. When the processor reports
+    'done', the job is saved and a final 'job' event carries the saved job.
+    A job reused from a matching fingerprint is sent as a lone 'job' event.
+    """
+    user_id = current_user.id
+    data = request.form.to_dict()
+
+    source_hash, source_info, temp_file_path = get_source_hash(request, user_id)
+    if not source_hash:
+        return jsonify({"error": "No audio file or YouTube URL provided"}), 400
+
+    reused_job, fingerprint = _reuse_by_fingerprint(user_id, source_hash, source_info, temp_file_path, data)
+    if reused_job:
+        os.unlink(temp_file_path)
+        return Response(f"event: job\ndata: {json.dumps(reused_job.to_dict())}\n\n", mimetype="text/event-stream")
+
+    def relay():
+        for event, payload, raw in stream_from_processor(data, temp_file_path, user_id):
+            if event != "done":
+                yield raw
+                continue
+            processor_data = json.loads(payload)
+            job = _save_processed_job(user_id, source_hash, source_info, processor_data, fingerprint)
+            # Re-encoded because the processor's fingerprint, if any, is for the backend only
+            yield f"event: done\ndata: {json.dumps(processor_data)}\n\n"
+            yield f"event: job\ndata: {json.dumps(job.to_dict())}\n\n"
+
+    return Response(stream_with_context(relay()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _reuse_by_fingerprint(user_id, source_hash, source_info, temp_file_path, data):
+    """
+    The same song in another encoding hashes differently, so when FINGERPRINT_DEDUPE is on,
+    an upload's perceptual fingerprint is checked and a matching transcription reused.
+    A URL is downloaded by the processor, so it is asked (in 'data') to fingerprint it during the job.
+
+    Returns:
+        (AudioProcessingJob, tuple): The reused job or None, and the upload's fingerprint or None.
+    """
+    if not current_app.config['FINGERPRINT_DEDUPE']:
+        return None, None
+    if not temp_file_path:
+        data['fingerprint'] = '1'
+        return None, None
+    fingerprint = fingerprint_upload(temp_file_path)
+    return reuse_matching_job(user_id, source_hash, source_info, fingerprint, data), fingerprint
+
+def _save_processed_job(user_id, source_hash, source_info, processor_data, fingerprint):
+    """Saves a processor result as the user's job, with its fingerprint from the upload or the processor."""
+    job = save_job_result(user_id, source_hash, source_info, processor_data)
+    processor_fingerprint = processor_data.pop('fingerprint', None)
+    if processor_fingerprint:
+        fingerprint = processor_fingerprint['hashes'], processor_fingerprint['offsets']
+    if fingerprint:
+        store_fingerprint(job.id, *fingerprint)
+    return job
+
+@api.route("/process/bulk", methods=["POST"])
+@login_required
+def process_bulk_request():
+    """
+    Imports many sources at once: a JSON body with 'urls' (a list) and/or 'playlist_url',
+    or a multipart upload with a zip 'archive' of audio files. Any other fields are
+    passed to the processor as transcription parameters for every item.
+
+    Sources the user already has a job for are skipped. The rest are transcribed in
+    the background; poll /process/bulk/<bulk_id> for progress.
+    """
+    max_items = current_app.config['BULK_MAX_ITEMS']
+    try:
+        if 'archive' in request.files:
+            params = request.form.to_dict()
+            items = collect_archive_items(request.files['archive'], max_items,
+                                          current_app.config['BULK_MAX_ARCHIVE_BYTES'])
+        else:
+            data = request.get_json(silent=True) or {}
+            params = {k: v for k, v in data.items() if k not in ('urls', 'playlist_url')}
+            items = collect_url_items(data.get('urls') or [])
+            if data.get('playlist_url'):
+                items += collect_playlist_items(data['playlist_url'], max_items)
+    except BulkRequestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not items:
+        return jsonify({"error": "No URLs, playlist or audio files provided"}), 400
+    if len(items) > max_items:
+        remove_temp_files(items)
+        return jsonify({"error": f"At most {max_items} items can be imported at once"}), 400
+
+    bulk = bulk_importer.start(current_user.id, items, params)
+    return jsonify(bulk.to_dict()), 202
+
+@api.route("/process/bulk/<bulk_id>", methods=["GET"])
+@login_required
+def bulk_status(bulk_id):
+    """Reports the progress of a bulk import started by the current user."""
+    bulk = bulk_importer.get(bulk_id, current_user.id)
+    if not bulk:
+        return jsonify({"error": "Bulk import not found"}), 404
+    return jsonify(bulk.to_dict()), 200
+
 @api.route("/generate_tabs", methods=["POST"])
 @login_required
 def generate_tabs_proxy():
@@ -127,22 +294,72 @@ def generate_tabs_proxy():
     if not job:
         return jsonify({"error": "Audio job not found or you do not own it"}), 404
 
-    proxy_payload = {"midi_filename": job.midi_filename, "algorithm": algorithm}
-    resp = requests.post(current_app.config['PROCESSOR_URL_TABS'], json=proxy_payload)
-    if resp.status_code != 200:
-        return jsonify(resp.json()), resp.status_code
-
-    tab_data = resp.json()
+    tuning, capo = data.get('tuning', 'standard'), data.get('capo', 0)
+    if tab_engine.handles(job.midi_filename):
+        try:
+            tab_text = tab_engine.generate_tabs(job.midi_filename, algorithm, tuning, capo)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        if tab_text is not None:
+            return jsonify({"tab_text": tab_text}), 201
+
+    proxy_payload = {"midi_filename": job.midi_filename, "algorithm": algorithm, "tuning": tuning, "capo": capo}
+    with track_stage("proxy_generate_tabs"):
+        resp = requests.post(current_app.config['PROCESSOR_URL_TABS'], json=proxy_payload,
+                             headers=_passthrough_request_headers(), stream=True)
 
     # We will add renaming and history later. For now, just return the text.
-    return jsonify(tab_data), 201
+    return _relay_processor_response(resp, 201 if resp.status_code == 200 else resp.status_code)
 
 @api.route("/get_midi_notes", methods=["POST"])
 @login_required
 def get_midi_notes_proxy():
-    """Proxies the request to get MIDI note data for the visualizer."""
-    resp = requests.post(current_app.config['PROCESSOR_URL_NOTES'], json=request.json)
-    return jsonify(resp.json()), resp.status_code
+    """Returns MIDI note data for the visualizer, in-process when the file is local, else via the processor."""
+    data = request.json
+    midi_filename = data.get('midi_filename')
+    if tab_engine.handles(midi_filename):
+        try:
+            notes_data = tab_engine.get_notes(midi_filename, data.get('layout', 'rows'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        if notes_data is not None:
+            return jsonify(notes_data), 200
+
+    with track_stage("proxy_get_midi_notes"):
+        resp = requests.post(current_app.config['PROCESSOR_URL_NOTES'], json=data,
+                             headers=_passthrough_request_headers(), stream=True)
+    return _relay_processor_response(resp)
+
+@api.route("/get_pianoroll", methods=["POST"])
+@login_required
+def get_pianoroll_proxy():
+    """
+    Returns piano-roll tiles for the visualizer (see the processor's /get_pianoroll),
+    in-process when the file is local, else via the processor.
+    """
+    data = request.json
+    midi_filename = data.get('midi_filename')
+    if tab_engine.handles(midi_filename):
+        try:
+            level = None if data.get('level') is None else int(data['level'])
+            start_tile = int(data.get('start_tile', 0))
+            end_tile = None if data.get('end_tile') is None else int(data['end_tile'])
+            pianoroll = tab_engine.get_pianoroll(midi_filename, level, start_tile, end_tile)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        if pianoroll is not None:
+            return jsonify(pianoroll), 200
+
+    with track_stage("proxy_get_pianoroll"):
+        resp = requests.post(current_app.config['PROCESSOR_URL_PIANOROLL'], json=data,
+                             headers=_passthrough_request_headers(), stream=True)
+    return _relay_processor_response(resp)
 
 @api.route("/my-jobs", methods=["GET"])
 @login_required
@@ -171,6 +388,31 @@ def rename_job(job_id):
 
     return jsonify(job.to_dict()), 200
 
+@api.route("/jobs/<int:job_id>/rethreshold", methods=["POST"])
+@login_required
+def rethreshold_job(job_id):
+    """
+    Re-extracts a job's notes with new thresholds (onset_threshold, frame_threshold,
+    minimum_note_length, minPitch, maxPitch) from the processor's saved model output.
+    """
+    job = AudioProcessingJob.query.get(job_id)
+    if not job or job.user_id != current_user.id:
+        return jsonify({"error": "Job not found or you do not own it"}), 404
+
+    payload = {**(request.json or {}), "midi_filename": job.midi_filename}
+    with track_stage("proxy_rethreshold"):
+        resp = requests.post(current_app.config['PROCESSOR_URL_RETHRESHOLD'], json=payload)
+    if resp.status_code != 200:
+        return jsonify(resp.json()), resp.status_code
+
+    processor_data = resp.json()
+    job.midi_relative_path = processor_data.get('midi_relative_path') or job.midi_relative_path
+    # The WAV is only regenerated when 'sonify' was requested
+    job.wav_relative_path = processor_data.get('wav_relative_path') or job.wav_relative_path
+    db.session.commit()
+
+    return jsonify(job.to_dict()), 200
+
 @api.route("/jobs/<int:job_id>", methods=["DELETE"])
 @login_required
 def delete_job(job_id):
@@ -182,7 +424,8 @@ def delete_job(job_id):
     # Delete the physical .mid and .wav files first
     delete_job_files(job)
 
-    # The 'cascade' option in the model will automatically delete child TabGenerations
+    # The 'cascade' option in the model will automatically delete child TabGenerations,
+    # and the job's fingerprint rows go with it (see models.py)
     db.session.delete(job)
     db.session.commit()
 
@@ -1,13 +1,20 @@
 # backend/app/services.py
 import os
+import math
 import hashlib
 import tempfile
+import shutil
 import requests
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from flask import current_app
 
-def get_source_hash(request):
+from stringscribe_common.metrics import track_stage
+from .models import db, AudioProcessingJob
+
+def get_source_hash(request, user_id=None):
     """
-    Calculates a hash for the source (file or URL).
+    Calculates a hash for the source (file, URL, or a finished chunked upload).
     Returns (hash, source_info, temp_file_path)
     """
     data = request.form.to_dict()
@@ -17,6 +24,12 @@ def get_source_hash(request):
         source_hash = data['youtube_url']
         return source_hash, source_info, None
 
+    elif data.get('upload_id'):
+        # Hashed while the chunks arrived (see uploads.py), so the file isn't read again here
+        from . import upload_store
+        source_hash, filename, temp_file_path = upload_store.claim(data['upload_id'], user_id)
+        return source_hash, f"file: {filename}", temp_file_path
+
     elif 'audio_file' in request.files:
         incoming_file = request.files['audio_file']
         source_info = f"file: {incoming_file.filename}"
@@ -25,29 +38,72 @@ def get_source_hash(request):
             incoming_file.save(temp_file.name)
             temp_file_path = temp_file.name
 
-        sha256 = hashlib.sha256()
-        with open(temp_file_path, 'rb') as f:
-            while chunk := f.read(8192):
-                sha256.update(chunk)
-        source_hash = sha256.hexdigest()
+        with track_stage("hash_source"):
+            sha256 = hashlib.sha256()
+            with open(temp_file_path, 'rb') as f:
+                while chunk := f.read(8192):
+                    sha256.update(chunk)
+            source_hash = sha256.hexdigest()
 
         return source_hash, source_info, temp_file_path
 
     return None, None, None
 
-def forward_to_processor(data, temp_file_path):
-    """ Forwards the request to the audio-tab-processor service. """
+class ProcessorBusy(Exception):
+    """Raised when the processor's job queue is full (it answered 429)."""
+
+    def __init__(self, retry_after):
+        super().__init__("Processing service is busy, please retry later")
+        self.retry_after = retry_after
+
+def _retry_after_seconds(processor_response):
+    """
+    Reads the processor's Retry-After header as a number of seconds.
+
+    The header may hold seconds or an HTTP date; anything missing or unparseable
+    falls back to PROCESSOR_DEFAULT_RETRY_AFTER.
+    """
+    default = current_app.config['PROCESSOR_DEFAULT_RETRY_AFTER']
+    value = processor_response.headers.get('Retry-After')
+    if not value:
+        return default
+    try:
+        return max(0, int(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if retry_at is None:
+        return default
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0, math.ceil((retry_at - datetime.now(timezone.utc)).total_seconds()))
+
+def forward_to_processor(data, temp_file_path, user_id=None, cleanup=True):
+    """
+    Forwards the request to the audio-tab-processor service.
+
+    The user id is sent along in 'X-User-Id' so the processor can schedule
+    jobs fairly between users. Raises ProcessorBusy if the processor is saturated.
+    The temp file is deleted afterwards unless cleanup is False (e.g. to retry).
+    """
     files_to_forward = None
     try:
         if temp_file_path:
             files_to_forward = {'audio_file': (os.path.basename(temp_file_path), open(temp_file_path, 'rb'))}
 
-        processor_response = requests.post(
-            current_app.config['PROCESSOR_URL_AUDIO'],
-            files=files_to_forward,
-            data=data,
-            timeout=300
-        )
+        with track_stage("forward_to_processor"):
+            processor_response = requests.post(
+                current_app.config['PROCESSOR_URL_AUDIO'],
+                files=files_to_forward,
+                data=data,
+                headers={'X-User-Id': str(user_id)} if user_id is not None else None,
+                timeout=300
+            )
+        if processor_response.status_code == 429:
+            raise ProcessorBusy(_retry_after_seconds(processor_response))
         processor_response.raise_for_status()
         return processor_response.json(), None
 
@@ -55,12 +111,101 @@ def forward_to_processor(data, temp_file_path):
         print(f"Error communicating with processor: {e}")
         return None, "Processing service failed or timed out"
 
+    finally:
+        if files_to_forward:
+            files_to_forward['audio_file'][1].close()
+        if cleanup and temp_file_path and os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
+
+def stream_from_processor(data, temp_file_path, user_id=None):
+    """
+    Sends the job to the processor's streaming endpoint and yields its Server-Sent Events.
+
+    Yields:
+        (event, data, raw): The event name, its data string, and the raw event text
+        to relay unchanged. Connection failures are reported as an 'error' event.
+    """
+    files_to_forward = None
+    try:
+        if temp_file_path:
+            files_to_forward = {'audio_file': (os.path.basename(temp_file_path), open(temp_file_path, 'rb'))}
+
+        with requests.post(current_app.config['PROCESSOR_URL_AUDIO_STREAM'], files=files_to_forward,
+                           data=data, stream=True, timeout=300,
+                           headers={'X-User-Id': str(user_id)} if user_id is not None else None) as processor_response:
+            if processor_response.status_code == 429:
+                yield "error", None, ('event: error\ndata: {"error": "Processing service is busy, please retry later", '
+                                      f'"retry_after": {_retry_after_seconds(processor_response)}}}\n\n')
+                return
+            processor_response.raise_for_status()
+            event, lines = "message", []
+            for line in processor_response.iter_lines(decode_unicode=True):
+                if line:
+                    lines.append(line)
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                    continue
+                # A blank line ends the event
+                if lines:
+                    payload = "\n".join(l[len("data:"):].strip() for l in lines if l.startswith("data:"))
+                    yield event, payload, "\n".join(lines) + "\n\n"
+                event, lines = "message", []
+
+    except requests.exceptions.RequestException as e:
+        print(f"Error streaming from processor: {e}")
+        yield "error", None, 'event: error\ndata: {"error": "Processing service failed or timed out"}\n\n'
+
     finally:
         if files_to_forward:
             files_to_forward['audio_file'][1].close()
         if temp_file_path and os.path.exists(temp_file_path):
             os.unlink(temp_file_path)
 
+def save_job_result(user_id, source_hash, source_info, processor_data, commit=True):
+    """
+    Stores a processor result as the user's job for this source.
+
+    A user keeps one job per source: if one already exists it is overwritten
+    (its old files are deleted), otherwise a new job is created.
+    """
+    existing_job = AudioProcessingJob.query.filter_by(
+        user_id=user_id, source_hash=source_hash
+    ).first()
+
+    if existing_job:
+        # If a job exists, we overwrite it (destructive update)
+        print(f"OVERWRITING existing job {existing_job.id} for user {user_id}")
+
+        # 1. Delete the old physical .mid and .wav files from the server
+        delete_job_files(existing_job)
+
+        # 2. Update the existing database record with the new information
+        existing_job.title = source_info  # Reset the title to the new source info
+        existing_job.source_info = source_info
+        existing_job.midi_relative_path = processor_data.get('midi_relative_path')
+        existing_job.wav_relative_path = processor_data.get('wav_relative_path')
+        existing_job.midi_filename = processor_data.get('midi_filename')
+        existing_job.created_at = datetime.utcnow()
+        job = existing_job
+    else:
+        # If no job exists, we create a new one
+        print(f"CREATING new job for user {user_id}")
+
+        job = AudioProcessingJob(
+            user_id=user_id,
+            title=source_info,  # Use the source info as the default title
+            source_hash=source_hash,
+            source_info=source_info,
+            midi_relative_path=processor_data.get('midi_relative_path'),
+            wav_relative_path=processor_data.get('wav_relative_path'),
+            midi_filename=processor_data.get('midi_filename')
+        )
+        db.session.add(job)
+
+    if commit:
+        db.session.commit()
+    return job
+
 def delete_job_files(job):
     """ Deletes the physical files associated with a job."""
     if not job:
@@ -76,4 +221,15 @@ def delete_job_files(job):
     if job.wav_relative_path:
         path = os.path.join(base_dir, job.wav_relative_path)
         if os.path.exists(path):
-            os.unlink(path)
\ No newline at end of file
+            os.unlink(path)
+
+    # The processor keeps the raw model output next to the MIDI for re-thresholding
+    if job.midi_relative_path:
+        path = os.path.join(base_dir, os.path.dirname(job.midi_relative_path), 'model_output.npz')
+        if os.path.exists(path):
+            os.unlink(path)
+    # ...and the piano-roll tiles it builds for the visualizer
+    if job.midi_relative_path:
+        path = os.path.splitext(os.path.join(base_dir, job.midi_relative_path))[0] + '_pianoroll'
+        if os.path.isdir(path):
+            shutil.rmtree(path)
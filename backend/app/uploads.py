@@ -0,0 +1,227 @@
+# backend/app/uploads.py
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+from stringscribe_common.metrics import track_stage
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Raised for upload requests that can't be applied; carries the HTTP status to answer with."""
+
+    def __init__(self, message, status_code=400, offset=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+
+class UploadStore:
+    """
+    Resumable uploads of large audio files, in fixed-offset chunks.
+
+    Each upload is a single '<id>.part' file in UPLOADS_DIR that chunks are
+    appended to in place, plus a '<id>.json' sidecar with its owner, name,
+    declared size and current offset. A chunk must start at the current offset,
+    so a client whose connection dropped asks for the offset and continues from
+    there. The SHA-256 used as the job's source hash is updated as chunks arrive,
+    so the finished file never has to be read again or copied into a new one.
+
+    Hash state lives in memory; after a restart it is rebuilt from the bytes
+    already on disk the first time the upload is touched.
+    """
+
+    def __init__(self, app=None):
+        self._hashes = {}
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('UPLOADS_DIR', os.path.join(app.root_path, '..', 'uploads'))
+        app.config.setdefault('UPLOAD_MAX_SIZE', 4 * 1024 ** 3)
+        app.config.setdefault('UPLOAD_TTL', 24 * 3600)
+        os.makedirs(app.config['UPLOADS_DIR'], exist_ok=True)
+        app.extensions['upload_store'] = self
+
+    def _paths(self, upload_id):
+        base = os.path.join(current_app.config['UPLOADS_DIR'], upload_id)
+        return base + '.part', base + '.json'
+
+    def _lock(self, upload_id):
+        with self._locks_lock:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def _save_meta(self, meta):
+        _, meta_path = self._paths(meta['upload_id'])
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def get(self, upload_id, user_id):
+        """
+        Returns an upload's metadata.
+
+        Raises:
+            UploadError: 404 if it doesn't exist or belongs to another user.
+        """
+        try:
+            uuid.UUID(hex=upload_id)
+            with open(self._paths(upload_id)[1]) as f:
+                meta = json.load(f)
+        except (ValueError, OSError):
+            raise UploadError("Upload not found", 404)
+        if meta['user_id'] != user_id:
+            raise UploadError("Upload not found", 404)
+        return meta
+
+    def create(self, user_id, filename, size):
+        """Starts a new upload of `size` bytes and returns its metadata."""
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError("size must be a positive number of bytes")
+        if size > current_app.config['UPLOAD_MAX_SIZE']:
+            raise UploadError("File is too large", 413)
+        self._remove_stale()
+
+        upload_id = uuid.uuid4().hex
+        part_path, _ = self._paths(upload_id)
+        open(part_path, 'wb').close()
+        meta = {
+            "upload_id": upload_id,
+            "user_id": user_id,
+            "filename": os.path.basename(filename or "audio"),
+            "size": size,
+            "offset": 0,
+            "sha256": None,
+            "updated_at": time.time(),
+        }
+        self._hashes[upload_id] = hashlib.sha256()
+        self._save_meta(meta)
+        return meta
+
+    def append(self, upload_id, user_id, offset, stream):
+        """
+        Writes the next chunk of an upload, read from `stream` without buffering it whole.
+
+        Args:
+            offset (int): Where the client says the chunk starts; must match the upload's offset.
+            stream: File-like request body.
+
+        Returns:
+            dict: The updated metadata. 'sha256' is set once the last byte has arrived.
+        """
+        with self._lock(upload_id):
+            meta = self.get(upload_id, user_id)
+            if meta['sha256'] is not None:
+                raise UploadError("Upload is already complete", 409, meta['offset'])
+            if offset != meta['offset']:
+                raise UploadError("Chunk does not start at the current offset", 409, meta['offset'])
+
+            part_path, _ = self._paths(upload_id)
+            sha256 = self._hash_state(upload_id, part_path, meta['offset'])
+            remaining = meta['size'] - meta['offset']
+            try:
+                with track_stage("upload_chunk"), open(part_path, 'r+b') as f:
+                    f.seek(meta['offset'])
+                    # Drop anything past the offset left by a write that died mid-chunk
+                    f.truncate()
+                    while chunk := stream.read(READ_CHUNK_SIZE):
+                        if len(chunk) > remaining:
+                            raise UploadError("Chunk runs past the declared upload size", 413, meta['offset'])
+                        f.write(chunk)
+                        sha256.update(chunk)
+                        meta['offset'] += len(chunk)
+                        remaining -= len(chunk)
+            finally:
+                # Whatever arrived before a dropped connection is kept, so the client resumes after it
+                if remaining == 0:
+                    meta['sha256'] = sha256.hexdigest()
+                    self._hashes.pop(upload_id, None)
+                meta['updated_at'] = time.time()
+                self._save_meta(meta)
+            return meta
+
+    def _hash_state(self, upload_id, part_path, offset):
+        """The running SHA-256 of the first `offset` bytes, rebuilt from disk if it was lost."""
+        sha256 = self._hashes.get(upload_id)
+        if sha256 is None:
+            sha256 = hashlib.sha256()
+            with open(part_path, 'rb') as f:
+                left = offset
+                while left and (chunk := f.read(min(READ_CHUNK_SIZE, left))):
+                    sha256.update(chunk)
+                    left -= len(chunk)
+            self._hashes[upload_id] = sha256
+        return sha256
+
+    def claim(self, upload_id, user_id):
+        """
+        Hands a finished upload over to a job.
+
+        The file is moved (a rename, not a copy) out of the store and the caller
+        owns it from then on, like the temp file get_source_hash creates.
+
+        Returns:
+            (str, str, str): The source hash, the original filename and the file path.
+        """
+        with self._lock(upload_id):
+            meta = self.get(upload_id, user_id)
+            if meta['sha256'] is None:
+                raise UploadError("Upload is not complete", 409, meta['offset'])
+            part_path, meta_path = self._paths(upload_id)
+            # Give the file its original extension so the processor can tell the format
+            claimed_path = f"{part_path[:-len('.part')]}{os.path.splitext(meta['filename'])[1]}"
+            os.replace(part_path, claimed_path)
+            os.unlink(meta_path)
+        with self._locks_lock:
+            self._locks.pop(upload_id, None)
+        return meta['sha256'], meta['filename'], claimed_path
+
+    def delete(self, upload_id, user_id):
+        """Abandons an upload and frees its disk space."""
+        with self._lock(upload_id):
+            self.get(upload_id, user_id)
+            self._remove(upload_id)
+
+    def _remove(self, upload_id):
+        for path in self._paths(upload_id):
+            if os.path.exists(path):
+                os.unlink(path)
+        self._hashes.pop(upload_id, None)
+        with self._locks_lock:
+            self._locks.pop(upload_id, None)
+
+    def _remove_stale(self):
+        """
+        Drops uploads nobody has touched for UPLOAD_TTL seconds.
+
+        Each upload is checked under its own lock, so one being appended to or
+        claimed right now is skipped instead of deleted under the writer.
+        """
+        cutoff = time.time() - current_app.config['UPLOAD_TTL']
+        uploads_dir = current_app.config['UPLOADS_DIR']
+        for name in os.listdir(uploads_dir):
+            if not name.endswith('.json'):
+                continue
+            upload_id = name[:-len('.json')]
+            lock = self._lock(upload_id)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                # Read under the lock, so a chunk that just landed counts
+                with open(os.path.join(uploads_dir, name)) as f:
+                    stale = json.load(f)['updated_at'] < cutoff
+                if stale:
+                    self._remove(upload_id)
+            except (OSError, ValueError, KeyError):
+                continue
+            finally:
+                lock.release()
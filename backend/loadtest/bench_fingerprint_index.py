@@ -0,0 +1,138 @@
+"""
+Benchmarks the fingerprint index: bulk insert speed and near-duplicate lookup
+latency and accuracy with tens of thousands of jobs in the database.
+
+Fingerprints are synthetic but shaped like real ones: hashes pack two peak
+frequencies (skewed towards low bins, as in music) and a time delta. Half the
+queries are degraded copies of a stored job (a random ~45% of its hashes, shifted
+in time, mixed with as many unrelated hashes); the other half match nothing.
+
+Run from the backend directory:
+    python -m loadtest.bench_fingerprint_index --jobs 20000 --hashes-per-job 600
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from app import create_app, db
+from app.config import Config
+from app.fingerprints import find_matching_job
+from app.models import AudioFingerprint, AudioProcessingJob, User
+from loadtest.run_loadtest import percentile
+
+INSERT_BATCH_JOBS = 500
+
+
+def synthetic_fingerprint(rng, n_hashes, n_frames=4000):
+    f1 = np.minimum(512, rng.gamma(2.0, 60.0, n_hashes).astype(np.int64))
+    f2 = np.minimum(512, rng.gamma(2.0, 60.0, n_hashes).astype(np.int64))
+    dt = rng.integers(1, 64, n_hashes)
+    hashes = (f1 << 16) | (f2 << 6) | dt
+    offsets = np.sort(rng.integers(0, n_frames, n_hashes))
+    return hashes, offsets
+
+
+def degraded_copy(rng, hashes, offsets, keep=0.45):
+    kept = rng.random(len(hashes)) < keep
+    shift = int(rng.integers(-50, 50))
+    noise_hashes, noise_offsets = synthetic_fingerprint(rng, int(kept.sum()))
+    return (np.concatenate([hashes[kept], noise_hashes]),
+            np.concatenate([np.maximum(0, offsets[kept] + shift), noise_offsets]))
+
+
+def run(n_jobs, hashes_per_job, n_queries, seed, database_dir):
+    rng = np.random.default_rng(seed)
+
+    class BenchConfig(Config):
+        SECRET_KEY = "bench"
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(database_dir, "fingerprints.db")
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username="bench", email="bench@local", password_hash="-"))
+        db.session.commit()
+
+        # Keep every stored fingerprint's seed so queries can be rebuilt without holding them all
+        job_seeds = rng.integers(0, 2 ** 31, n_jobs)
+        created_at = datetime.utcnow()
+        start = time.perf_counter()
+        for batch_start in range(0, n_jobs, INSERT_BATCH_JOBS):
+            batch = range(batch_start, min(n_jobs, batch_start + INSERT_BATCH_JOBS))
+            db.session.execute(AudioProcessingJob.__table__.insert(), [
+                {"id": i + 1, "user_id": 1, "title": f"job {i}", "source_hash": f"bench{i}",
+                 "created_at": created_at} for i in batch])
+            rows = []
+            for i in batch:
+                hashes, offsets = synthetic_fingerprint(np.random.default_rng(job_seeds[i]), hashes_per_job)
+                rows.extend({"job_id": i + 1, "hash": int(h), "offset": int(o)} for h, o in zip(hashes, offsets))
+            db.session.execute(AudioFingerprint.__table__.insert(), rows)
+            db.session.commit()
+        insert_s = time.perf_counter() - start
+        n_rows = n_jobs * hashes_per_job
+        print(f"Inserted {n_jobs} jobs / {n_rows} fingerprint rows in {insert_s:.1f}s "
+              f"({n_rows / insert_s:,.0f} rows/s)")
+
+        latencies, correct = [], 0
+        for q in range(n_queries):
+            if q % 2 == 0:
+                target = int(rng.integers(0, n_jobs))
+                hashes, offsets = degraded_copy(rng, *synthetic_fingerprint(
+                    np.random.default_rng(job_seeds[target]), hashes_per_job))
+                expected = target + 1
+            else:
+                hashes, offsets = synthetic_fingerprint(rng, hashes_per_job)
+                expected = None
+            start = time.perf_counter()
+            match = find_matching_job(hashes.tolist(), offsets.tolist())
+            latencies.append(time.perf_counter() - start)
+            correct += (match[0] if match else None) == expected
+
+    db_size = os.path.getsize(os.path.join(database_dir, "fingerprints.db"))
+    latencies.sort()
+    result = {
+        "jobs": n_jobs,
+        "hashes_per_job": hashes_per_job,
+        "rows": n_rows,
+        "insert_s": insert_s,
+        "database_bytes": db_size,
+        "queries": n_queries,
+        "accuracy": correct / n_queries,
+        "lookup_p50_ms": percentile(latencies, 50) * 1000,
+        "lookup_p95_ms": percentile(latencies, 95) * 1000,
+        "lookup_mean_ms": statistics.fmean(latencies) * 1000,
+    }
+    print(f"{n_queries} lookups: p50={result['lookup_p50_ms']:.1f} ms p95={result['lookup_p95_ms']:.1f} ms "
+          f"accuracy={result['accuracy']:.1%} database={db_size / 1024 ** 2:.0f} MiB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=20000)
+    parser.add_argument("--hashes-per-job", type=int, default=600)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    database_dir = tempfile.mkdtemp(prefix="stringscribe_fpbench_")
+    try:
+        result = run(args.jobs, args.hashes_per_job, args.queries, args.seed, database_dir)
+    finally:
+        shutil.rmtree(database_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "result": result}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+End-to-end load test of the backend against a stub processor, fully offline.
+
+Starts the real backend (create_app) on a temporary SQLite database and a stub
+processor with configurable artificial latency, then has N virtual users
+register, log in and loop over a weighted mix of /process, /generate_tabs,
+/get_midi_notes, /my-jobs and /login. Reports throughput and p50/p95/p99
+latency per route.
+
+Run from the backend directory:
+    python -m loadtest.run_loadtest --users 20 --duration 30 --processor-latency 0.5
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+from werkzeug.serving import make_server
+
+from app import create_app, db
+from app.config import Config
+from loadtest.stub_processor import create_stub_processor
+
+# Relative weight of each action in a virtual user's loop
+DEFAULT_MIX = {
+    "process": 1,
+    "generate_tabs": 3,
+    "get_midi_notes": 3,
+    "my_jobs": 3,
+    "login": 1,
+}
+
+
+def _serve(app):
+    """Runs a WSGI app on a free local port in a background thread; returns (server, base_url)."""
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class Recorder:
+    """Collects per-route latencies and errors from all virtual users."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route, seconds, ok):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+
+    def timed(self, route, fn):
+        start = time.perf_counter()
+        try:
+            resp = fn()
+            ok = resp.status_code < 400
+        except requests.RequestException:
+            resp, ok = None, False
+        self.record(route, time.perf_counter() - start, ok)
+        return resp
+
+    def summary(self, elapsed):
+        rows = []
+        for route in sorted(self.latencies):
+            values = sorted(self.latencies[route])
+            rows.append({
+                "route": route,
+                "requests": len(values),
+                "errors": self.errors[route],
+                "throughput_rps": len(values) / elapsed,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+            })
+        return rows
+
+
+def virtual_user(user_index, base_url, recorder, mix, deadline):
+    session = requests.Session()
+    email, password = f"user{user_index}@loadtest.local", "loadtest-password"
+    recorder.timed("POST /api/register", lambda: session.post(
+        f"{base_url}/api/register", json={"username": f"user{user_index}", "email": email, "password": password}))
+    recorder.timed("POST /api/login", lambda: session.post(
+        f"{base_url}/api/login", json={"email": email, "password": password}))
+
+    actions, weights = zip(*mix.items())
+    # (job id, MIDI filename) of the jobs this user has created
+    jobs, n = [], 0
+    while time.monotonic() < deadline:
+        action = random.choices(actions, weights)[0]
+        if action in ("generate_tabs", "get_midi_notes") and not jobs:
+            action = "process"
+        n += 1
+
+        if action == "process":
+            if n % 2:
+                data, files = {"youtube_url": f"https://www.youtube.com/watch?v=load{user_index}x{n}"}, None
+            else:
+                data, files = {}, {"audio_file": (f"clip{n}.wav", os.urandom(64 * 1024))}
+            resp = recorder.timed("POST /api/process", lambda: session.post(
+                f"{base_url}/api/process", data=data, files=files))
+            if resp is not None and resp.ok:
+                body = resp.json()
+                jobs.append((body["job_id"], body["midi_filename"]))
+        elif action == "generate_tabs":
+            recorder.timed("POST /api/generate_tabs", lambda: session.post(
+                f"{base_url}/api/generate_tabs", json={"job_id": random.choice(jobs)[0], "algorithm": "efficient"}))
+        elif action == "get_midi_notes":
+            recorder.timed("POST /api/get_midi_notes", lambda: session.post(
+                f"{base_url}/api/get_midi_notes", json={"midi_filename": random.choice(jobs)[1]}))
+        elif action == "my_jobs":
+            recorder.timed("GET /api/my-jobs", lambda: session.get(f"{base_url}/api/my-jobs"))
+        elif action == "login":
+            recorder.timed("POST /api/login", lambda: session.post(
+                f"{base_url}/api/login", json={"email": email, "password": password}))
+
+
+def run(users, duration, processor_latency, processor_jitter, bcrypt_rounds, ramp_up):
+    workdir = tempfile.mkdtemp(prefix="stringscribe_loadtest_")
+    processed_dir = os.path.join(workdir, "processed_files")
+    os.makedirs(processed_dir)
+    servers = []
+
+    try:
+        processor, processor_url = _serve(create_stub_processor(processed_dir, processor_latency, processor_jitter))
+        servers.append(processor)
+
+        class LoadTestConfig(Config):
+            SECRET_KEY = "loadtest"
+            SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(workdir, "loadtest.db")
+            BCRYPT_LOG_ROUNDS = bcrypt_rounds
+            PROCESSOR_URL_AUDIO = f"{processor_url}/process_audio"
+            PROCESSOR_URL_TABS = f"{processor_url}/generate_tabs"
+            PROCESSOR_URL_NOTES = f"{processor_url}/get_midi_notes"
+            PROCESSED_FILES_DIR = processed_dir
+
+        app = create_app(LoadTestConfig)
+        # The harness talks plain HTTP, so the session cookie can't be Secure-only
+        app.config["SESSION_COOKIE_SECURE"] = False
+        with app.app_context():
+            db.create_all()
+        backend, backend_url = _serve(app)
+        servers.append(backend)
+
+        recorder = Recorder()
+        start = time.monotonic()
+        deadline = start + duration
+        threads = []
+        for i in range(users):
+            t = threading.Thread(target=virtual_user, args=(i, backend_url, recorder, DEFAULT_MIX, deadline), daemon=True)
+            t.start()
+            threads.append(t)
+            time.sleep(ramp_up / max(1, users))
+        for t in threads:
+            t.join()
+        return recorder.summary(time.monotonic() - start)
+
+    finally:
+        for server in servers:
+            server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Test length in seconds")
+    parser.add_argument("--ramp-up", type=float, default=2, help="Seconds over which users are started")
+    parser.add_argument("--processor-latency", type=float, default=0.5, help="Stub /process_audio latency (s)")
+    parser.add_argument("--processor-jitter", type=float, default=0.2)
+    parser.add_argument("--bcrypt-rounds", type=int, default=Config.BCRYPT_LOG_ROUNDS)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    rows = run(args.users, args.duration, args.processor_latency, args.processor_jitter,
+               args.bcrypt_rounds, args.ramp_up)
+
+    print(f"\n{args.users} users, {args.duration:.0f}s, processor latency {args.processor_latency}s")
+    print(f"{'route':28} {'reqs':>7} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for row in rows:
+        print(f"{row['route']:28} {row['requests']:>7} {row['errors']:>7} {row['throughput_rps']:>8.1f} "
+              f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
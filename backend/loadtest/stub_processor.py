@@ -0,0 +1,55 @@
+# backend/loadtest/stub_processor.py
+import os
+import random
+import time
+
+from flask import Flask, request, jsonify
+
+# A tiny but valid single-note MIDI file, so files served by the backend are real MIDI
+STUB_MIDI = bytes.fromhex(
+    "4d546864000000060000000101e0"
+    "4d54726b0000000d00903c408360803c4000ff2f00"
+)
+STUB_TAB = "e|-----\nB|-----\nG|-----\nD|-----\nA|-3---\nE|-----"
+STUB_NOTES = {"notes": [{"pitch": 60, "start": 0.0, "end": 0.5}], "end_time": 0.5}
+
+
+def create_stub_processor(output_dir, latency=0.5, jitter=0.2, tab_latency=0.02):
+    """
+    Builds a stand-in for the audio-tab-processor that needs no model or network.
+
+    /process_audio sleeps for about `latency` seconds (± jitter) to imitate a
+    transcription, writes a placeholder MIDI into output_dir and returns the
+    same payload as the real processor. The tab and note endpoints answer after
+    `tab_latency` seconds.
+    """
+    app = Flask(__name__)
+
+    @app.route("/process_audio", methods=["POST"])
+    def process_audio():
+        if "audio_file" in request.files:
+            request.files["audio_file"].read()
+        time.sleep(max(0.0, random.uniform(latency - jitter, latency + jitter)))
+
+        job_id = f"job_{time.time_ns()}"
+        os.makedirs(os.path.join(output_dir, job_id), exist_ok=True)
+        midi_relative_path = os.path.join(job_id, "audio_basic_pitch.mid")
+        with open(os.path.join(output_dir, midi_relative_path), "wb") as f:
+            f.write(STUB_MIDI)
+        return jsonify({
+            "midi_relative_path": midi_relative_path,
+            "wav_relative_path": None,
+            "midi_filename": midi_relative_path,
+        })
+
+    @app.route("/generate_tabs", methods=["POST"])
+    def generate_tabs():
+        time.sleep(tab_latency)
+        return jsonify({"tab_text": STUB_TAB})
+
+    @app.route("/get_midi_notes", methods=["POST"])
+    def get_midi_notes():
+        time.sleep(tab_latency)
+        return jsonify(STUB_NOTES)
+
+    return app
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the backend's modules the way run.py does, from the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.models import User  # noqa: E402
+
+PASSWORD = "correct horse"
+
+
+@pytest.fixture
+def app(tmp_path):
+    """A backend app with its own SQLite database and data directories under tmp_path."""
+
+    class TestConfig(Config):
+        TESTING = True
+        SECRET_KEY = "test"
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + str(tmp_path / "test.db")
+        # The lowest bcrypt work factor, so hashing doesn't slow the tests down
+        BCRYPT_LOG_ROUNDS = 4
+        UPLOADS_DIR = str(tmp_path / "uploads")
+        PROCESSED_FILES_DIR = str(tmp_path / "processed")
+        PROFILES_DIR = str(tmp_path / "profiles")
+        TAB_ENGINE = "http"
+
+    os.makedirs(TestConfig.PROCESSED_FILES_DIR)
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def user(app):
+    with app.app_context():
+        user = User(username="ada", email="ada@example.com")
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def client(app, user):
+    """A test client logged in as the user fixture."""
+    client = app.test_client()
+    assert client.post("/api/login", json={"email": "ada@example.com", "password": PASSWORD}).status_code == 200
+    return client
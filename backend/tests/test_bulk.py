@@ -0,0 +1,142 @@
+import io
+import os
+import time
+import uuid
+import wave
+import zipfile
+
+import pytest
+
+from app import db, fingerprints, services
+from app.models import AudioFingerprint, AudioProcessingJob
+from app.services import save_job_result
+
+FINGERPRINT = {"hashes": [1, 2, 3], "offsets": [0, 1, 2]}
+
+
+@pytest.fixture
+def processor(app, monkeypatch):
+    """
+    Stands in for the processor: every forwarded item gets a job directory with a MIDI file.
+
+    Returns the forwarded (data, temp file path) pairs. Items whose URL or file name
+    contains 'broken' fail as if the processor had errored.
+    """
+    forwarded = []
+
+    def stub_forward_to_processor(data, temp_file_path, user_id=None, cleanup=True):
+        forwarded.append((dict(data), temp_file_path))
+        assert temp_file_path is None or os.path.exists(temp_file_path)
+        if "broken" in (data.get("youtube_url") or temp_file_path or ""):
+            return None, "Processing service failed or timed out"
+        job_id = "job_" + uuid.uuid4().hex[:6]
+        os.makedirs(os.path.join(app.config["PROCESSED_FILES_DIR"], job_id))
+        midi_path = os.path.join(job_id, "song_basic_pitch.mid")
+        open(os.path.join(app.config["PROCESSED_FILES_DIR"], midi_path), "wb").close()
+        result = {"midi_relative_path": midi_path, "wav_relative_path": None, "midi_filename": midi_path}
+        if data.get("fingerprint") == "1":
+            result["fingerprint"] = FINGERPRINT
+        return result, None
+
+    monkeypatch.setattr(services, "forward_to_processor", stub_forward_to_processor)
+    monkeypatch.setattr(fingerprints, "fingerprint_upload", lambda path: (FINGERPRINT["hashes"], FINGERPRINT["offsets"]))
+    return forwarded
+
+
+def wait_for(client, bulk):
+    """Polls the import until it is done and returns its final status."""
+    assert bulk.status_code == 202
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        status = client.get(f"/api/process/bulk/{bulk.get_json()['bulk_id']}").get_json()
+        if status["done"]:
+            return status
+        time.sleep(0.02)
+    raise AssertionError("bulk import did not finish")
+
+
+def statuses(status):
+    return {item["source_info"]: item["status"] for item in status["items"]}
+
+
+def job_dirs(app):
+    return sorted(os.listdir(app.config["PROCESSED_FILES_DIR"]))
+
+
+def test_urls_are_imported_once_each(app, client, user, processor):
+    with app.app_context():
+        save_job_result(user, "https://youtu.be/known", "youtube: https://youtu.be/known", {})
+    urls = ["https://youtu.be/a", "https://youtu.be/b", "https://youtu.be/a", "https://youtu.be/known"]
+
+    status = wait_for(client, client.post("/api/process/bulk", json={"urls": urls, "onset_threshold": "0.6"}))
+
+    assert status["counts"] == {"done": 2, "duplicate": 2}
+    assert sorted(data["youtube_url"] for data, _ in processor) == ["https://youtu.be/a", "https://youtu.be/b"]
+    assert all(data["onset_threshold"] == "0.6" for data, _ in processor)
+    with app.app_context():
+        assert AudioProcessingJob.query.filter_by(user_id=user).count() == 3
+        # The processor fingerprinted each downloaded URL
+        assert AudioFingerprint.query.count() == 2 * len(FINGERPRINT["hashes"])
+
+
+def make_archive(names):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for i, name in enumerate(names):
+            clip = io.BytesIO()
+            with wave.open(clip, "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(8000)
+                wav.writeframes(bytes([i]) * 1600)
+            zf.writestr(name, clip.getvalue())
+    archive.seek(0)
+    return archive
+
+
+def test_an_archive_is_imported_and_its_temp_files_removed(app, client, processor):
+    archive = make_archive(["one.wav", "sub/two.wav", "notes.txt"])
+
+    status = wait_for(client, client.post("/api/process/bulk", data={"archive": (archive, "songs.zip")},
+                                          content_type="multipart/form-data"))
+
+    assert statuses(status) == {"file: one.wav": "done", "file: two.wav": "done"}
+    assert not any(os.path.exists(path) for _, path in processor)
+
+
+def test_a_failed_item_does_not_stop_the_others(app, client, processor):
+    urls = ["https://youtu.be/a", "https://youtu.be/broken", "https://youtu.be/b"]
+
+    status = wait_for(client, client.post("/api/process/bulk", json={"urls": urls}))
+
+    assert statuses(status) == {"youtube: https://youtu.be/a": "done", "youtube: https://youtu.be/broken": "failed",
+                                "youtube: https://youtu.be/b": "done"}
+
+
+def test_a_job_that_cannot_be_saved_fails_alone_and_its_outputs_are_removed(app, client, user, processor):
+    with app.app_context():
+        # Make the database refuse one of the rows, so the batch commit fails
+        db.session.execute(db.text(
+            "CREATE TRIGGER refuse_b BEFORE INSERT ON audio_processing_job "
+            "WHEN NEW.source_hash = 'https://youtu.be/b' BEGIN SELECT RAISE(ABORT, 'refused'); END"))
+        db.session.commit()
+    urls = ["https://youtu.be/a", "https://youtu.be/b", "https://youtu.be/c"]
+
+    status = wait_for(client, client.post("/api/process/bulk", json={"urls": urls}))
+
+    assert statuses(status)["youtube: https://youtu.be/b"] == "failed"
+    assert status["counts"] == {"done": 2, "failed": 1}
+    with app.app_context():
+        saved = [job.midi_relative_path for job in AudioProcessingJob.query.filter_by(user_id=user)]
+    assert job_dirs(app) == sorted(os.path.dirname(path) for path in saved)
+
+
+def test_bad_requests_are_rejected(app, client, processor):
+    app.config["BULK_MAX_ITEMS"] = 2
+
+    assert client.post("/api/process/bulk", json={}).status_code == 400
+    assert client.post("/api/process/bulk", json={"urls": ["a", "b", "c"]}).status_code == 400
+    resp = client.post("/api/process/bulk", data={"archive": (io.BytesIO(b"not a zip"), "songs.zip")},
+                       content_type="multipart/form-data")
+    assert resp.status_code == 400
+    assert processor == []
@@ -0,0 +1,95 @@
+import io
+import os
+import random
+
+import pytest
+import requests
+
+from app import db, fingerprints, routes
+from app.fingerprints import find_matching_job, store_fingerprint
+from app.models import AudioFingerprint, AudioProcessingJob
+from app.services import save_job_result
+
+N_HASHES = 200
+
+
+def make_fingerprint(seed):
+    """Random landmark hashes, a few per frame, like the processor's."""
+    rng = random.Random(seed)
+    return [rng.getrandbits(31) for _ in range(N_HASHES)], [i // 3 for i in range(N_HASHES)]
+
+
+def as_heard_again(fingerprint, shift, seed=0):
+    """The fingerprint of another encoding: shifted in time, a frame of jitter here and there, some hashes lost."""
+    rng = random.Random(seed)
+    hashes, offsets = [], []
+    for h, offset in zip(*fingerprint):
+        if rng.random() < 0.3:
+            h = rng.getrandbits(31)
+        hashes.append(h)
+        offsets.append(offset - shift + rng.choice((-1, 0, 0, 0, 1)))
+    return hashes, offsets
+
+
+@pytest.fixture
+def song_job(app, user):
+    """A finished job of the user's with its outputs on disk and its fingerprint stored."""
+    job_dir = os.path.join(app.config["PROCESSED_FILES_DIR"], "job_1")
+    os.makedirs(job_dir)
+    open(os.path.join(job_dir, "song_basic_pitch.mid"), "wb").close()
+    midi_path = "job_1/song_basic_pitch.mid"
+    with app.app_context():
+        job = save_job_result(user, "sha-of-song-flac", "file: song.flac",
+                              {"midi_relative_path": midi_path, "midi_filename": midi_path})
+        store_fingerprint(job.id, *make_fingerprint(seed=1))
+        return job.id
+
+
+def test_a_shifted_copy_matches(app, user, song_job):
+    with app.app_context():
+        store_fingerprint(save_job_result(user, "sha-of-other-mp3", "file: other.mp3", {}).id, *make_fingerprint(seed=2))
+
+        job_id, confidence = find_matching_job(*as_heard_again(make_fingerprint(seed=1), shift=40))
+
+    assert job_id == song_job
+    assert confidence > 0.5
+
+
+def test_hashes_that_do_not_line_up_do_not_match(app, song_job):
+    hashes, offsets = make_fingerprint(seed=1)
+    scattered = random.Random(0).sample(offsets, len(offsets))
+
+    with app.app_context():
+        assert find_matching_job(hashes, [o * 7 for o in scattered]) is None
+        # Too few hashes to be convincing, even if they all line up
+        assert find_matching_job(hashes[:10], offsets[:10]) is None
+        assert find_matching_job([], []) is None
+
+
+def test_an_upload_of_the_same_recording_reuses_the_job(app, client, user, song_job, monkeypatch):
+    def no_processor(*args, **kwargs):
+        raise requests.exceptions.ConnectionError("processor is down")
+
+    monkeypatch.setattr(routes, "fingerprint_upload", lambda path: as_heard_again(make_fingerprint(seed=1), shift=40))
+    monkeypatch.setattr(routes, "forward_to_processor", lambda *args, **kwargs: pytest.fail("transcribed again"))
+    monkeypatch.setattr(fingerprints.requests, "post", no_processor)
+
+    resp = client.post("/api/process", data={"audio_file": (io.BytesIO(b"the same song as mp3"), "song.mp3")},
+                       content_type="multipart/form-data")
+
+    assert resp.status_code == 200
+    job = resp.get_json()
+    assert job["job_id"] != song_job
+    # The reused job has its own copy of the outputs
+    assert not job["midi_filename"].startswith("job_1/")
+    assert os.path.exists(os.path.join(app.config["PROCESSED_FILES_DIR"], job["midi_filename"]))
+    with app.app_context():
+        assert AudioFingerprint.query.filter_by(job_id=job["job_id"]).count() == N_HASHES
+
+
+def test_deleting_a_job_deletes_its_fingerprint(app, client, song_job):
+    assert client.delete(f"/api/jobs/{song_job}").status_code == 200
+
+    with app.app_context():
+        assert db.session.get(AudioProcessingJob, song_job) is None
+        assert AudioFingerprint.query.count() == 0
@@ -0,0 +1,65 @@
+import threading
+
+from app import bcrypt, db, password_hasher
+from app.models import User
+from app.passwords import get_hash_rounds
+from conftest import PASSWORD
+
+
+def login(client, password=PASSWORD):
+    return client.post("/api/login", json={"email": "ada@example.com", "password": password})
+
+
+def stored_rounds(app, user):
+    with app.app_context():
+        return get_hash_rounds(db.session.get(User, user).password_hash)
+
+
+def test_login_rehashes_a_password_made_with_an_old_work_factor(app, user):
+    app.config["BCRYPT_LOG_ROUNDS"] = 5
+    client = app.test_client()
+
+    assert login(client, "wrong password").status_code == 401
+    assert stored_rounds(app, user) == 4
+
+    assert login(client).status_code == 200
+    assert stored_rounds(app, user) == 5
+    # The new hash still checks out
+    assert login(app.test_client()).status_code == 200
+
+
+def test_login_answers_503_when_the_hash_pool_is_full(app, user, monkeypatch):
+    app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_PENDING=0)
+    password_hasher.init_app(app)
+    started, release = threading.Event(), threading.Event()
+    check = bcrypt.check_password_hash
+
+    def slow_check(pw_hash, password):
+        started.set()
+        release.wait()
+        return check(pw_hash, password)
+
+    monkeypatch.setattr(bcrypt, "check_password_hash", slow_check)
+    first = threading.Thread(target=login, args=(app.test_client(),))
+    first.start()
+    started.wait()
+
+    resp = login(app.test_client())
+    release.set()
+    first.join()
+
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == str(app.config["PASSWORD_HASH_RETRY_AFTER"])
+
+
+def test_login_answers_503_when_a_hash_takes_too_long(app, user, monkeypatch):
+    app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_TIMEOUT=0.1)
+    password_hasher.init_app(app)
+    release = threading.Event()
+    check = bcrypt.check_password_hash
+    monkeypatch.setattr(bcrypt, "check_password_hash", lambda pw_hash, password: release.wait() and check(pw_hash, password))
+
+    resp = login(app.test_client())
+    release.set()
+
+    assert resp.status_code == 503
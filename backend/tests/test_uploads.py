@@ -0,0 +1,105 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from app import upload_store
+from app.uploads import UploadError
+
+DATA = os.urandom(3 * 1024 * 1024 + 123)
+
+
+def create(client, size=len(DATA)):
+    resp = client.post("/api/uploads", json={"filename": "song.flac", "size": size})
+    assert resp.status_code == 201
+    return resp.get_json()["upload_id"]
+
+
+def patch(client, upload_id, offset, chunk):
+    return client.patch(f"/api/uploads/{upload_id}", data=chunk, headers={"Upload-Offset": str(offset)})
+
+
+def claim(app, upload_id, user):
+    with app.test_request_context():
+        return upload_store.claim(upload_id, user)
+
+
+def test_chunks_are_appended_and_hashed_as_they_arrive(app, client, user):
+    upload_id = create(client)
+    chunk = 1024 * 1024
+
+    for offset in range(0, len(DATA), chunk):
+        resp = patch(client, upload_id, offset, DATA[offset:offset + chunk])
+        assert resp.status_code == 200
+        assert resp.headers["Upload-Offset"] == str(min(offset + chunk, len(DATA)))
+    assert resp.get_json()["complete"]
+
+    sha256, filename, path = claim(app, upload_id, user)
+    assert sha256 == hashlib.sha256(DATA).hexdigest()
+    assert filename == "song.flac"
+    with open(path, "rb") as f:
+        assert f.read() == DATA
+    os.unlink(path)
+
+
+def test_a_chunk_at_the_wrong_offset_is_refused_with_the_offset_to_resume_from(client):
+    upload_id = create(client)
+    assert patch(client, upload_id, 0, DATA[:1000]).status_code == 200
+
+    # A retry of a chunk the server already has
+    resp = patch(client, upload_id, 0, DATA[:1000])
+    assert resp.status_code == 409
+    assert resp.headers["Upload-Offset"] == "1000"
+
+    resp = client.head(f"/api/uploads/{upload_id}")
+    assert resp.headers["Upload-Offset"] == "1000"
+    assert patch(client, upload_id, 1000, DATA[1000:2000]).status_code == 200
+
+
+class DroppedConnection(io.BytesIO):
+    """A request body whose connection drops after the first read."""
+
+    def read(self, size=-1):
+        if self.tell():
+            raise OSError("connection reset")
+        return super().read(size)
+
+
+def test_resuming_after_a_dropped_chunk_and_a_restart_gives_the_right_hash(app, client, user):
+    upload_id = create(client)
+    with app.test_request_context(), pytest.raises(OSError):
+        upload_store.append(upload_id, user, 0, DroppedConnection(DATA))
+    offset = int(client.head(f"/api/uploads/{upload_id}").headers["Upload-Offset"])
+    assert 0 < offset < len(DATA)
+
+    # A restart loses the in-memory hash state, which is rebuilt from the bytes on disk
+    upload_store._hashes.clear()
+    assert patch(client, upload_id, offset, DATA[offset:]).get_json()["complete"]
+
+    sha256, _, path = claim(app, upload_id, user)
+    assert sha256 == hashlib.sha256(DATA).hexdigest()
+    os.unlink(path)
+
+
+def test_uploads_are_checked_against_their_size_and_owner(app, client, user):
+    upload_id = create(client, size=10)
+
+    assert patch(client, upload_id, 0, b"x" * 11).status_code == 413
+    assert client.post("/api/uploads", json={"filename": "song.flac", "size": 0}).status_code == 400
+    with app.test_request_context(), pytest.raises(UploadError) as excinfo:
+        upload_store.get(upload_id, user + 1)
+    assert excinfo.value.status_code == 404
+
+
+def test_stale_uploads_are_removed_unless_in_use(app, client, user):
+    in_use, idle = create(client), create(client)
+    app.config["UPLOAD_TTL"] = -1
+
+    with upload_store._lock(in_use):
+        create(client)
+    assert client.head(f"/api/uploads/{in_use}").status_code == 200
+    assert client.head(f"/api/uploads/{idle}").status_code == 404
+
+    create(client)
+    assert client.head(f"/api/uploads/{in_use}").status_code == 404
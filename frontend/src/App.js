@@ -11,6 +11,60 @@ const midiToNoteName = (midiNumber) => {
     return `${note}${octave}`;
 };
 
+// The notes endpoint sends parallel pitch/start/end arrays; the visualizer wants one object per note
+const decodeNotes = (notesData) => {
+    if (notesData.layout !== "columnar") return notesData;
+    const { pitch, start, end } = notesData.notes;
+    const notes = pitch.map((p, i) => ({ pitch: p, start: start[i], end: end[i] }));
+    return { ...notesData, notes };
+};
+
+// Reads a Server-Sent Events response (fetch, since EventSource can't POST a form),
+// calling onEvent(event, data) with the parsed JSON data of each event as it arrives
+const readEventStream = async (response, onEvent) => {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    for (;;) {
+        const { done, value } = await reader.read();
+        if (done) return;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = "message";
+            const data = [];
+            block.split("\n").forEach(line => {
+                if (line.startsWith("event:")) event = line.slice(6).trim();
+                else if (line.startsWith("data:")) data.push(line.slice(5).trim());
+            });
+            if (data.length) onEvent(event, JSON.parse(data.join("\n")));
+        }
+    }
+};
+
+// What the spinner says for each stage the stream reports
+const STAGE_MESSAGES = {
+    queued: "Waiting for a free slot...",
+    download: "Downloading your audio...",
+    transcribe: "Transcribing your audio...",
+};
+
+// Tunings the processor knows (config.GUITAR_TUNINGS), plus "auto" to let it pick
+const TUNINGS = [
+    ["standard", "Standard (EADGBe)"],
+    ["auto", "Auto"],
+    ["drop_d", "Drop D"],
+    ["half_step_down", "Half step down"],
+    ["full_step_down", "Full step down"],
+    ["drop_c_sharp", "Drop C#"],
+    ["drop_c", "Drop C"],
+    ["open_g", "Open G"],
+    ["open_d", "Open D"],
+    ["dadgad", "DADGAD"],
+];
+
 function App() {
     // --- Theme State ---
     const [theme, setTheme] = useState('light');
@@ -32,6 +86,9 @@ function App() {
     const [wavUrl, setWavUrl] = useState(null);
     const [midiFilename, setMidiFilename] = useState(null);
     const [tabText, setTabText] = useState(null);
+    // Tab of the notes transcribed so far, streamed while the job runs
+    const [previewTabText, setPreviewTabText] = useState(null);
+    const [streamStage, setStreamStage] = useState(null);
     const [error, setError] = useState(null);
     const [midiNotesData, setMidiNotesData] = useState(null);
     const [onsetThreshold, setOnsetThreshold] = useState(0.5);
@@ -42,6 +99,8 @@ function App() {
     const [isTabScrolling, setIsTabScrolling] = useState(false);
     const [scrollSpeed, setScrollSpeed] = useState(15);
     const [tabAlgorithm, setTabAlgorithm] = useState("efficient");
+    const [tabTuning, setTabTuning] = useState("standard");
+    const [tabCapo, setTabCapo] = useState("0");
 
     const [activeJobId, setActiveJobId] = useState(null);
 
@@ -91,12 +150,12 @@ function App() {
         checkLoggedIn();
     }, [fetchHistory]);
 
-    // Re-generates tabs when algorithm is changed
+    // Re-generates tabs when algorithm, tuning or capo is changed
     useEffect(() => {
         if (initialTabGenerationDone.current) {
             handleGenerateTabs();
         }
-    }, [tabAlgorithm]);
+    }, [tabAlgorithm, tabTuning, tabCapo]);
 
     // Other effects (progress bar, tab scrolling)
     useEffect(() => {
@@ -142,6 +201,7 @@ function App() {
     const handleGenerate = async (e) => {
         e.preventDefault();
         setError(null); setTabText(null); setMidiNotesData(null);
+        setPreviewTabText(null); setStreamStage(null);
         initialTabGenerationDone.current = false;
         setStatus("processing"); setProgress(5);
 
@@ -153,15 +213,41 @@ function App() {
             else { throw new Error("Please upload a file or provide a URL."); }
 
             Object.keys(allParams).forEach(key => formData.append(key, allParams[key]));
+            formData.append("preview_tab", tabAlgorithm);
 
-            const response = await fetch(`${BACKEND_URL}/api/process`, {
+            // Notes and a preliminary tab arrive while the audio is transcribed;
+            // the saved job comes last, in the 'job' event
+            const response = await fetch(`${BACKEND_URL}/api/process/stream`, {
                 method: "POST",
                 credentials: 'include',
                 body: formData,
             });
+            if (!response.ok) {
+                const failure = await response.json();
+                throw new Error(failure.error || "Processing failed");
+            }
 
-            const data = await response.json();
-            if (!response.ok) throw new Error(data.error || "Processing failed");
+            let data = null;
+            const streamedNotes = [];
+            let streamedEnd = 0;
+            await readEventStream(response, (event, payload) => {
+                if (event === "status") {
+                    setStreamStage(payload.stage);
+                } else if (event === "notes" && payload.notes.length) {
+                    payload.notes.forEach(note => {
+                        streamedNotes.push(note);
+                        streamedEnd = Math.max(streamedEnd, note.end);
+                    });
+                    setMidiNotesData({ notes: [...streamedNotes], end_time: streamedEnd });
+                } else if (event === "tab") {
+                    setPreviewTabText(payload.tab_text);
+                } else if (event === "error") {
+                    throw new Error(payload.error || "Processing failed");
+                } else if (event === "job") {
+                    data = payload;
+                }
+            });
+            if (!data) throw new Error("Processing ended without a result");
 
             setMidiUrl(data.midi_url || null);
             setWavUrl(data.wav_url || null);
@@ -183,10 +269,10 @@ function App() {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
                     credentials: 'include',
-                    body: JSON.stringify({ midi_filename: data.midi_filename })
+                    body: JSON.stringify({ midi_filename: data.midi_filename, layout: 'columnar' })
                 });
                 const notesData = await notesResponse.json();
-                if (notesResponse.ok) setMidiNotesData(notesData);
+                if (notesResponse.ok) setMidiNotesData(decodeNotes(notesData));
             }
         } catch (err) {
             setError(err.message); setStatus("error");
@@ -207,7 +293,9 @@ function App() {
                 credentials: 'include',
                 body: JSON.stringify({
                     job_id: activeJobId,
-                    algorithm: tabAlgorithm
+                    algorithm: tabAlgorithm,
+                    tuning: tabTuning,
+                    capo: tabCapo === "auto" ? "auto" : parseInt(tabCapo)
                 }),
             });
             const j = await res.json();
@@ -233,8 +321,8 @@ function App() {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 credentials: 'include',
-                body: JSON.stringify({ midi_filename: job.midi_filename })
-            }).then(res => res.json()).then(notes => setMidiNotesData(notes));
+                body: JSON.stringify({ midi_filename: job.midi_filename, layout: 'columnar' })
+            }).then(res => res.json()).then(notes => setMidiNotesData(decodeNotes(notes)));
         }
         window.scrollTo(0, 0);
     };
@@ -280,6 +368,7 @@ function App() {
     const resetAll = () => {
         setFile(null); setYoutubeUrl(""); setMidiUrl(null); setWavUrl(null);
         setMidiFilename(null); setTabText(null); setError(null); setStatus("idle");
+        setPreviewTabText(null); setStreamStage(null);
         setProgress(0); setMidiNotesData(null);
         if (fileInputRef.current) fileInputRef.current.value = "";
         setOnsetThreshold(0.5); setFrameThreshold(0.3); setMinNoteLength(120);
@@ -287,6 +376,7 @@ function App() {
         setIsTabScrolling(false);
         if (tabRef.current) tabRef.current.scrollLeft = 0;
         setTabAlgorithm("efficient");
+        setTabTuning("standard"); setTabCapo("0");
         setActiveJobId(null);
         initialTabGenerationDone.current = false;
     };
@@ -381,14 +471,14 @@ function App() {
                             {(status === "processing" || status === "generating_tabs") && (
                                 <div style={{ textAlign: "center" }}>
                                     <div className="spinner" />
-                                    <p>Processing your audio...</p>
+                                    <p>{(status === "processing" && STAGE_MESSAGES[streamStage]) || "Processing your audio..."}</p>
                                 </div>
                             )}
                             {error && <div className="error-message">Error: {error}</div>}
                         </div>
                     )}
 
-                    {(wavUrl || midiNotesData || tabText) && (
+                    {(wavUrl || midiNotesData || tabText || previewTabText) && (
                         <div className="card">
                             <h2>Results</h2>
                             {wavUrl && (
@@ -400,7 +490,7 @@ function App() {
                             {midiNotesData && (
                                 <>
                                     <h3 style={{marginTop: 24}}>🎵 MIDI Output</h3>
-                                    <MidiVisualizer notesData={midiNotesData} audioRef={audioRef} />
+                                    <MidiVisualizer notesData={midiNotesData} audioRef={audioRef} midiFilename={midiFilename} backendUrl={BACKEND_URL} />
                                 </>
                             )}
 
@@ -410,6 +500,13 @@ function App() {
                                 </div>
                             )}
 
+                            {previewTabText && !tabText && (
+                                <>
+                                    <h3 style={{marginTop: 24}}>🎸 {status === "processing" ? "Preliminary Tab (updating as the audio is transcribed)" : "Preview Tab"}</h3>
+                                    <pre className="tab-content">{previewTabText}</pre>
+                                </>
+                            )}
+
                             {tabText && (
                                 <>
                                     <div className="tab-header">
@@ -419,6 +516,17 @@ function App() {
                                             <label><input type="radio" value="efficient" checked={tabAlgorithm === "efficient"} onChange={(e) => setTabAlgorithm(e.target.value)} /> Efficient</label>
                                             <label><input type="radio" value="simple" checked={tabAlgorithm === "simple"} onChange={(e) => setTabAlgorithm(e.target.value)} /> Simple</label>
                                         </div>
+                                        <div className="radio-group">
+                                            <span>Tuning:</span>
+                                            <select value={tabTuning} onChange={(e) => setTabTuning(e.target.value)}>
+                                                {TUNINGS.map(([value, label]) => <option key={value} value={value}>{label}</option>)}
+                                            </select>
+                                            <span>Capo:</span>
+                                            <select value={tabCapo} onChange={(e) => setTabCapo(e.target.value)}>
+                                                <option value="auto">Auto</option>
+                                                {[...Array(10).keys()].map(fret => <option key={fret} value={String(fret)}>{fret === 0 ? "None" : fret}</option>)}
+                                            </select>
+                                        </div>
                                     </div>
                                     <div className="tab-controls">
                                         <button className="btn btn-small" onClick={() => setIsTabScrolling(!isTabScrolling)}>{isTabScrolling ? 'Stop' : 'Start'} Scroll</button>
@@ -1,6 +1,37 @@
 import React, { useRef, useEffect } from 'react';
 
-const MidiVisualizer = ({ notesData, audioRef }) => {
+// Above this many notes the roll is drawn from the backend's precomputed piano-roll
+// tiles, rendered once, instead of note by note on every animation frame
+const TILE_NOTE_THRESHOLD = 2000;
+const MAX_TILES_PER_REQUEST = 32;
+
+// Fetches the tiles of the coarsest pyramid level that still has a column per pixel
+const fetchPianoroll = async (backendUrl, midiFilename, width) => {
+    const post = (body) => fetch(`${backendUrl}/api/get_pianoroll`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        credentials: 'include',
+        body: JSON.stringify({ midi_filename: midiFilename, ...body })
+    }).then(res => {
+        if (!res.ok) throw new Error("Piano roll unavailable");
+        return res.json();
+    });
+
+    const pyramid = await post({});
+    const level = [...pyramid.levels].reverse().find(l => l.columns >= width) || pyramid.levels[0];
+    const tiles = [];
+    for (let start = 0; start < level.tiles; start += MAX_TILES_PER_REQUEST) {
+        const page = await post({
+            level: level.level,
+            start_tile: start,
+            end_tile: Math.min(level.tiles, start + MAX_TILES_PER_REQUEST)
+        });
+        tiles.push(...page.tiles);
+    }
+    return { ...pyramid, level, tiles };
+};
+
+const MidiVisualizer = ({ notesData, audioRef, midiFilename, backendUrl }) => {
     const canvasRef = useRef(null);
     const animationFrameId = useRef(null);
 
@@ -42,10 +73,38 @@ const MidiVisualizer = ({ notesData, audioRef }) => {
         canvas.width = width;
         canvas.height = height;
 
+        // For long songs, render the tiles into an offscreen canvas once they arrive
+        let roll = null;
+        let cancelled = false;
+        if (midiFilename && backendUrl && notes.length > TILE_NOTE_THRESHOLD) {
+            fetchPianoroll(backendUrl, midiFilename, width).then(pianoroll => {
+                if (cancelled) return;
+                const offscreen = document.createElement('canvas');
+                offscreen.width = width;
+                offscreen.height = height;
+                const ctx = offscreen.getContext('2d');
+                const secondsPerColumn = pianoroll.level.seconds_per_column;
+                const w = Math.max(1, (secondsPerColumn / end_time) * width);
+                pianoroll.tiles.forEach(tile => {
+                    tile.occupancy.forEach((row, r) => {
+                        const y = (maxPitch - (pianoroll.pitch_min + r)) * (noteHeight + noteSpacing);
+                        row.forEach((value, c) => {
+                            if (value === 0) return;
+                            const x = ((tile.start_time + c * secondsPerColumn) / end_time) * width;
+                            ctx.fillStyle = `hsla(210, 70%, 60%, ${value / 255})`;
+                            ctx.fillRect(x, y, w, noteHeight);
+                        });
+                    });
+                });
+                roll = offscreen;
+            }).catch(() => {
+                // Keep drawing the individual notes
+            });
+        }
+
         const draw = () => {
-            // Ensure the audio element is available before trying to get its time
-            if (!audioRef.current) return;
-            const currentTime = audioRef.current.currentTime;
+            // While a transcription is still streaming in there is no audio to follow yet
+            const currentTime = audioRef.current ? audioRef.current.currentTime : 0;
 
             // Draw background
             context.fillStyle = '#282c34'; // Dark background
@@ -64,20 +123,24 @@ const MidiVisualizer = ({ notesData, audioRef }) => {
             }
 
             // Draw the notes
-            notes.forEach(note => {
-                // The 'y' position is now calculated relative to our dynamic pitch range
-                const y = (maxPitch - note.pitch) * (noteHeight + noteSpacing);
-                const x = (note.start / end_time) * width;
-                const w = Math.max(1, ((note.end - note.start) / end_time) * width);
-
-                // Change color and opacity based on playback time
-                const isPlayed = note.start <= currentTime;
-                const opacity = isPlayed ? 1.0 : 0.7;
-                const saturation = isPlayed ? 100 : 70;
-
-                context.fillStyle = `hsla(210, ${saturation}%, 60%, ${opacity})`;
-                context.fillRect(x, y, w, noteHeight);
-            });
+            if (roll) {
+                context.drawImage(roll, 0, 0);
+            } else {
+                notes.forEach(note => {
+                    // The 'y' position is now calculated relative to our dynamic pitch range
+                    const y = (maxPitch - note.pitch) * (noteHeight + noteSpacing);
+                    const x = (note.start / end_time) * width;
+                    const w = Math.max(1, ((note.end - note.start) / end_time) * width);
+
+                    // Change color and opacity based on playback time
+                    const isPlayed = note.start <= currentTime;
+                    const opacity = isPlayed ? 1.0 : 0.7;
+                    const saturation = isPlayed ? 100 : 70;
+
+                    context.fillStyle = `hsla(210, ${saturation}%, 60%, ${opacity})`;
+                    context.fillRect(x, y, w, noteHeight);
+                });
+            }
 
             // Draw the red playhead line
             if (audioRef.current && audioRef.current.duration > 0) {
@@ -94,10 +157,11 @@ const MidiVisualizer = ({ notesData, audioRef }) => {
 
         // Cleanup function to stop the animation when the component unmounts
         return () => {
+            cancelled = true;
             cancelAnimationFrame(animationFrameId.current);
         };
 
-    }, [notesData, audioRef]); // Rerun effect if notes or audioRef change
+    }, [notesData, audioRef, midiFilename, backendUrl]); // Rerun effect if notes, audioRef or the file change
 
     return <canvas ref={canvasRef} style={{ width: '100%', borderRadius: '4px' }} />;
 };
@@ -0,0 +1,9 @@
+"""
+Code shared by the audio processor and the backend: request and stage metrics,
+per-request profiling, JSON serialization with response compression, and the
+tab, note-extraction and piano-roll code the backend also runs in-process.
+
+Neither app is installed as a package, so each puts the repository root on
+sys.path before importing from here (see audio-tab-processor/shared.py and
+backend/app/__init__.py).
+"""
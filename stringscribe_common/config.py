@@ -0,0 +1,46 @@
+"""Settings of the tab, chord-voicing and piano-roll code shared by the processor and the backend."""
+import os
+
+# --- Guitar and Music Constants ---
+
+# MIDI note numbers for open strings of a standard-tuned guitar (EADGBe)
+# 6th string (E) to 1st string (e)
+GUITAR_OPEN_PITCHES = [40, 45, 50, 55, 59, 64]
+
+# Named tunings tabs can be rendered in, 6th string to 1st. tuning="auto" tries all of them.
+GUITAR_TUNINGS = {
+    "standard": GUITAR_OPEN_PITCHES,
+    "drop_d": [38, 45, 50, 55, 59, 64],
+    "half_step_down": [39, 44, 49, 54, 58, 63],
+    "full_step_down": [38, 43, 48, 53, 57, 62],
+    "drop_c_sharp": [37, 44, 49, 54, 58, 63],
+    "drop_c": [36, 43, 48, 53, 57, 62],
+    "open_g": [38, 43, 50, 55, 59, 62],
+    "open_d": [38, 45, 50, 54, 57, 62],
+    "dadgad": [38, 45, 50, 55, 57, 62],
+}
+
+# Standard number of frets on a guitar
+MAX_FRET = 22
+
+# Highest capo position accepted; capo="auto" tries every position up to it
+MAX_CAPO = 9
+
+# Chord shapes considered playable: fretted notes at most this many frets apart,
+# using at most this many fingers (open strings are free)
+CHORD_HAND_SPAN = 3
+CHORD_MAX_FINGERS = 4
+
+# Precomputed chord-voicing indexes (see tab_algorithms/voicings.py)
+VOICING_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+# Voicing indexes kept in memory at once (about 100 MB each, one per tuning whatever the capo),
+# least recently used dropped first
+VOICING_INDEX_CACHE_SIZE = 4
+
+# Piano-roll tiles for the visualizer (see pianoroll_service.py). The finest
+# level has one column per PIANOROLL_SECONDS_PER_COLUMN seconds; every coarser level
+# halves the time resolution, down to a level where the whole song fits in one tile
+# of PIANOROLL_TILE_COLUMNS columns.
+PIANOROLL_SECONDS_PER_COLUMN = 0.01
+PIANOROLL_TILE_COLUMNS = 256
+PIANOROLL_MAX_TILES_PER_REQUEST = 32
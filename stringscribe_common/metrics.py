@@ -0,0 +1,192 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, request, g
+
+# Upper bounds (in seconds) of the latency histogram buckets.
+# Wide enough to cover both millisecond tab renders and multi-minute transcriptions.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, plus one overflow slot, then sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _render_sample(self, key, value):
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {cumulative}")
+        cumulative += counts[-1]
+        lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Holds every metric of the process and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "stringscribe_stage_duration_seconds", "Time spent in each pipeline stage.", ["stage"])
+STAGE_TOTAL = REGISTRY.counter(
+    "stringscribe_stage_total", "Pipeline stage runs by outcome.", ["stage", "outcome"])
+STAGE_IN_PROGRESS = REGISTRY.gauge(
+    "stringscribe_stage_in_progress", "Pipeline stages currently running.", ["stage"])
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "stringscribe_http_request_duration_seconds", "HTTP request latency by route.", ["method", "route", "status"])
+REQUESTS_IN_PROGRESS = REGISTRY.gauge(
+    "stringscribe_http_requests_in_progress", "HTTP requests currently being served.", ["method", "route"])
+
+
+@contextmanager
+def track_stage(stage):
+    """
+    Times a block of pipeline work and records it under the given stage name.
+
+    Usage:
+        with track_stage("download"):
+            audio_path = download_youtube_audio(url, tmpdir)
+    """
+    STAGE_IN_PROGRESS.inc(stage=stage)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+        STAGE_TOTAL.inc(stage=stage, outcome=outcome)
+        STAGE_IN_PROGRESS.dec(stage=stage)
+
+
+def instrument_app(app):
+    """Records latency and in-flight requests for every route and serves them on /metrics."""
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_route = request.url_rule.rule if request.url_rule else "unmatched"
+        g.metrics_start = time.perf_counter()
+        REQUESTS_IN_PROGRESS.inc(method=request.method, route=g.metrics_route)
+
+    @app.after_request
+    def _observe_request(response):
+        if "metrics_start" in g:
+            REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_start, method=request.method,
+                                    route=g.metrics_route, status=response.status_code)
+        return response
+
+    @app.teardown_request
+    def _finish_request(exc):
+        if "metrics_start" in g:
+            REQUESTS_IN_PROGRESS.dec(method=request.method, route=g.metrics_route)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_endpoint():
+        return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
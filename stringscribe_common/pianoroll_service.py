@@ -0,0 +1,217 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pretty_midi
+
+from .config import PIANOROLL_SECONDS_PER_COLUMN, PIANOROLL_TILE_COLUMNS, PIANOROLL_MAX_TILES_PER_REQUEST
+from .metrics import track_stage
+
+# Bumped whenever the cached pyramid format changes, so old caches are rebuilt
+PYRAMID_VERSION = 1
+
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+
+
+def occupancy_columns(pm, seconds_per_column):
+    """
+    Rasterizes a track's notes into a pitch x time occupancy grid.
+
+    Each cell holds the fraction of its column's time span during which a note of
+    that pitch sounds (overlapping notes of one pitch count once), so notes shorter
+    than a column still show up, just fainter.
+
+    Args:
+        pm (pretty_midi.PrettyMIDI): The notes to rasterize.
+        seconds_per_column (float): Time span of one column.
+
+    Returns:
+        (np.ndarray, int): float32 grid of shape (pitch_max - pitch_min + 1, columns) and pitch_min.
+            The grid has no rows, and pitch_min is None, when the track has no notes.
+    """
+    notes = [note for instrument in pm.instruments if not instrument.is_drum for note in instrument.notes]
+    n_columns = max(1, int(np.ceil(pm.get_end_time() / seconds_per_column)))
+    if not notes:
+        return np.zeros((0, n_columns), dtype=np.float32), None
+
+    pitch = np.array([note.pitch for note in notes])
+    start = np.array([note.start for note in notes]) / seconds_per_column
+    end = np.maximum(start, np.array([note.end for note in notes]) / seconds_per_column)
+    pitch_min = int(pitch.min())
+    n_rows = int(pitch.max()) - pitch_min + 1
+
+    # Each note covers part of its first and last column and all of the columns in
+    # between: partial cells are added directly, full runs through a difference array
+    # that a cumulative sum along time turns into ones.
+    first = np.minimum(np.floor(start).astype(np.int64), n_columns - 1)
+    last = np.minimum(np.floor(end).astype(np.int64), n_columns - 1)
+    row_offset = (pitch - pitch_min) * (n_columns + 1)
+    partial = np.zeros(n_rows * (n_columns + 1), dtype=np.float64)
+    runs = np.zeros_like(partial)
+
+    same = first == last
+    np.add.at(partial, row_offset[same] + first[same], (end - start)[same])
+    spans = ~same
+    np.add.at(partial, row_offset[spans] + first[spans], (first + 1 - start)[spans])
+    np.add.at(partial, row_offset[spans] + last[spans], np.minimum(1.0, end - last)[spans])
+    np.add.at(runs, row_offset[spans] + first[spans] + 1, 1)
+    np.add.at(runs, row_offset[spans] + last[spans], -1)
+
+    grid = partial.reshape(n_rows, n_columns + 1) + np.cumsum(runs.reshape(n_rows, n_columns + 1), axis=1)
+    return np.clip(grid[:, :n_columns], 0, 1).astype(np.float32), pitch_min
+
+
+def build_pyramid(pm):
+    """
+    Builds the multi-resolution piano roll of a track.
+
+    Level 0 is rasterized at PIANOROLL_SECONDS_PER_COLUMN; each further level
+    averages pairs of columns of the one below, until a level fits in a single tile.
+    Cells are quantized to 0-255.
+
+    Returns:
+        (list, int): One uint8 array per level, finest first, and the pitch of row 0.
+    """
+    with track_stage("pianoroll_rasterize"):
+        grid, pitch_min = occupancy_columns(pm, PIANOROLL_SECONDS_PER_COLUMN)
+
+    with track_stage("pianoroll_downsample"):
+        levels = [grid]
+        while levels[-1].shape[1] > PIANOROLL_TILE_COLUMNS:
+            finer = levels[-1]
+            if finer.shape[1] % 2:
+                finer = np.pad(finer, ((0, 0), (0, 1)))
+            levels.append((finer[:, 0::2] + finer[:, 1::2]) / 2)
+    return [np.rint(level * 255).astype(np.uint8) for level in levels], pitch_min
+
+
+def _cache_dir(midi_path):
+    return os.path.splitext(midi_path)[0] + "_pianoroll"
+
+
+def _source_stamp(midi_path):
+    # Re-thresholding rewrites the MIDI in place, which changes these
+    stat = os.stat(midi_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _build_lock(midi_path):
+    with _build_locks_lock:
+        return _build_locks.setdefault(midi_path, threading.Lock())
+
+
+def _read_meta(cache_dir, midi_path):
+    try:
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != PYRAMID_VERSION or meta.get("source") != _source_stamp(midi_path):
+        return None
+    return meta
+
+
+def load_pyramid(midi_path):
+    """
+    Returns the piano-roll pyramid metadata of a MIDI file, building and caching it if needed.
+
+    The pyramid is cached in a '<midi name>_pianoroll' directory next to the MIDI,
+    as one .npy per level so tiles can be sliced out of a memory map without
+    reading the whole level. It is rebuilt when the MIDI file changes.
+    """
+    cache_dir = _cache_dir(midi_path)
+    meta = _read_meta(cache_dir, midi_path)
+    if meta is not None:
+        return meta
+
+    with _build_lock(midi_path):
+        # Another request may have built it while we waited
+        meta = _read_meta(cache_dir, midi_path)
+        if meta is not None:
+            return meta
+
+        source = _source_stamp(midi_path)
+        with track_stage("midi_load"):
+            pm = pretty_midi.PrettyMIDI(midi_path)
+        levels, pitch_min = build_pyramid(pm)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        for i, level in enumerate(levels):
+            tmp_path = os.path.join(cache_dir, f"level_{i}.tmp.npy")
+            np.save(tmp_path, level)
+            os.replace(tmp_path, os.path.join(cache_dir, f"level_{i}.npy"))
+        # A shorter track needs fewer levels than the cache may hold from before
+        i = len(levels)
+        while os.path.exists(os.path.join(cache_dir, f"level_{i}.npy")):
+            os.unlink(os.path.join(cache_dir, f"level_{i}.npy"))
+            i += 1
+
+        meta = {
+            "version": PYRAMID_VERSION,
+            "source": source,
+            "end_time": pm.get_end_time(),
+            "pitch_min": pitch_min,
+            "pitch_max": None if pitch_min is None else pitch_min + levels[0].shape[0] - 1,
+            "tile_columns": PIANOROLL_TILE_COLUMNS,
+            "levels": [{
+                "level": i,
+                "seconds_per_column": PIANOROLL_SECONDS_PER_COLUMN * 2 ** i,
+                "columns": level.shape[1],
+                "tiles": -(-level.shape[1] // PIANOROLL_TILE_COLUMNS),
+            } for i, level in enumerate(levels)],
+        }
+        # Written last: a directory without an up-to-date meta.json is never read
+        tmp_path = os.path.join(cache_dir, "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(cache_dir, "meta.json"))
+    return meta
+
+
+def read_pianoroll(midi_path, level=None, start_tile=0, end_tile=None):
+    """
+    Describes a MIDI file's piano-roll pyramid and, if a level is given, returns some of its tiles.
+
+    Args:
+        midi_path (str): Full path of the MIDI file.
+        level (int): Pyramid level to read tiles from (0 is the finest), or None for metadata only.
+        start_tile (int): First tile to return.
+        end_tile (int): Tile to stop before; defaults to start_tile + 1.
+
+    Returns:
+        dict: The pyramid metadata (end_time, pitch range, tile_columns and one entry per
+            level), plus 'level' and 'tiles' when a level is requested: a list of
+            {'index', 'start_time', 'occupancy'}, occupancy being a list of rows of
+            0-255 values, one row per pitch from pitch_min and one value per column.
+            The last tile of a level may have fewer columns.
+
+    Raises:
+        ValueError: If the level or tile range is out of bounds.
+    """
+    meta = load_pyramid(midi_path)
+    response = {key: meta[key] for key in ("end_time", "pitch_min", "pitch_max", "tile_columns", "levels")}
+    if level is None:
+        return response
+
+    if not 0 <= level < len(meta["levels"]):
+        raise ValueError(f"level must be between 0 and {len(meta['levels']) - 1}")
+    level_meta = meta["levels"][level]
+    end_tile = start_tile + 1 if end_tile is None else end_tile
+    if not 0 <= start_tile < end_tile <= level_meta["tiles"]:
+        raise ValueError(f"Tiles must be a non-empty range within 0-{level_meta['tiles']}")
+    if end_tile - start_tile > PIANOROLL_MAX_TILES_PER_REQUEST:
+        raise ValueError(f"At most {PIANOROLL_MAX_TILES_PER_REQUEST} tiles can be requested at once")
+
+    with track_stage("pianoroll_tiles"):
+        grid = np.load(os.path.join(_cache_dir(midi_path), f"level_{level}.npy"), mmap_mode="r")
+        width = meta["tile_columns"]
+        response["tiles"] = [{
+            "index": i,
+            "start_time": i * width * level_meta["seconds_per_column"],
+            # Plain lists, so the response serializes without the orjson provider too
+            "occupancy": grid[:, i * width:(i + 1) * width].tolist(),
+        } for i in range(start_tile, end_tile)]
+    response["level"] = level
+    return response
@@ -0,0 +1,115 @@
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import time
+import uuid
+
+from flask import request, g, jsonify, send_from_directory, Response, current_app
+
+
+def _wants_profile():
+    return request.headers.get("X-Profile") == "1" or request.args.get("profile") == "1"
+
+
+def _is_authorized():
+    token = request.headers.get("X-Profile-Token", "")
+    expected = current_app.config.get("PROFILE_TOKEN")
+    return bool(expected) and hmac.compare_digest(token, expected)
+
+
+def _job_id_for_request():
+    """
+    Names the job the request is about, so profiles line up with jobs: the id a view
+    stored in g.job_id, else a job_id from the URL or JSON body.
+    """
+    job_id = g.get("job_id") or (request.view_args or {}).get("job_id")
+    if job_id is None and request.is_json:
+        job_id = (request.get_json(silent=True) or {}).get("job_id")
+    if job_id is None:
+        return f"req_{int(time.time() * 1000)}"
+    job_id = str(job_id)
+    return job_id if job_id.startswith("job_") else f"job_{job_id}"
+
+
+def init_profiling(app, url_prefix=""):
+    """
+    Adds opt-in cProfile capture for single requests, plus admin endpoints to fetch the results.
+
+    A request is profiled only when it carries 'X-Profile: 1' (or '?profile=1') together
+    with a valid 'X-Profile-Token'. The profile is saved to app.config['PROFILES_DIR'],
+    named after the job the request is about and the time, and its file name is returned
+    in 'X-Profile-Id'. A streamed response is profiled until its body has been sent.
+    With app.config['PROFILE_TOKEN'] unset the feature is off and requests pay only for
+    one header check. The admin endpoints are served under url_prefix.
+    """
+
+    @app.before_request
+    def _start_profiler():
+        if not current_app.config.get("PROFILE_TOKEN") or not _wants_profile():
+            return None
+        if not _is_authorized():
+            return jsonify({"error": "Profiling not authorized"}), 403
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+        return None
+
+    @app.after_request
+    def _save_profile(response):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return response
+        profiles_dir = current_app.config["PROFILES_DIR"]
+        os.makedirs(profiles_dir, exist_ok=True)
+        # The time and a random suffix keep repeated requests for one job and endpoint apart
+        name = (f"{_job_id_for_request().replace(os.sep, '_')}_{request.endpoint}"
+                f"_{int(time.time() * 1000)}_{uuid.uuid4().hex[:6]}.prof")
+        path = os.path.join(profiles_dir, name)
+
+        def save():
+            profiler.disable()
+            profiler.dump_stats(path)
+
+        if response.is_streamed:
+            # The body is generated after this hook returns, so keep profiling until it's closed
+            response.call_on_close(save)
+        else:
+            save()
+        response.headers["X-Profile-Id"] = name
+        return response
+
+    @app.route(f"{url_prefix}/admin/profiles", methods=["GET"])
+    def list_profiles():
+        if not _is_authorized():
+            return jsonify({"error": "Not authorized"}), 403
+        profiles_dir = current_app.config["PROFILES_DIR"]
+        if not os.path.isdir(profiles_dir):
+            return jsonify([])
+        names = sorted(os.listdir(profiles_dir), key=lambda n: os.path.getmtime(os.path.join(profiles_dir, n)),
+                       reverse=True)
+        return jsonify([n for n in names if n.endswith(".prof")])
+
+    @app.route(f"{url_prefix}/admin/profiles/<name>", methods=["GET"])
+    def get_profile(name):
+        """Returns the raw .prof file, or a pstats summary with '?format=text'."""
+        if not _is_authorized():
+            return jsonify({"error": "Not authorized"}), 403
+        profiles_dir = current_app.config["PROFILES_DIR"]
+        path = os.path.join(profiles_dir, os.path.basename(name))
+        if not os.path.exists(path):
+            return jsonify({"error": "Profile not found"}), 404
+
+        if request.args.get("format") == "text":
+            sort = request.args.get("sort", "cumulative")
+            if sort not in pstats.Stats.sort_arg_dict_default:
+                return jsonify({"error": f"sort must be one of {sorted(pstats.Stats.sort_arg_dict_default)}"}), 400
+            try:
+                limit = int(request.args.get("limit", 50))
+            except ValueError:
+                return jsonify({"error": "limit must be a number"}), 400
+            out = io.StringIO()
+            stats = pstats.Stats(path, stream=out)
+            stats.sort_stats(sort).print_stats(limit)
+            return Response(out.getvalue(), mimetype="text/plain")
+        return send_from_directory(profiles_dir, os.path.basename(name), as_attachment=True)
@@ -0,0 +1,88 @@
+import gzip
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this aren't worth the CPU to compress
+COMPRESS_MIN_SIZE = 1024
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/plain", "text/html", "text/csv")
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson, which serializes note lists several
+    times faster than the stdlib and natively handles numpy scalars and arrays.
+    """
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode()
+        except TypeError:
+            # orjson is stricter than json (e.g. ints above 64 bits); fall back rather than fail
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps(obj) + "\n", mimetype=self.mimetype)
+
+
+def negotiate_encoding(accept_encoding=None):
+    """Picks the best content encoding the client accepts: 'br', 'gzip' or None."""
+    accept = request.accept_encodings if accept_encoding is None else accept_encoding
+    offers = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return accept.best_match(offers)
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def init_serialization(app):
+    """
+    Switches the app to the fast JSON provider (when orjson is installed) and
+    compresses buffered text/JSON responses with brotli or gzip, as negotiated
+    from each request's Accept-Encoding.
+
+    Streamed responses (SSE, file downloads) and responses that already carry a
+    Content-Encoding, such as bytes proxied through from another service, are
+    left alone.
+    """
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
+
+    @app.after_request
+    def _compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or "Content-Encoding" in response.headers):
+            return response
+        response.vary.add("Accept-Encoding")
+
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_SIZE:
+            return response
+        encoding = negotiate_encoding()
+        if encoding is None:
+            return response
+
+        response.set_data(compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -1,17 +1,21 @@
 import numpy as np
 import pretty_midi
-from config import GUITAR_OPEN_PITCHES, MAX_FRET
+from ..config import GUITAR_OPEN_PITCHES, MAX_FRET
+from .tunings import get_fret_table, string_labels
+from .voicings import find_chord_voicing
 
-def find_string_and_fret_efficient(pitch, last_positions):
+def find_string_and_fret_efficient(pitch, last_positions, used_strings=(), open_pitches=GUITAR_OPEN_PITCHES,
+                                   max_fret=MAX_FRET):
     """
     Finds the guitar string and fret for a pitch, prioritizing minimal hand movement.
     It calculates a cost based on distance from the average fret of the last chord.
+    Strings in used_strings are skipped, so notes of one chord don't collide.
     """
     options = []
-    for i, open_pitch in enumerate(GUITAR_OPEN_PITCHES):
-        fret = pitch - open_pitch
-        if 0 <= fret <= MAX_FRET:
-            options.append({"string": 6 - i, "fret": int(round(fret))})
+    n_strings = len(open_pitches)
+    for i, fret in enumerate(get_fret_table(open_pitches, max_fret)[pitch]):
+        if fret >= 0 and (n_strings - i) not in used_strings:
+            options.append({"string": n_strings - i, "fret": int(fret)})
 
     if not options:
         return None
@@ -31,9 +35,15 @@ def find_string_and_fret_efficient(pitch, last_positions):
     # Return the option with the lowest cost
     return min(options, key=calculate_cost)
 
-def generate_tab_efficient(pm: pretty_midi.PrettyMIDI, time_step=0.08):
+def generate_tab_efficient(pm: pretty_midi.PrettyMIDI, time_step=0.08, open_pitches=GUITAR_OPEN_PITCHES,
+                           max_fret=MAX_FRET, labels=None, chord_voicings=True, capo=0):
     """
     Generates a guitar tablature from a PrettyMIDI object using the efficient algorithm.
+
+    open_pitches and max_fret describe the tuning, already shifted by the capo
+    at fret capo (the voicing index is shared by every capo position); labels name the tab lines (defaults to the notes of open_pitches). With
+    chord_voicings off, chords are placed note by note instead of being looked
+    up in the voicing index, which is only worth building for known tunings.
     """
     notes = [note for inst in pm.instruments if not inst.is_drum for note in inst.notes]
     if not notes:
@@ -51,21 +61,29 @@ def generate_tab_efficient(pm: pretty_midi.PrettyMIDI, time_step=0.08):
         if start_step < n_steps:
             note_events[start_step].append(note)
 
-    tab_lines = {i: f"{s}|" for i, s in zip(range(1, 7), ['e', 'B', 'G', 'D', 'A', 'E'])}
+    n_strings = len(open_pitches)
+    tab_lines = {i: f"{s}|" for i, s in zip(range(1, n_strings + 1), labels or string_labels(open_pitches))}
     last_fret_positions = {}
 
     for step_notes in note_events:
         current_notes_on_strings = {}
-        if step_notes:
-            for note in step_notes:
-                option = find_string_and_fret_efficient(note.pitch, last_fret_positions)
+        pitches = {note.pitch for note in step_notes}
+        if len(pitches) > 1 and chord_voicings:
+            # Chords are a lookup in the precomputed voicing index
+            current_notes_on_strings = find_chord_voicing(pitches, last_fret_positions, open_pitches, max_fret,
+                                                          capo) or {}
+        if pitches and not current_notes_on_strings:
+            # Single notes, or chords with no playable shape: place notes one by one
+            for pitch in sorted(pitches):
+                option = find_string_and_fret_efficient(pitch, last_fret_positions, current_notes_on_strings,
+                                                        open_pitches, max_fret)
                 if option:
                     current_notes_on_strings[option['string']] = option['fret']
 
         is_two_digit = any(fret >= 10 for fret in current_notes_on_strings.values())
         width = 2 if is_two_digit else 1
 
-        for i in range(1, 7):
+        for i in range(1, n_strings + 1):
             char_to_add = str(current_notes_on_strings[i]) if i in current_notes_on_strings else "-"
             tab_lines[i] += char_to_add.ljust(width, '-')
 
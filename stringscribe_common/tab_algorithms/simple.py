@@ -1,28 +1,33 @@
 import numpy as np
 import pretty_midi
-from config import GUITAR_OPEN_PITCHES, MAX_FRET
+from ..config import GUITAR_OPEN_PITCHES, MAX_FRET
+from .tunings import get_fret_table, string_labels
 
-def find_string_and_fret_simple(pitch):
+def find_string_and_fret_simple(pitch, open_pitches=GUITAR_OPEN_PITCHES, max_fret=MAX_FRET):
     """
     Finds the guitar string and fret for a given MIDI pitch.
     This simple version prioritizes the lowest possible fret.
     """
     best_option = None
     min_fret = float('inf')
+    n_strings = len(open_pitches)
 
-    # Iterate through each open string pitch
-    for i, open_pitch in enumerate(GUITAR_OPEN_PITCHES):
-        fret = pitch - open_pitch
+    # Iterate through the fret that plays the pitch on each string (-1 if it can't)
+    for i, fret in enumerate(get_fret_table(open_pitches, max_fret)[pitch]):
         # Check if the fret is within the playable range and is the lowest found so far
-        if 0 <= fret <= MAX_FRET and fret < min_fret:
+        if 0 <= fret < min_fret:
             min_fret = fret
             # String number is 6 (low E) to 1 (high e)
-            best_option = {"string": 6 - i, "fret": int(round(fret))}
+            best_option = {"string": n_strings - i, "fret": int(fret)}
     return best_option
 
-def generate_tab_simple(pm: pretty_midi.PrettyMIDI, time_step=0.08):
+def generate_tab_simple(pm: pretty_midi.PrettyMIDI, time_step=0.08, open_pitches=GUITAR_OPEN_PITCHES,
+                        max_fret=MAX_FRET, labels=None):
     """
     Generates a guitar tablature from a PrettyMIDI object using the simple algorithm.
+
+    open_pitches and max_fret describe the tuning, already shifted by any capo;
+    labels name the tab lines (defaults to the notes of open_pitches).
     """
     notes = [note for inst in pm.instruments if not inst.is_drum for note in inst.notes]
     if not notes:
@@ -42,13 +47,14 @@ def generate_tab_simple(pm: pretty_midi.PrettyMIDI, time_step=0.08):
             note_events[start_step].append(note)
 
     # Initialize tab lines for each string
-    tab_lines = {i: f"{s}|" for i, s in zip(range(1, 7), ['e', 'B', 'G', 'D', 'A', 'E'])}
+    n_strings = len(open_pitches)
+    tab_lines = {i: f"{s}|" for i, s in zip(range(1, n_strings + 1), labels or string_labels(open_pitches))}
 
     for step_notes in note_events:
         notes_on_strings = {}
         if step_notes:
             for note in step_notes:
-                option = find_string_and_fret_simple(note.pitch)
+                option = find_string_and_fret_simple(note.pitch, open_pitches, max_fret)
                 if option:
                     notes_on_strings[option['string']] = option['fret']
 
@@ -56,7 +62,7 @@ def generate_tab_simple(pm: pretty_midi.PrettyMIDI, time_step=0.08):
         is_two_digit = any(fret >= 10 for fret in notes_on_strings.values())
         width = 2 if is_two_digit else 1
 
-        for i in range(1, 7):
+        for i in range(1, n_strings + 1):
             char_to_add = str(notes_on_strings[i]) if i in notes_on_strings else "-"
             tab_lines[i] += char_to_add.ljust(width, '-')
 
@@ -0,0 +1,140 @@
+import threading
+
+import numpy as np
+
+from ..config import GUITAR_TUNINGS, MAX_FRET, MAX_CAPO
+
+# Flats, as tunings below standard are usually written (Eb Ab Db Gb Bb Eb)
+NOTE_NAMES = ["C", "Db", "D", "Eb", "E", "F", "Gb", "G", "Ab", "A", "Bb", "B"]
+
+# Costs used to score tunings for tuning="auto" (see choose_tuning)
+UNPLAYABLE_COST = 20.0      # per note that no string can reach
+FRET_COST = 0.1             # per fret, the tab algorithms' bias towards low positions
+RETUNE_COST = 5.0           # one-off, per string tuned away from standard
+CAPO_COST = 5.0             # one-off, for using a capo at all
+# Per note and capo fret. Half of FRET_COST, so a capo only pays off when it puts
+# notes on open strings, not merely because every fret number gets smaller.
+CAPO_NOTE_COST = 0.05
+
+# Fret tables keyed by (open_pitches, max_fret), and candidate tables keyed by the candidates
+_fret_tables = {}
+_candidate_tables = {}
+_tables_lock = threading.Lock()
+
+
+def resolve_tuning(tuning):
+    """
+    Turns a tuning name or a list of open-string pitches into (name, open_pitches).
+
+    Raises:
+        ValueError: For unknown names, or lists that aren't six MIDI pitches.
+    """
+    if isinstance(tuning, str):
+        if tuning not in GUITAR_TUNINGS:
+            raise ValueError(f"Unknown tuning {tuning!r}, expected 'auto', a list of 6 pitches "
+                             f"or one of {sorted(GUITAR_TUNINGS)}")
+        return tuning, tuple(GUITAR_TUNINGS[tuning])
+    try:
+        open_pitches = tuple(int(p) for p in tuning)
+    except (TypeError, ValueError):
+        raise ValueError("tuning must be a name or a list of MIDI pitches")
+    if len(open_pitches) != 6 or not all(0 <= p <= 127 for p in open_pitches):
+        raise ValueError("A custom tuning must list 6 MIDI pitches, from the 6th string to the 1st")
+    for name, pitches in GUITAR_TUNINGS.items():
+        if tuple(pitches) == open_pitches:
+            return name, open_pitches
+    return "custom", open_pitches
+
+
+def resolve_capo(capo):
+    """Validates a capo position. Raises ValueError if it isn't between 0 and MAX_CAPO."""
+    try:
+        capo = int(capo)
+    except (TypeError, ValueError):
+        raise ValueError("capo must be a fret number or 'auto'")
+    if not 0 <= capo <= MAX_CAPO:
+        raise ValueError(f"capo must be between 0 and {MAX_CAPO}")
+    return capo
+
+
+def string_labels(open_pitches):
+    """Tab line labels, 1st string first, with the 1st string in lower case (e, B, G, D, A, E)."""
+    names = [NOTE_NAMES[p % 12] for p in reversed(open_pitches)]
+    names[0] = names[0].lower()
+    width = max(len(name) for name in names)
+    return [name.ljust(width) for name in names]
+
+
+def get_fret_table(open_pitches, max_fret=MAX_FRET):
+    """
+    Returns the pitch -> fret lookup table of a tuning, built on first use.
+
+    Returns:
+        np.ndarray: int8 array of shape (128, strings), in open_pitches order. Entry
+            [pitch, i] is the fret that sounds pitch on string i, or -1 if it can't.
+    """
+    key = (tuple(open_pitches), max_fret)
+    table = _fret_tables.get(key)
+    if table is None:
+        frets = np.arange(128)[:, None] - np.array(key[0])[None, :]
+        table = np.where((frets >= 0) & (frets <= max_fret), frets, -1).astype(np.int8)
+        table.setflags(write=False)
+        with _tables_lock:
+            table = _fret_tables.setdefault(key, table)
+    return table
+
+
+def _candidate_table(candidates):
+    """
+    Stacks the lowest fret of every pitch under each (name, open_pitches, capo) candidate.
+
+    Returns:
+        np.ndarray: float array of shape (candidates, 128), NaN where a pitch is unplayable.
+    """
+    table = _candidate_tables.get(candidates)
+    if table is None:
+        rows = []
+        for _, open_pitches, capo in candidates:
+            frets = get_fret_table(tuple(p + capo for p in open_pitches), MAX_FRET - capo).astype(float)
+            frets[frets < 0] = np.inf
+            rows.append(frets.min(axis=1))
+        table = np.vstack(rows)
+        table[np.isinf(table)] = np.nan
+        with _tables_lock:
+            table = _candidate_tables.setdefault(candidates, table)
+    return table
+
+
+def choose_tuning(pitches, tunings=None, capos=(0,)):
+    """
+    Picks the tuning and capo under which a sequence of notes is cheapest to play.
+
+    Every (tuning, capo) candidate is scored against the track's pitch histogram
+    in one matrix product: each note is placed at its lowest fret, and the score adds
+    UNPLAYABLE_COST per note out of reach and FRET_COST per fret, plus the costs
+    of retuning strings and of a capo, so standard tuning wins ties. This
+    estimates what the tab algorithms will do without rendering a tab per candidate.
+
+    Args:
+        pitches (list): MIDI pitches of the track's notes.
+        tunings (list): (name, open_pitches) pairs to try; defaults to all of GUITAR_TUNINGS.
+        capos (list): Capo positions to try.
+
+    Returns:
+        (str, tuple, int): The best tuning's name and open pitches, and the capo position.
+    """
+    if tunings is None:
+        tunings = list(GUITAR_TUNINGS.items())
+    candidates = tuple((name, tuple(open_pitches), capo) for name, open_pitches in tunings for capo in capos)
+    if len(candidates) == 1 or not len(pitches):
+        return candidates[0]
+
+    counts = np.bincount(np.asarray(pitches, dtype=np.int64), minlength=128)[:128]
+    frets = _candidate_table(candidates)
+    unplayable = np.isnan(frets) @ counts
+    standard = np.array(GUITAR_TUNINGS["standard"])
+    setup = np.array([RETUNE_COST * np.count_nonzero(np.array(open_pitches) != standard)
+                      + (CAPO_COST + CAPO_NOTE_COST * capo * len(pitches) if capo else 0)
+                      for _, open_pitches, capo in candidates])
+    scores = UNPLAYABLE_COST * unplayable + FRET_COST * (np.nan_to_num(frets) @ counts) + setup
+    return candidates[int(np.argmin(scores))]
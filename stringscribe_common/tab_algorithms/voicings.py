@@ -0,0 +1,159 @@
+import gzip
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from ..config import (GUITAR_OPEN_PITCHES, MAX_FRET, CHORD_HAND_SPAN, CHORD_MAX_FINGERS, VOICING_CACHE_DIR,
+                      VOICING_INDEX_CACHE_SIZE)
+
+# Bump when the index layout or the enumeration rules change, so old cache files are ignored
+INDEX_VERSION = 1
+
+# Loaded indexes, keyed by (open_pitches, max_fret), least recently used first
+_indexes = OrderedDict()
+# Guards _indexes and _build_locks only; an index is loaded or built under its key's
+# own lock, so renders that need another index (or one already loaded) don't wait on it
+_indexes_lock = threading.Lock()
+_build_locks = {}
+
+
+def build_voicing_index(open_pitches, max_fret, hand_span=CHORD_HAND_SPAN, max_fingers=CHORD_MAX_FINGERS):
+    """
+    Enumerates every playable chord shape and groups them by the pitches they sound.
+
+    A shape assigns each string either nothing, its open note or one fret. It is
+    playable when the fretted notes fit within hand_span frets of each other, need
+    at most max_fingers fingers, and no two strings sound the same pitch.
+
+    Returns:
+        dict: Sorted pitch tuple -> list of shapes. A shape is a tuple with one
+        entry per string in open_pitches order: the fret, or -1 if not played.
+    """
+    index = {}
+    frets = [-1] * len(open_pitches)
+
+    def place(i, low, high, fingers, pitches):
+        if i == len(open_pitches):
+            if len(pitches) >= 2:
+                index.setdefault(tuple(sorted(pitches)), []).append(tuple(frets))
+            return
+
+        # String not played
+        frets[i] = -1
+        place(i + 1, low, high, fingers, pitches)
+
+        open_pitch = open_pitches[i]
+        if open_pitch not in pitches:
+            frets[i] = 0
+            pitches.add(open_pitch)
+            place(i + 1, low, high, fingers, pitches)
+            pitches.discard(open_pitch)
+
+        if fingers < max_fingers:
+            for fret in range(1, max_fret + 1):
+                new_low, new_high = min(low, fret), max(high, fret)
+                pitch = open_pitch + fret
+                if new_high - new_low > hand_span or pitch in pitches:
+                    continue
+                frets[i] = fret
+                pitches.add(pitch)
+                place(i + 1, new_low, new_high, fingers + 1, pitches)
+                pitches.discard(pitch)
+        frets[i] = -1
+
+    place(0, max_fret + 1, -1, 0, set())
+    return index
+
+
+def _cache_path(open_pitches, max_fret):
+    key = f"{INDEX_VERSION}:{list(open_pitches)}:{max_fret}:{CHORD_HAND_SPAN}:{CHORD_MAX_FINGERS}"
+    return os.path.join(VOICING_CACHE_DIR, f"voicings_{hashlib.sha1(key.encode()).hexdigest()[:16]}.pkl.gz")
+
+
+def get_voicing_index(open_pitches=GUITAR_OPEN_PITCHES, max_fret=MAX_FRET):
+    """
+    Returns the voicing index for a tuning, loading it from disk or building it on first use.
+
+    Building takes about a second; the result is cached in VOICING_CACHE_DIR so
+    later processes only pay for loading it. At most VOICING_INDEX_CACHE_SIZE
+    indexes stay in memory.
+    """
+    key = (tuple(open_pitches), max_fret)
+    index = _cached_index(key)
+    if index is not None:
+        return index
+
+    with _indexes_lock:
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+    with build_lock:
+        # Another thread may have loaded it while this one waited
+        index = _cached_index(key)
+        if index is not None:
+            return index
+        index = _load_or_build_index(open_pitches, max_fret)
+        with _indexes_lock:
+            _indexes[key] = index
+            while len(_indexes) > VOICING_INDEX_CACHE_SIZE:
+                _indexes.popitem(last=False)
+        return index
+
+
+def _cached_index(key):
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+        return index
+
+
+def _load_or_build_index(open_pitches, max_fret):
+    path = _cache_path(open_pitches, max_fret)
+    try:
+        with gzip.open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+    index = build_voicing_index(list(open_pitches), max_fret)
+    os.makedirs(VOICING_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wb", compresslevel=3) as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return index
+
+
+def find_chord_voicing(pitches, last_positions, open_pitches=GUITAR_OPEN_PITCHES, max_fret=MAX_FRET, capo=0):
+    """
+    Picks the cheapest playable shape for a set of simultaneous pitches.
+
+    The cost matches find_string_and_fret_efficient, summed over the chord's notes:
+    distance from the average fret of the previous step plus a small bias towards
+    lower frets.
+
+    open_pitches and max_fret are already shifted by the capo. A shape counted from
+    the capo is the same shape counted from the nut, a capo higher, so the lookup
+    uses the un-capoed tuning's index and every capo position shares it.
+
+    Returns:
+        dict: String number (6 = low E ... 1 = high e) -> fret, or None if no shape fits.
+    """
+    index = get_voicing_index(tuple(p - capo for p in open_pitches), max_fret + capo)
+    shapes = index.get(tuple(sorted({p - capo for p in pitches})))
+    if shapes and capo:
+        shapes = [shape for shape in shapes if max(shape) <= max_fret]
+    if not shapes:
+        return None
+
+    avg_fret = sum(last_positions.values()) / len(last_positions) if last_positions else None
+
+    def calculate_cost(shape):
+        played = [fret for fret in shape if fret >= 0]
+        if avg_fret is None:
+            return sum(played)
+        return sum(abs(fret - avg_fret) + fret * 0.1 for fret in played)
+
+    best = min(shapes, key=calculate_cost)
+    n_strings = len(open_pitches)
+    return {n_strings - i: fret for i, fret in enumerate(best) if fret >= 0}
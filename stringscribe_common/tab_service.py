@@ -0,0 +1,93 @@
+from .config import MAX_FRET, MAX_CAPO
+from .metrics import track_stage
+from .tab_algorithms.simple import generate_tab_simple
+from .tab_algorithms.efficient import generate_tab_efficient
+from .tab_algorithms.tunings import resolve_tuning, resolve_capo, choose_tuning, string_labels
+
+# Shapes extract_notes can return the notes in
+NOTE_LAYOUTS = ("rows", "columnar")
+
+def resolve_tab_setup(pm, tuning="standard", capo=0):
+    """
+    Settles the tuning and capo to render a track with, searching for them if either is "auto".
+
+    Returns:
+        (str, tuple, int): The tuning name ("custom" for an unnamed list), its open pitches and the capo.
+
+    Raises:
+        ValueError: If the tuning or capo is invalid.
+    """
+    tunings = None if tuning == "auto" else [resolve_tuning(tuning)]
+    capos = range(MAX_CAPO + 1) if capo == "auto" else [resolve_capo(capo)]
+    if tunings is not None and len(capos) == 1:
+        return (*tunings[0], capos[0])
+
+    with track_stage("tuning_search"):
+        pitches = [note.pitch for instrument in pm.instruments if not instrument.is_drum for note in instrument.notes]
+        return choose_tuning(pitches, tunings, capos)
+
+def render_tab(pm, algorithm="efficient", tuning="standard", capo=0):
+    """
+    Renders a guitar tab for an already loaded PrettyMIDI object.
+
+    Args:
+        pm (pretty_midi.PrettyMIDI): The notes to render.
+        algorithm (str): The algorithm to use ('simple' or 'efficient').
+        tuning: A name from GUITAR_TUNINGS (see config.py), a list of 6 open-string MIDI
+            pitches (6th string first), or "auto" to pick the tuning that suits the notes.
+        capo (int): Capo position; frets in the tab are counted from the capo.
+            "auto" picks one along with the tuning.
+
+    Returns:
+        str: The generated guitar tab as a string. Unless it is in standard tuning
+            without a capo, it starts with a line naming the tuning and capo.
+    """
+    name, open_pitches, capo = resolve_tab_setup(pm, tuning, capo)
+    labels = string_labels(open_pitches)
+    shifted = tuple(p + capo for p in open_pitches)
+
+    # Now we can call the functions directly
+    if algorithm == "efficient":
+        with track_stage("tab_render_efficient"):
+            # Custom tunings come straight from requests, so they don't get a voicing index each
+            tab = generate_tab_efficient(pm, open_pitches=shifted, max_fret=MAX_FRET - capo, labels=labels,
+                                         chord_voicings=name != "custom", capo=capo)
+    else:
+        with track_stage("tab_render_simple"):
+            tab = generate_tab_simple(pm, open_pitches=shifted, max_fret=MAX_FRET - capo, labels=labels)
+
+    if name == "standard" and not capo:
+        return tab
+    header = f"Tuning: {' '.join(label.strip() for label in reversed(labels))} ({name.replace('_', ' ')})"
+    if capo:
+        header += f", capo {capo}"
+    return f"{header}\n\n{tab}"
+
+def extract_notes(pm, layout="rows"):
+    """
+    Lists the notes of an already loaded PrettyMIDI object.
+
+    Args:
+        pm (pretty_midi.PrettyMIDI): The notes to list.
+        layout (str): "rows" for one {'pitch', 'start', 'end'} dict per note, or
+            "columnar" for parallel 'pitch', 'start' and 'end' arrays, which is
+            much smaller on the wire and faster to serialize for long songs.
+
+    Returns:
+        dict: The notes, the layout and the track's end time.
+    """
+    if layout not in NOTE_LAYOUTS:
+        raise ValueError(f"Unknown note layout {layout!r}, expected one of {NOTE_LAYOUTS}")
+
+    with track_stage("note_extraction"):
+        notes = [note for instrument in pm.instruments if not instrument.is_drum for note in instrument.notes]
+        if layout == "columnar":
+            notes_data = {
+                'pitch': [note.pitch for note in notes],
+                'start': [note.start for note in notes],
+                'end': [note.end for note in notes],
+            }
+        else:
+            notes_data = [{'pitch': note.pitch, 'start': note.start, 'end': note.end} for note in notes]
+
+    return {'notes': notes_data, 'layout': layout, 'end_time': pm.get_end_time()}